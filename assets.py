@@ -0,0 +1,221 @@
+import os
+import re
+import json
+import struct
+import pygame
+import constants
+
+PACKAGE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+SPRITE_FOLDER = os.path.join(PACKAGE_FOLDER, "Assets", "sprites")
+
+#animation/texture groups: name -> (folder inside Assets/sprites, scale)
+#every numbered png in the folder is a frame, in number order
+#sprite sheets are a single png instead: (file inside Assets/sprites, scale, frame size, row of the sheet to use)
+SPRITE_GROUPS = {
+    "knight/idle": ("knight/idle", constants.PLAYER_SCALE),
+    "knight/hit": ("knight/hit", constants.PLAYER_SCALE),
+    "knight/run": ("knight/run", constants.PLAYER_SCALE),
+    "knight/roll": ("knight/roll", constants.PLAYER_SCALE),
+    "grounds/surface": ("grounds/green_surface", constants.TILE_SCALE),
+    "grounds/ground": ("grounds/green_ground", constants.TILE_SCALE),
+    "grounds/stone": ("grounds/green_stone", constants.TILE_SCALE),
+    "vegetation/tree1": ("vegetation/tree1", constants.TILE_SCALE),
+    "vegetation/bush": ("vegetation/bush", constants.TILE_SCALE),
+    "plank": ("plank", constants.TILE_SCALE),
+    "slime_green/idle": ("slime_green.png", constants.SLIME_SCALE, (24, 24), 0),
+    "slime_green/move": ("slime_green.png", constants.SLIME_SCALE, (24, 24), 1),
+    "slime_purple/idle": ("slime_purple.png", constants.SLIME_SCALE, (24, 24), 0),
+    "slime_purple/move": ("slime_purple.png", constants.SLIME_SCALE, (24, 24), 1),
+}
+
+#atlas cache file: magic, header length, json header (frame positions and source fingerprints), raw RGBA pixels
+CACHE_MAGIC = b"NEAATLAS"
+CACHE_VERSION = 1
+ATLAS_WIDTH = 1024
+HEADER_LENGTH = struct.Struct("<I")
+
+
+def get_surface_bytes(surface):
+    # pixel memory a surface owns, subsurfaces share their parent's pixels so they count as nothing
+    if surface is None or surface.get_parent() is not None:
+        return 0
+    return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+
+def find_frame_files(folder):
+    # numbered pngs sorted by their number so knight_10 comes after knight_9
+    if not os.path.isdir(folder):
+        return []
+    numbered = []
+    for file_name in os.listdir(folder):
+        match = re.search(r"(\d+)\.png$", file_name)
+        if match:
+            numbered.append((int(match.group(1)), os.path.join(folder, file_name)))
+    return [path for _, path in sorted(numbered)]
+
+
+class AssetCache():
+    def __init__(self, cache_path=None, groups=None):
+        self.cache_path = cache_path or os.path.join(PACKAGE_FOLDER, constants.ASSET_CACHE_FOLDER, "atlas.bin")
+        self.groups = groups or SPRITE_GROUPS
+        self.atlas = None
+        self.frame_rects = {}  # group name -> list of (x, y, width, height) in the atlas
+        self.frames = {}  # group name -> list of subsurfaces, made the first time the group is asked for
+        self.rebuilt = False
+
+    def get_sources(self):
+        # fingerprint of every source image, the atlas is rebuilt when any of these change
+        sources = {}
+        missing = []
+        for name, (folder, scale, *sheet) in self.groups.items():
+            if sheet:
+                sheet_path = os.path.join(SPRITE_FOLDER, folder)
+                paths = [sheet_path] if os.path.isfile(sheet_path) else []
+            else:
+                paths = find_frame_files(os.path.join(SPRITE_FOLDER, folder))
+            if not paths:
+                missing.append(f"{name} ({os.path.join(SPRITE_FOLDER, folder)})")
+                continue
+            sources[name] = {
+                "scale": scale,
+                "files": [[os.path.relpath(path, SPRITE_FOLDER), os.stat(path).st_mtime_ns, os.stat(path).st_size] for path in paths],
+            }
+            if sheet:
+                (frame_width, frame_height), row = sheet
+                sources[name]["sheet"] = [frame_width, frame_height, row]
+        if missing:
+            raise FileNotFoundError("missing sprite frames for: " + ", ".join(missing))
+        return sources
+
+    def load(self):
+        sources = self.get_sources()
+        if not self.read_cache(sources):
+            self.build(sources)
+            self.write_cache(sources)
+            self.rebuilt = True
+        if pygame.display.get_surface() is not None:
+            self.atlas = self.atlas.convert_alpha()
+        return self
+
+    def read_cache(self, sources):
+        if not os.path.exists(self.cache_path):
+            return False
+        with open(self.cache_path, "rb") as cache_file:
+            data = cache_file.read()
+
+        if data[:len(CACHE_MAGIC)] != CACHE_MAGIC:
+            return False
+        header_start = len(CACHE_MAGIC) + HEADER_LENGTH.size
+        header_length = HEADER_LENGTH.unpack_from(data, len(CACHE_MAGIC))[0]
+        try:
+            header = json.loads(data[header_start:header_start + header_length])
+        except ValueError:
+            return False
+        if header.get("version") != CACHE_VERSION or header.get("sources") != sources:
+            return False
+
+        pixels = data[header_start + header_length:]
+        width, height = header["size"]
+        if len(pixels) != width * height * 4:
+            return False
+        self.atlas = pygame.image.frombytes(pixels, (width, height), "RGBA")
+        self.frame_rects = {name: [tuple(rect) for rect in rects] for name, rects in header["frames"].items()}
+        self.frames = {}
+        return True
+
+    def build(self, sources):
+        # load and scale every frame then pack them into rows (shelves) of the atlas, tallest first
+        images = []
+        frame_counts = {}
+        for name, source in sources.items():
+            frames = [pygame.image.load(os.path.join(SPRITE_FOLDER, path)) for path, _, _ in source["files"]]
+            if "sheet" in source:
+                # cut one row of the sheet into frames, left to right
+                frame_width, frame_height, row = source["sheet"]
+                sheet = frames[0]
+                frames = [sheet.subsurface((x, row * frame_height, frame_width, frame_height))
+                          for x in range(0, sheet.get_width() - frame_width + 1, frame_width)]
+            scale = source["scale"]
+            for index, image in enumerate(frames):
+                images.append((name, index, pygame.transform.scale(image, (image.get_width() * scale, image.get_height() * scale))))
+            frame_counts[name] = len(frames)
+        images.sort(key=lambda item: item[2].get_height(), reverse=True)
+
+        positions = []
+        x = y = shelf_height = 0
+        for name, index, image in images:
+            if x + image.get_width() > ATLAS_WIDTH:
+                x = 0
+                y += shelf_height
+                shelf_height = 0
+            positions.append((name, index, image, x, y))
+            x += image.get_width()
+            shelf_height = max(shelf_height, image.get_height())
+
+        self.atlas = pygame.Surface((ATLAS_WIDTH, y + shelf_height), pygame.SRCALPHA)
+        self.frame_rects = {name: [None] * count for name, count in frame_counts.items()}
+        for name, index, image, x, y in positions:
+            self.atlas.blit(image, (x, y))
+            self.frame_rects[name][index] = (x, y, image.get_width(), image.get_height())
+        self.frames = {}
+
+    def write_cache(self, sources):
+        header = json.dumps({
+            "version": CACHE_VERSION,
+            "size": self.atlas.get_size(),
+            "sources": sources,
+            "frames": self.frame_rects,
+        }).encode()
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        # written to a temporary file first so a crash can't leave half an atlas behind
+        temporary_path = self.cache_path + ".tmp"
+        with open(temporary_path, "wb") as cache_file:
+            cache_file.write(CACHE_MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+            cache_file.write(pygame.image.tobytes(self.atlas, "RGBA"))
+        os.replace(temporary_path, self.cache_path)
+
+    def get_memory_size(self):
+        return get_surface_bytes(self.atlas)
+
+    def get_frames(self, name):
+        # frames are subsurfaces of the atlas so no pixels are copied
+        if name not in self.frames:
+            self.frames[name] = [self.atlas.subsurface(rect) for rect in self.frame_rects[name]]
+        return self.frames[name]
+
+
+class SpriteVariants():
+    def __init__(self):
+        # flipped, translucent and tinted copies of sprites, each made the first time it is asked for
+        # so drawing never allocates a surface or changes the alpha of a shared one
+        self.variants = {}  # (image, flip, alpha, tint) -> surface
+
+    def __len__(self):
+        return len(self.variants)
+
+    def get_memory_size(self):
+        return sum(get_surface_bytes(variant) for variant in self.variants.values())
+
+    def get(self, image, flip=False, alpha=None, tint=None):
+        # flip mirrors left to right, alpha is 0-255, tint is an (r, g, b) colour the sprite is multiplied by
+        key = (image, flip, alpha, tint)
+        variant = self.variants.get(key)
+        if variant is None:
+            variant = self.make_variant(image, flip, alpha, tint)
+            self.variants[key] = variant
+        return variant
+
+    def get_frames(self, frames, flip=False, alpha=None, tint=None):
+        return [self.get(frame, flip, alpha, tint) for frame in frames]
+
+    def make_variant(self, image, flip, alpha, tint):
+        variant = pygame.transform.flip(image, True, False) if flip else image.copy()
+        if tint is not None:
+            variant.fill(tint + (255,), special_flags=pygame.BLEND_RGBA_MULT)
+        if alpha is not None:
+            variant.set_alpha(alpha)
+        return variant
+
+
+#shared by everything that draws sprites
+sprite_variants = SpriteVariants()
@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+
+#run without a real window so the benchmark works on any machine
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+import constants
+from world import World
+from character import Character
+from chunk_loader import ChunkLoader
+from renderer import WorldRenderer
+from mobs import MobGroup, SLIME_KINDS, spawn_slimes
+
+
+#plain coloured stand-ins with the same sizes as the scaled game sprites
+def make_sprite(width, height, colour):
+    sprite = pygame.Surface((width, height), pygame.SRCALPHA)
+    sprite.fill(colour)
+    return sprite
+
+def make_stand_in_sprites():
+    tile = constants.TILE_SIZE
+    ground_colours = {"grounds/surface": (70, 160, 60), "grounds/ground": (120, 80, 40), "grounds/stone": (110, 110, 110)}
+    tile_textures = {group: [make_sprite(tile, tile, (r, g + i * 10, b)) for i in range(3)] for group, (r, g, b) in ground_colours.items()}
+    tile_textures["vegetation/tree1"] = [make_sprite(tile, tile, (40, 120 + i * 20, 40)) for i in range(3)]  # tree segments
+    tile_textures["vegetation/bush"] = [make_sprite(tile, tile, (60, 140, 60 + i * 20)) for i in range(4)]
+    tile_textures["plank"] = [make_sprite(tile, tile, (170, 120, 70))]
+    knight_size = 32 * constants.PLAYER_SCALE
+    frame_counts = [4, 4, 8, 8]  # idle, hit, run, roll
+    knight_animations = [[make_sprite(knight_size, knight_size, (200, 200, 220)) for _ in range(count)] for count in frame_counts]
+    return tile_textures, knight_animations
+
+
+class Timings():
+    def __init__(self):
+        self.samples = {}  # operation name -> list of durations in seconds
+
+    def time(self, name, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.samples.setdefault(name, []).append(time.perf_counter() - start)
+        return result
+
+    def summary(self):
+        results = {}
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            results[name] = {
+                "calls": len(ordered),
+                "total_ms": sum(ordered) * 1000,
+                "mean_ms": sum(ordered) / len(ordered) * 1000,
+                "p50_ms": ordered[len(ordered) // 2] * 1000,
+                "p95_ms": ordered[min(int(len(ordered) * 0.95), len(ordered) - 1)] * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return results
+
+
+class Session():
+    #a headless copy of the main loop that scripted traversals drive frame by frame
+    def __init__(self, seed, sprites, workers):
+        tile_textures, knight_animations = sprites
+        self.world = World(tile_textures, seed=seed)
+        if workers:
+            self.world.chunk_loader = ChunkLoader(seed, workers)
+        self.knight = Character(knight_animations)
+        surface_height = self.world.generate_height_at(self.knight.rect.centerx // constants.TILE_SIZE)
+        self.knight.rect.midbottom = (400, surface_height * constants.TILE_SIZE - 10)
+        self.screen = pygame.Surface(constants.WINDOW_SIZE)
+        self.renderer = WorldRenderer(self.world, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
+        self.camera_x = self.knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
+        self.camera_y = self.knight.rect.centery - constants.WINDOW_SIZE[1] // 2
+        self.timings = Timings()
+
+    def step(self, move_x=0, jump=False):
+        world = self.world
+        knight = self.knight
+        timings = self.timings
+        frame_start = time.perf_counter()
+
+        timings.time("update_chunks_around_player", world.update_chunks_around_player, knight.rect.centerx, knight.rect.centery)
+
+        target_camera_x = knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
+        target_camera_y = knight.rect.centery - constants.WINDOW_SIZE[1] // 2
+        self.camera_x += (target_camera_x - self.camera_x) * 0.1
+        self.camera_y += (target_camera_y - self.camera_y) * 0.1
+
+        camera_x, camera_y = timings.time("draw", self.draw_world)
+
+        knight.vel_x = move_x * constants.PLAYER_SPEED
+        if jump:
+            knight.jump()
+        timings.time("Character.move", knight.move, world)
+        knight.update()
+        knight.draw_at_position(self.screen, (knight.rect.x - camera_x, knight.rect.y - camera_y))
+        timings.samples.setdefault("frame", []).append(time.perf_counter() - frame_start)
+
+    def draw_world(self):
+        # the whole world draw, bringing the renderer's layer up to date and putting it on the screen
+        camera = self.renderer.update(self.camera_x, self.camera_y)
+        self.renderer.draw(self.screen)
+        return camera
+
+    def get_obstacles(self):
+        return self.timings.time("get_obstacles_in_area", self.world.get_obstacles_in_area,
+                                 self.camera_x, self.camera_y, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
+
+    def knight_tile(self):
+        return self.knight.rect.centerx // constants.TILE_SIZE, self.knight.rect.centery // constants.TILE_SIZE
+
+    def close(self):
+        if self.world.chunk_loader:
+            self.world.chunk_loader.shutdown()
+
+
+#scripted traversals
+def walk(session, frames):
+    #run right along the surface, jumping every so often to clear steps
+    for frame in range(frames):
+        session.step(move_x=1, jump=frame % 30 == 0)
+        if frame % 10 == 0:
+            session.get_obstacles()
+
+def fall_through_caves(session, frames):
+    #dig out the tiles under the player every frame so they drop through the dirt, stone and caves below
+    for frame in range(frames):
+        tile_x, tile_y = session.knight_tile()
+        for dy in range(1, 3):
+            if session.world.get_tile_at(tile_x, tile_y + dy) != -1:
+                session.world.remove_block_at(tile_x, tile_y + dy)
+        session.step()
+
+def edit_blocks(session, frames):
+    #break and place blocks around the player every frame while walking back and forth
+    rng = random.Random(0)
+    for frame in range(frames):
+        tile_x, tile_y = session.knight_tile()
+        session.get_obstacles()
+        for _ in range(4):
+            target_x = tile_x + rng.randint(-4, 4)
+            target_y = tile_y + rng.randint(-4, 4)
+            placing = rng.random() < 0.5
+            if session.timings.time("Character.is_tile_in_range", session.knight.is_tile_in_range, target_x, target_y, session.world, int(placing)):
+                if placing:
+                    session.world.add_block_at(target_x, target_y)
+                else:
+                    session.world.remove_block_at(target_x, target_y)
+        session.step(move_x=1 if (frame // 60) % 2 == 0 else -1)
+
+SCENARIOS = {
+    "walking": walk,
+    "falling_through_caves": fall_through_caves,
+    "block_editing": edit_blocks,
+}
+
+
+#micro benchmarks for world functions on their own
+def benchmark_generation(seed, sprites, count):
+    world = World(sprites[0], seed=seed)
+    timings = Timings()
+    for i in range(count):
+        timings.time("World.generate_chunk", world.generate_chunk, i - count // 2, i % 4 - 1)
+    return timings.summary()
+
+def benchmark_tile_lookups(seed, sprites, count):
+    world = World(sprites[0], seed=seed)
+    world.update_chunks_around_player(400, 300)
+    rng = random.Random(0)
+    timings = Timings()
+    chunk_tiles = world.chunk_size
+    for _ in range(count):
+        timings.time("World.get_tile_at (loaded)", world.get_tile_at, rng.randint(-chunk_tiles, chunk_tiles * 2 - 1), rng.randint(-chunk_tiles, chunk_tiles * 2 - 1))
+        timings.time("World.get_tile_at (unloaded)", world.get_tile_at, rng.randint(1000, 100000), rng.randint(-50, 100))
+    return timings.summary()
+
+def benchmark_mobs(seed, sprites, count, ticks):
+    #a crowd of slimes stepping and drawing around a still player
+    world = World(sprites[0], seed=seed)
+    world.update_chunks_around_player(400, 300)
+    slime_size = 24 * constants.SLIME_SCALE
+    slime_animations = [[[make_sprite(slime_size, slime_size, (120, 200, 60)) for _ in range(4)] for _ in range(2)] for _ in SLIME_KINDS]
+    mobs = MobGroup(slime_animations, seed)
+    spawn_slimes(mobs, world, 400, count, seed, spread=30)
+    screen = pygame.Surface(constants.WINDOW_SIZE)
+    timings = Timings()
+    for _ in range(ticks):
+        timings.time(f"MobGroup.step ({count} mobs)", mobs.step, world, 400, 300)
+        timings.time(f"MobGroup.draw ({count} mobs)", mobs.draw, screen, 0, world.generate_height_at(8) * constants.TILE_SIZE - 300)
+    return timings.summary()
+
+
+def benchmark_cells(seed, sprites, size, ticks):
+    #a square of sand and one of water dropped from the sky, they fall, pile up and spread out
+    world = World(sprites[0], seed=seed)
+    world.cells.set_area(world.update_chunks_around_player(400, world.generate_height_at(8) * constants.TILE_SIZE))
+    top = world.generate_height_at(8) - size - 8
+    world.set_tiles([(tile_x, tile_y, world.sand_tile if tile_x < 8 else world.water_tile)
+                     for tile_x in range(8 - size, 8 + size) for tile_y in range(top, top + size)])
+    for tile_x in range(8 - size, 8 + size):
+        for tile_y in range(top, top + size):
+            world.cells.wake(tile_x, tile_y)
+    timings = Timings()
+    for _ in range(ticks):
+        timings.time(f"CellSimulation.step ({size * size * 2} tiles)", world.cells.step)
+    return timings.summary()
+
+
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Headless benchmarks for the world and character hot paths")
+    parser.add_argument("--frames", type=int, default=600, help="frames per scripted traversal")
+    parser.add_argument("--seed", type=int, default=5678)
+    parser.add_argument("--workers", type=int, default=0, help="background chunk workers, 0 generates on the main loop")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="only run these traversals")
+    parser.add_argument("--output", default="-", help="JSON results file, - for stdout")
+    args = parser.parse_args(arguments)
+
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+    sprites = make_stand_in_sprites()
+
+    results = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "frames": args.frames,
+        "workers": args.workers,
+        "micro": {},
+        "scenarios": {},
+    }
+    results["micro"].update(benchmark_generation(args.seed, sprites, 64))
+    results["micro"].update(benchmark_tile_lookups(args.seed, sprites, 20000))
+    results["micro"].update(benchmark_mobs(args.seed, sprites, 2000, 300))
+    results["micro"].update(benchmark_cells(args.seed, sprites, 12, 300))
+
+    for name in args.scenario or sorted(SCENARIOS):
+        session = Session(args.seed, sprites, args.workers)
+        try:
+            SCENARIOS[name](session, args.frames)
+        finally:
+            session.close()
+        results["scenarios"][name] = session.timings.summary()
+        results["scenarios"][name]["chunk_cache"] = session.world.loaded_chunks.get_stats()
+        results["scenarios"][name]["column_cache"] = session.world.columns.get_stats()
+
+    output = json.dumps(results, indent=2)
+    if args.output == "-":
+        print(output)
+    else:
+        with open(args.output, "w") as output_file:
+            output_file.write(output + "\n")
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,183 @@
+import sys
+from collections import OrderedDict
+import numpy as np
+import constants
+from tiles import STILL, FALLS, SLIDES, FLOWS
+
+
+class CellSimulation():
+    def __init__(self, world, budget=constants.CELL_UPDATE_BUDGET):
+        # falling blocks and flowing water, only tiles that might be able to move are kept in a queue for their chunk
+        # a tile that can't move leaves its queue until something next to it changes, so a tick costs as much as
+        # the number of tiles moving instead of the size of the loaded world
+        self.world = world
+        self.budget = budget  # most tiles updated in one tick, the rest wait for the next so big collapses spread out
+        self.movement = world.tiles.movement  # tile id -> how the tile moves, from the tile registry
+        self.area = set()  # chunk keys being simulated, the chunks in view of a player, see set_area
+        self.active = OrderedDict()  # chunk key -> set of (tile x, tile y) to update, in the order chunks get a turn
+        self.pending = {}  # (tile x, tile y) -> tile type moved this tick, written to the world at the end of it
+        self.tick_count = 0
+        self.update_count = 0  # tiles updated last tick
+        self.move_count = 0  # tiles that moved last tick
+
+    def __len__(self):
+        return sum(len(queue) for queue in self.active.values())
+
+    def get_memory_size(self):
+        return sys.getsizeof(self.active) + sum(sys.getsizeof(queue) for queue in self.active.values())
+
+    def get_tile(self, tile_x, tile_y):
+        # None outside the simulated chunks, nothing moves into or out of those
+        if (tile_x, tile_y) in self.pending:
+            return self.pending[(tile_x, tile_y)]
+        size = self.world.chunk_size
+        chunk_key = (tile_x // size, tile_y // size)
+        if chunk_key not in self.area:
+            return None
+        chunk = self.world.loaded_chunks.peek(chunk_key)
+        if chunk is None:
+            return None
+        return chunk.get_tile(tile_x % size, tile_y % size)
+
+    def set_area(self, chunk_keys):
+        # called at the start of every tick with the loaded chunks in view of the players. only these are simulated,
+        # not everything that happens to be loaded, because which chunks the background loader has finished
+        # depends on timing and a replay has to move the same tiles every time
+        wanted = set(chunk_keys)
+        for chunk_key in [key for key in self.area if key not in wanted]:
+            self.forget_chunk(chunk_key)
+        for chunk_key in chunk_keys:
+            if chunk_key not in self.area:
+                self.area.add(chunk_key)
+                self.activate_chunk(chunk_key)
+
+    def wake(self, tile_x, tile_y):
+        # queues the tile if it is one that can move
+        tile_type = self.get_tile(tile_x, tile_y)
+        if tile_type is not None and self.movement[tile_type] != STILL:
+            size = self.world.chunk_size
+            self.active.setdefault((tile_x // size, tile_y // size), set()).add((tile_x, tile_y))
+
+    def wake_around(self, tile_x, tile_y):
+        # called when a tile changes, anything touching it may be able to fall or flow into it
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                self.wake(tile_x + dx, tile_y + dy)
+
+    def activate_chunk(self, chunk_key):
+        # a chunk just started being simulated, queues its sand and water that isn't resting on something
+        # and the tiles of neighbouring chunks that were held up by the chunk not being there
+        world = self.world
+        size = world.chunk_size
+        chunk = world.loaded_chunks.peek(chunk_key)
+        if chunk is None:
+            return
+        tiles = np.frombuffer(chunk.tiles, np.int8).reshape(size, size)
+        movement = world.tiles.movement_array[tiles]
+        air = np.pad(tiles == -1, 1)
+        loose = air[2:, 1:-1] | air[1:-1, :-2] | air[1:-1, 2:]  # air below, left or right
+        # falling tiles also sink through anything that isn't solid
+        loose |= ((movement == FALLS) | (movement == SLIDES)) & np.pad(~world.tiles.solid_array[tiles], ((0, 1), (0, 0)))[1:]
+        loose[[0, -1], :] = True
+        loose[:, [0, -1]] = True
+        start_x = chunk_key[0] * size
+        start_y = chunk_key[1] * size
+        queue = {(start_x + int(x), start_y + int(y)) for y, x in zip(*np.nonzero(loose & (movement != STILL)))}
+        if queue:
+            self.active.setdefault(chunk_key, set()).update(queue)
+
+        for offset in range(size):
+            self.wake(start_x + offset, start_y - 1)
+            self.wake(start_x - 1, start_y + offset)
+            self.wake(start_x + size, start_y + offset)
+
+    def forget_chunk(self, chunk_key):
+        # its tiles are queued again by activate_chunk if it comes back into view
+        self.area.discard(chunk_key)
+        self.active.pop(chunk_key, None)
+
+    def move(self, tile_x, tile_y, new_x, new_y):
+        # swaps the tile with the air or water it moves into
+        tile_type = self.get_tile(tile_x, tile_y)
+        self.pending[(tile_x, tile_y)] = self.get_tile(new_x, new_y)
+        self.pending[(new_x, new_y)] = tile_type
+        self.move_count += 1
+        self.wake(new_x, new_y)
+        self.wake_around(tile_x, tile_y)
+
+    def get_flow_direction(self, tile_x, tile_y):
+        # water runs along the floor towards the nearest drop within WATER_FLOW_DISTANCE, 0 if there isn't one
+        # so a pool levels out and then stops instead of sloshing back and forth forever
+        distances = []
+        for direction in (-1, 1):
+            distance = None
+            for step in range(1, constants.WATER_FLOW_DISTANCE + 1):
+                if self.get_tile(tile_x + direction * step, tile_y) != -1:
+                    break
+                if self.get_tile(tile_x + direction * step, tile_y + 1) == -1:
+                    distance = step
+                    break
+            distances.append(distance)
+        left, right = distances
+        if left is None and right is None:
+            return 0
+        if left is None or right is None:
+            return -1 if right is None else 1
+        if left == right:
+            # ties alternate so water poured onto a point spreads both ways
+            return 1 if (tile_x + self.tick_count) % 2 else -1
+        return -1 if left < right else 1
+
+    def can_sink_into(self, tile_type):
+        # falling tiles swap places with air and water, None is outside the loaded chunks
+        return tile_type is not None and not self.world.tiles.solid[tile_type]
+
+    def update_tile(self, tile_x, tile_y):
+        tile_type = self.get_tile(tile_x, tile_y)
+        below = self.get_tile(tile_x, tile_y + 1)
+        movement = self.movement[tile_type]
+        if movement == FALLS or movement == SLIDES:
+            if self.can_sink_into(below):
+                self.move(tile_x, tile_y, tile_x, tile_y + 1)
+                return
+            if movement == SLIDES and below is not None:
+                first = 1 if (tile_x + self.tick_count) % 2 else -1
+                for direction in (first, -first):
+                    if self.get_tile(tile_x + direction, tile_y) == -1 and self.can_sink_into(self.get_tile(tile_x + direction, tile_y + 1)):
+                        self.move(tile_x, tile_y, tile_x + direction, tile_y + 1)
+                        return
+        elif movement == FLOWS:
+            if below == -1:
+                self.move(tile_x, tile_y, tile_x, tile_y + 1)
+                return
+            direction = self.get_flow_direction(tile_x, tile_y)
+            if direction:
+                self.move(tile_x, tile_y, tile_x + direction, tile_y)
+
+    def step(self):
+        # one simulation tick, chunks take turns so one big collapse can't stop everything else from moving
+        self.tick_count += 1
+        self.move_count = 0
+        updating = []
+        for chunk_key in list(self.active):
+            queue = self.active.pop(chunk_key)
+            while queue and len(updating) < self.budget:
+                updating.append(queue.pop())
+            if queue:
+                # still has tiles waiting, goes to the back of the line for next tick
+                self.active[chunk_key] = queue
+            if len(updating) >= self.budget:
+                break
+
+        # bottom up so a falling column moves together instead of one tile a tick from the bottom
+        updating.sort(key=lambda tile: (-tile[1], tile[0]))
+        for tile_x, tile_y in updating:
+            if (tile_x, tile_y) not in self.pending:
+                # a tile something moved into or out of this tick is already queued for the next one if it needs to be
+                self.update_tile(tile_x, tile_y)
+        self.update_count = len(updating)
+
+        if self.pending:
+            changes = [(tile_x, tile_y, tile_type) for (tile_x, tile_y), tile_type in self.pending.items()]
+            self.pending = {}
+            self.world.set_tiles(changes)
@@ -1,6 +1,7 @@
 import pygame
 import constants
 import math
+from assets import sprite_variants
 
 class Character(pygame.sprite.Sprite): 
     def __init__(self, animations):
@@ -15,7 +16,7 @@ class Character(pygame.sprite.Sprite):
         self.rect.midbottom = (400, 300)
         self.image_rect = self.image.get_rect(midbottom=self.rect.midbottom)
         
-        self.update_time = pygame.time.get_ticks()
+        self.animation_time = 0  # ms of simulation time since the animation frame last changed
         self.flip = False
 
         #physics
@@ -26,7 +27,7 @@ class Character(pygame.sprite.Sprite):
         self.inventory = ["", "", ""] 
         self.inventory_pointer = 0
 
-    def move(self, obstacles):  
+    def move(self, world):  
         # Apply gravity
         self.vel_y += 1
         if self.vel_y > 10:
@@ -44,26 +45,16 @@ class Character(pygame.sprite.Sprite):
         elif self.vel_x > 0:
             self.flip = False
 
-        # Horizontal movement
-        self.rect.x += self.vel_x
-        for obstacle in obstacles:
-            if self.rect.colliderect(obstacle):
-                if self.vel_x > 0:  # moving right
-                    self.rect.right = obstacle.left
-                elif self.vel_x < 0:  # moving left
-                    self.rect.left = obstacle.right
+        # Horizontal movement, the world stops us at the first solid tile in the way
+        self.rect.x += world.sweep_x(self.rect, self.vel_x)
 
         # Vertical movement
-        self.rect.y += self.vel_y
-        for obstacle in obstacles:
-            if self.rect.colliderect(obstacle):
-                if self.vel_y > 0:  # falling down
-                    self.rect.bottom = obstacle.top
-                    self.vel_y = 0
-                    self.jumping = False
-                elif self.vel_y < 0:  # jumping up
-                    self.rect.top = obstacle.bottom
-                    self.vel_y = 0
+        moved_y = world.sweep_y(self.rect, self.vel_y)
+        self.rect.y += moved_y
+        if moved_y != self.vel_y:
+            if self.vel_y > 0:  # landed
+                self.jumping = False
+            self.vel_y = 0  # hit the ground or a ceiling
 
     def jump(self):
         if not self.jumping:  #can only jump if on ground
@@ -73,37 +64,37 @@ class Character(pygame.sprite.Sprite):
     def update(self):
         animation_cooldown = 120
 
-        #handle animation
-        if pygame.time.get_ticks() - self.update_time > animation_cooldown:
+        #handle animation, timed in simulation ticks so it keeps the same speed at any frame rate
+        self.animation_time += constants.SIMULATION_STEP_MS
+        if self.animation_time > animation_cooldown:
             self.frame_index += 1
-            self.update_time = pygame.time.get_ticks()
+            self.animation_time = 0
 
         #check if animation finished
         if self.frame_index >= len(self.animations[self.action]):
             self.frame_index = 0
 
-        #update image
+        #update image, the flipped frame is made once and reused
         self.image = self.animations[self.action][self.frame_index]
 
         if self.flip:
-            self.image = pygame.transform.flip(self.image, True, False)
+            self.image = sprite_variants.get(self.image, flip=True)
 
         #update image_rect to draw relative to rect (collision box)
         self.image_rect = self.image.get_rect(midbottom=self.rect.midbottom)
 
-    def is_tile_in_range(self, tile_x, tile_y, obstacles, collisions):
+    def is_tile_in_range(self, tile_x, tile_y, world, collisions):
 
         tile_world_x = tile_x * constants.TILE_SIZE + constants.TILE_SIZE // 2
         tile_world_y = tile_y * constants.TILE_SIZE + constants.TILE_SIZE // 2
 
-        line_of_sight = ((self.rect.centerx, self.rect.centery) + (tile_world_x, tile_world_y))
+        # Calculate distance between player center and tile center first, no need for line of sight if too far
+        if math.sqrt((self.rect.centerx - tile_world_x) ** 2 + (self.rect.centery - tile_world_y) ** 2) > constants.PLAYER_HIT_RANGE:
+            return False
 
-        for obstacle in obstacles:
-            if obstacle.clipline(line_of_sight):
-                collisions += 1
-
-        # Calculate distance between player center and tile center
-        return math.sqrt((self.rect.centerx - tile_world_x) ** 2 + (self.rect.centery - tile_world_y) ** 2) <= constants.PLAYER_HIT_RANGE and collisions <= 1
+        # only walks the tiles the line of sight crosses and stops once more than one block is in the way
+        collisions += world.count_solid_tiles_on_line(self.rect.centerx, self.rect.centery, tile_world_x, tile_world_y, 1 - collisions)
+        return collisions <= 1
 
     def draw_at_position(self, surface, position):
         # Calculate where to draw the image based on the collision rect position
@@ -0,0 +1,50 @@
+from concurrent.futures import ProcessPoolExecutor
+from world import World
+from level import LevelFile
+
+#each worker process keeps its own sprite-less world just for terrain generation
+worker_world = None
+
+def init_worker(seed, level_path):
+    global worker_world
+    worker_world = World({}, seed=seed)
+    if level_path:
+        worker_world.set_level(LevelFile(level_path))
+
+def generate_chunk_in_worker(chunk_x, chunk_y):
+    return worker_world.generate_chunk(chunk_x, chunk_y)
+
+
+class ChunkLoader():
+    def __init__(self, seed, workers=None, level_path=None):
+        # noise generation is CPU bound so use processes instead of threads
+        self.executor = ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(seed, level_path))
+        self.pending = {}  # chunk key -> future for chunks being generated
+
+    def is_pending(self, chunk_key):
+        return chunk_key in self.pending
+
+    def request(self, chunk_x, chunk_y):
+        chunk_key = (chunk_x, chunk_y)
+        if chunk_key not in self.pending:
+            self.pending[chunk_key] = self.executor.submit(generate_chunk_in_worker, chunk_x, chunk_y)
+
+    def cancel_unwanted(self, wanted_keys):
+        # drop queued work for chunks the player has moved away from
+        for chunk_key in list(self.pending):
+            if chunk_key not in wanted_keys and self.pending[chunk_key].cancel():
+                del self.pending[chunk_key]
+
+    def collect_finished(self):
+        # returns finished chunks without ever waiting on a worker
+        finished = []
+        for chunk_key, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[chunk_key]
+                if not future.cancelled() and future.exception() is None:
+                    finished.append((chunk_key, future.result()))
+        return finished
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+        self.pending.clear()
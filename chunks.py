@@ -0,0 +1,178 @@
+import sys
+from array import array
+from collections import OrderedDict
+
+
+class Chunk():
+    def __init__(self, size, tiles=None):
+        # tiles are one signed byte each in a flat row-major buffer instead of a list of lists
+        self.size = size
+        self.tiles = tiles if tiles is not None else array('b', [-1]) * (size * size)
+
+    def get_tile(self, local_x, local_y):
+        return self.tiles[local_y * self.size + local_x]
+
+    def set_tile(self, local_x, local_y, tile_type):
+        self.tiles[local_y * self.size + local_x] = tile_type
+
+    def to_bytes(self):
+        return self.tiles.tobytes()
+
+    @classmethod
+    def from_bytes(cls, size, data):
+        tiles = array('b')
+        tiles.frombytes(data)
+        return cls(size, tiles)
+
+    def get_memory_size(self):
+        return len(self.tiles) * self.tiles.itemsize
+
+
+class ChunkCache():
+    def __init__(self, max_chunks=None, max_bytes=None, on_evict=None):
+        # least recently used chunks are evicted once either budget is exceeded
+        self.chunks = OrderedDict()
+        self.max_chunks = max_chunks
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict  # called with (chunk key, chunk) for every evicted chunk
+        self.memory_size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, chunk_key):
+        return chunk_key in self.chunks
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def items(self):
+        return self.chunks.items()
+
+    def get(self, chunk_key):
+        # counts as a use, so the chunk moves to the back of the eviction queue
+        chunk = self.chunks.get(chunk_key)
+        if chunk is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.chunks.move_to_end(chunk_key)
+        return chunk
+
+    def peek(self, chunk_key):
+        # looks a chunk up without touching the counters or eviction order
+        return self.chunks.get(chunk_key)
+
+    def touch(self, chunk_key):
+        # moves a chunk to the back of the eviction queue without counting it as another hit
+        if chunk_key in self.chunks:
+            self.chunks.move_to_end(chunk_key)
+
+    def put(self, chunk_key, chunk):
+        if chunk_key in self.chunks:
+            self.memory_size -= self.chunks[chunk_key].get_memory_size()
+        self.chunks[chunk_key] = chunk
+        self.chunks.move_to_end(chunk_key)
+        self.memory_size += chunk.get_memory_size()
+        self.evict_over_budget()
+
+    def pop(self, chunk_key):
+        chunk = self.chunks.pop(chunk_key)
+        self.memory_size -= chunk.get_memory_size()
+        return chunk
+
+    def is_over_budget(self):
+        if self.max_chunks is not None and len(self.chunks) > self.max_chunks:
+            return True
+        return self.max_bytes is not None and self.memory_size > self.max_bytes
+
+    def evict_over_budget(self):
+        # never evicts the most recently added chunk
+        while len(self.chunks) > 1 and self.is_over_budget():
+            chunk_key, chunk = self.chunks.popitem(last=False)
+            self.memory_size -= chunk.get_memory_size()
+            self.evictions += 1
+            if self.on_evict:
+                self.on_evict(chunk_key, chunk)
+
+    def get_stats(self):
+        return {
+            "chunks": len(self.chunks),
+            "bytes": self.memory_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class Column():
+    __slots__ = ("height", "surface_tile", "texture_seed")
+
+    def __init__(self, height, surface_tile, texture_seed):
+        # everything about a column of the world that only depends on its x and the seed
+        self.height = height  # row of the surface tile
+        self.surface_tile = surface_tile  # what grows on the surface: a tree, a bush or plain surface
+        self.texture_seed = texture_seed  # texture variants are picked with random.Random(texture_seed + tile y)
+
+
+class ColumnCache():
+    def __init__(self, make_column, max_columns):
+        # least recently used columns are evicted past max_columns, make_column(x) builds a missing one
+        self.columns = OrderedDict()
+        self.make_column = make_column
+        self.max_columns = max_columns
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.columns)
+
+    def get(self, x):
+        column = self.columns.get(x)
+        if column is None:
+            self.misses += 1
+            column = self.columns[x] = self.make_column(x)
+            self.evict_over_budget()
+            return column
+        self.hits += 1
+        self.columns.move_to_end(x)
+        return column
+
+    def get_range(self, start_x, width):
+        # columns start_x to start_x + width - 1, missing ones are all made before anything is evicted
+        columns = []
+        for x in range(start_x, start_x + width):
+            column = self.columns.get(x)
+            if column is None:
+                self.misses += 1
+                column = self.columns[x] = self.make_column(x)
+            else:
+                self.hits += 1
+                self.columns.move_to_end(x)
+            columns.append(column)
+        self.evict_over_budget()
+        return columns
+
+    def evict_over_budget(self):
+        while len(self.columns) > self.max_columns:
+            self.columns.popitem(last=False)
+            self.evictions += 1
+
+    def get_memory_size(self):
+        # every column is the same size so one is measured for all of them
+        column_size = sys.getsizeof(next(iter(self.columns.values()))) if self.columns else 0
+        return sys.getsizeof(self.columns) + len(self.columns) * column_size
+
+    def get_stats(self):
+        return {
+            "columns": len(self.columns),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,268 @@
+import sys
+import socket
+import argparse
+import pygame
+from pygame.locals import *
+import constants
+from world import World, EDIT_NONE, EDIT_BROKEN
+from chunks import Chunk, Column
+from character import Character
+from tiles import TILES
+from assets import AssetCache, sprite_variants
+from renderer import WorldRenderer
+from protocol import (MessageReader, encode_message, encode_input, decode_chunk, decode_tick, HELLO, WELCOME, CHUNK, FORGET, TICK,
+                      HELLO_BODY, WELCOME_BODY, CHUNK_KEY)
+from replay import MOVEMENT, ACTION_KINDS
+
+
+class RemoteWorld(World):
+    def __init__(self, textures, seed):
+        # holds only the chunks and edits a server sends, no tile is ever generated here. the one thing worked out
+        # locally is each column's surface height (a single noise sample), which the light uses as the sky line over
+        # chunks that haven't arrived and which picks the texture of dug out blocks
+        super().__init__(textures, seed)
+        self.broken_blocks = {}  # chunk key -> local indices of broken blocks, the server says which tiles they are
+
+    def make_column(self, x):
+        # what grows on the surface is in the chunks, so the vegetation noise isn't needed
+        return Column(self.noise_height_at(x), self.surface_tile, self.seed + x * 1000)
+
+    def get_tile_at(self, tile_x, tile_y):
+        chunk = self.loaded_chunks.peek((tile_x // self.chunk_size, tile_y // self.chunk_size))
+        if chunk is None:
+            # only the light reads tiles that haven't arrived, they count as open sky above the surface and solid below it
+            return -1 if tile_y < self.generate_height_at(tile_x) else self.stone_tile
+        return chunk.get_tile(tile_x % self.chunk_size, tile_y % self.chunk_size)
+
+    def draw_chunk_tiles(self, surface, chunk_x, chunk_y, camera_x, camera_y, screen_width, screen_height):
+        # chunks that haven't arrived are left empty, they are redrawn when they do
+        return
+
+    def is_block_broken(self, tile_x, tile_y):
+        broken = self.broken_blocks.get((tile_x // self.chunk_size, tile_y // self.chunk_size))
+        return bool(broken) and self.get_local_index(tile_x, tile_y) in broken
+
+    def set_edit_state(self, chunk_key, index, tile_type, state):
+        # the server's World.get_edit_state for the tile, instead of comparing it with generated terrain
+        self.set_edit(chunk_key, index, None if state == EDIT_NONE else tile_type)
+        if state == EDIT_BROKEN:
+            self.broken_blocks.setdefault(chunk_key, set()).add(index)
+        elif chunk_key in self.broken_blocks:
+            self.broken_blocks[chunk_key].discard(index)
+
+    def apply_edits(self, edits):
+        # set_tiles for (tile x, tile y, tile type, edit state) from the server, relit together as one area
+        tiles = []
+        for tile_x, tile_y, tile_type, state in edits:
+            chunk_key = (tile_x // self.chunk_size, tile_y // self.chunk_size)
+            self.set_edit_state(chunk_key, self.get_local_index(tile_x, tile_y), tile_type, state)
+            chunk = self.loaded_chunks.peek(chunk_key)
+            if chunk is not None:
+                chunk.set_tile(tile_x % self.chunk_size, tile_y % self.chunk_size, tile_type)
+            tiles.append((tile_x, tile_y, tile_type))
+        self.redraw_tiles(tiles + self.light.update_tiles(tiles))
+
+    def install_chunk(self, chunk_key, tile_bytes, edit_states):
+        # a chunk as the server sent it, replacing anything known about it before
+        self.forget_chunk(chunk_key)
+        chunk = Chunk.from_bytes(self.chunk_size, tile_bytes)
+        for index, state in enumerate(edit_states):
+            if state != EDIT_NONE:
+                self.set_edit_state(chunk_key, index, chunk.tiles[index], state)
+        self.loaded_chunks.put(chunk_key, chunk)
+        self.chunk_load_count += 1
+        self.on_chunk_loaded(chunk_key)
+
+    def forget_chunk(self, chunk_key):
+        # the server stops sending a chunk's edits once it is out of view, so nothing about it can be trusted after
+        if chunk_key in self.loaded_chunks:
+            self.on_chunk_evicted(chunk_key, self.loaded_chunks.pop(chunk_key))
+        self.forget_chunk_edits(chunk_key)
+        self.broken_blocks.pop(chunk_key, None)
+
+
+class WorldClient():
+    def __init__(self, host, port, seed, textures):
+        # a copy of the server's world made only from what it sends, see RemoteWorld
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = MessageReader()
+        self.socket.sendall(encode_message(HELLO, HELLO_BODY.pack(seed)))
+
+        # the world can't be made until the server says which player we are
+        messages = []
+        while not messages:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("the server closed the connection before welcoming us")
+            self.reader.feed(data)
+            messages = self.reader.read_messages()
+        kind, body = messages[0]
+        if kind != WELCOME:
+            raise ConnectionError(f"expected a welcome from the server, got message type {kind}")
+        self.player_id, seed, self.tick, chunk_size = WELCOME_BODY.unpack(body)
+        self.waiting = messages[1:]  # arrived along with the welcome
+        self.socket.setblocking(False)
+
+        self.world = RemoteWorld(textures, seed)
+        if chunk_size != self.world.chunk_size:
+            raise ConnectionError(f"the server uses {chunk_size} tile chunks but the client uses {self.world.chunk_size}")
+        self.players = {}  # player id -> (x, y, flip, action, frame index)
+        self.movement = 0
+        self.connected = True
+
+    def send_movement(self, moving_left, moving_right):
+        # only sent when it changes, the server keeps moving the player until told otherwise
+        movement = moving_left | (moving_right << 1)
+        if movement != self.movement:
+            self.movement = movement
+            self.send(encode_input(MOVEMENT, movement))
+
+    def send_action(self, *action):
+        # the same ("jump",), ("break", tile_x, tile_y) or ("place", tile_x, tile_y) as Simulation.queue_action
+        self.send(encode_input(ACTION_KINDS[action[0]], *action[1:]))
+
+    def send(self, data):
+        # input messages are tiny so they are sent straight away
+        try:
+            self.socket.sendall(data)
+        except OSError:
+            self.connected = False
+
+    def poll(self):
+        # handles everything that has arrived, returns False once the server has gone
+        messages = self.waiting
+        self.waiting = []
+        while self.connected:
+            try:
+                data = self.socket.recv(1 << 20)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.connected = False
+                break
+            self.reader.feed(data)
+        messages += self.reader.read_messages()
+        for kind, body in messages:
+            self.handle_message(kind, body)
+        return self.connected
+
+    def handle_message(self, kind, body):
+        world = self.world
+        if kind == CHUNK:
+            world.install_chunk(*decode_chunk(body))
+            # the area was drawn empty while the chunk was on its way
+            chunk_key = CHUNK_KEY.unpack_from(body, 0)
+            if world.changed_areas is not None:
+                chunk_pixels = world.chunk_size * constants.TILE_SIZE
+                world.changed_areas.append(pygame.Rect(chunk_key[0] * chunk_pixels, chunk_key[1] * chunk_pixels - world.vegetation_padding,
+                                                       chunk_pixels, chunk_pixels + world.vegetation_padding))
+        elif kind == FORGET:
+            # the whole chunk is sent again if it comes back into view
+            world.forget_chunk(CHUNK_KEY.unpack(body))
+        elif kind == TICK:
+            self.tick, edits, players, removed = decode_tick(body)
+            if edits:
+                world.apply_edits(edits)
+            for player_id, x, y, flip, action, frame_index in players:
+                self.players[player_id] = (x, y, flip, action, frame_index)
+            for player_id in removed:
+                self.players.pop(player_id, None)
+
+    def get_position(self):
+        # top left of our own player, None until the first tick arrives
+        player = self.players.get(self.player_id)
+        return None if player is None else player[:2]
+
+    def close(self):
+        self.socket.close()
+
+
+def draw_player(surface, knight, state, camera_x, camera_y):
+    # poses a Character as the server last said the player was and draws it
+    x, y, flip, action, frame_index = state
+    knight.rect.topleft = (x, y)
+    frames = knight.animations[action]
+    knight.image = frames[min(frame_index, len(frames) - 1)]
+    if flip:
+        knight.image = sprite_variants.get(knight.image, flip=True)
+    knight.draw_at_position(surface, (x - camera_x, y - camera_y))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Play on a world server, only drawing and sending input")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=constants.SERVER_PORT)
+    parser.add_argument("--seed", type=int, default=5678, help="world to join, players with the same seed share a world")
+    args = parser.parse_args(arguments)
+
+    pygame.init()
+    clock = pygame.time.Clock()
+    pygame.display.set_caption("Computer Science NEA - Platformer")
+    screen = pygame.display.set_mode(constants.WINDOW_SIZE)
+    assets = AssetCache().load()
+    knight_animations = [assets.get_frames(f"knight/{animation_type}") for animation_type in ["idle", "hit", "run", "roll"]]
+
+    client = WorldClient(args.host, args.port, args.seed, TILES.load_textures(assets))
+    world = client.world
+    renderer = WorldRenderer(world, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
+    knight = Character(knight_animations)  # reused to draw every player
+    moving_left = moving_right = False
+    camera_x = camera_y = None
+    view_x = view_y = None  # whole pixel camera of the last drawn frame, mouse clicks are converted with it
+
+    run = True
+    while run and client.poll():
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                run = False
+            if event.type == MOUSEBUTTONDOWN and event.button in (1, 3) and view_x is not None:
+                #range is checked by the server
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+                tile_x = int((mouse_x + view_x) // constants.TILE_SIZE)
+                tile_y = int((mouse_y + view_y) // constants.TILE_SIZE)
+                client.send_action("break" if event.button == 1 else "place", tile_x, tile_y)
+            if event.type == KEYDOWN:
+                if event.key == K_a:
+                    moving_left = True
+                if event.key == K_d:
+                    moving_right = True
+                if event.key in (K_w, K_SPACE):
+                    client.send_action("jump")
+            if event.type == KEYUP:
+                if event.key == K_a:
+                    moving_left = False
+                if event.key == K_d:
+                    moving_right = False
+        client.send_movement(moving_left, moving_right)
+
+        position = client.get_position()
+        if position is None:
+            clock.tick(constants.FPS)
+            continue
+
+        #smooth camera movement centred on our player, the same as the local game
+        target_camera_x = position[0] + knight.rect.width // 2 - constants.WINDOW_SIZE[0] // 2
+        target_camera_y = position[1] + knight.rect.height // 2 - constants.WINDOW_SIZE[1] // 2
+        if camera_x is None:
+            camera_x, camera_y = target_camera_x, target_camera_y
+        camera_x += (target_camera_x - camera_x) * 0.1
+        camera_y += (target_camera_y - camera_y) * 0.1
+
+        view_x, view_y = renderer.update(camera_x, camera_y)
+        renderer.draw(screen)
+        for player_id, state in client.players.items():
+            if player_id != client.player_id:
+                draw_player(screen, knight, state, view_x, view_y)
+        draw_player(screen, knight, client.players[client.player_id], view_x, view_y)
+        pygame.display.update()
+        clock.tick(constants.FPS)
+
+    client.close()
+    pygame.quit()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -22,4 +22,63 @@ PLAYER_SPEED = 5
 BG = (255,255,255)
 
 #player hit range
-PLAYER_HIT_RANGE = 240
\ No newline at end of file
+PLAYER_HIT_RANGE = 240
+
+#background chunk generation processes
+CHUNK_WORKERS = 2
+
+#folder that saved worlds are kept in
+SAVE_FOLDER = "saves"
+
+#frames kept by the frame profiler and the folder its traces are saved in
+PROFILER_HISTORY = 300
+TRACE_FOLDER = "traces"
+
+#seconds between memory telemetry snapshots, they are saved in the trace folder
+MEMORY_SNAPSHOT_INTERVAL = 10
+
+#folder the baked sprite atlas is cached in
+ASSET_CACHE_FOLDER = "cache"
+
+#simulation ticks per second, physics values like PLAYER_SPEED and gravity are per tick
+SIMULATION_RATE = 60
+SIMULATION_STEP_MS = 1000 / SIMULATION_RATE
+
+#longest frame the simulation tries to catch up on, in seconds, so one long stall can't snowball
+MAX_FRAME_TIME = 0.25
+
+#simulation speed while fast forward (tab) is held
+FAST_FORWARD_SPEED = 8
+
+#alpha of the darkness drawn over tiles with no light at all
+MAX_DARKNESS = 230
+
+#zoomed out map images: pixels per tile in the most detailed level, how many levels, and most chunk images kept
+LOD_TILE_PIXELS = 2
+LOD_LEVELS = 5
+LOD_CACHE_LIMIT = 1024
+
+#minimap in the top right corner, toggled with M, and the map level it shows
+MINIMAP_SIZE = (200, 150)
+MINIMAP_LEVEL = 1
+
+#slimes, hitboxes have to be no bigger than a tile for the batched collision checks
+SLIME_SCALE = 3
+SLIME_SIZE = (36, 30)
+SLIME_COUNT = 200
+#slimes further than this from the player (in pixels, each axis) are frozen until the player comes back
+SLIME_ACTIVE_DISTANCE = 1600
+
+#falling blocks and flowing water, most tiles updated per tick and how far water looks sideways for somewhere to fall
+CELL_UPDATE_BUDGET = 256
+WATER_FLOW_DISTANCE = 8
+
+#colours of tiles with no sprite
+SAND_COLOUR = (219, 195, 120)
+WATER_COLOUR = (50, 110, 220, 160)
+
+#headless server, its default port and the most bytes waiting to be sent to one client before it is dropped as too slow
+SERVER_PORT = 4650
+SERVER_MAX_QUEUED = 8 * 1024 * 1024
+#longest message body the server accepts from a client, clients only send seeds and input records
+SERVER_MAX_MESSAGE = 64 * 1024
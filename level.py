@@ -0,0 +1,135 @@
+import os
+import re
+import sys
+import mmap
+import struct
+import argparse
+
+#level file layout
+#header: magic, version, chunk size (tiles per side), chunk count
+#index: chunk x, chunk y of every authored chunk, chunk n's data is the nth slot after the index
+#chunk slots: one signed byte per tile followed by one byte per tile that is 1 where the tile was authored
+#tiles that weren't authored are left to the world generator
+HEADER = struct.Struct("<6sBHI")
+INDEX_ENTRY = struct.Struct("<ii")
+MAGIC = b"NEALVL"
+VERSION = 1
+
+#tile ids in the old text layout are written with no separators, so -1 is the only id with more than one character
+TEXT_TILE = re.compile(r"-1|\d")
+
+
+class LevelFile():
+    def __init__(self, path):
+        # only the index is read up front, chunks are read from the mapped file when the world asks for them
+        self.path = path
+        self.level_file = open(path, "rb")
+        self.level_map = mmap.mmap(self.level_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.chunk_size, chunk_count = HEADER.unpack_from(self.level_map, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a compatible level file")
+
+        self.tiles_per_chunk = self.chunk_size * self.chunk_size
+        self.slot_size = self.tiles_per_chunk * 2
+        self.slots_offset = HEADER.size + chunk_count * INDEX_ENTRY.size
+        self.slots = {}  # chunk key -> slot number
+        self.column_tops = {}  # chunk x -> top row of the highest authored chunk in that column of chunks
+        for slot, chunk_key in enumerate(INDEX_ENTRY.iter_unpack(self.level_map[HEADER.size:self.slots_offset])):
+            self.slots[chunk_key] = slot
+            top = chunk_key[1] * self.chunk_size
+            self.column_tops[chunk_key[0]] = min(top, self.column_tops.get(chunk_key[0], top))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def has_chunk(self, chunk_x, chunk_y):
+        return (chunk_x, chunk_y) in self.slots
+
+    def load_chunk(self, chunk_x, chunk_y):
+        # returns (tile bytes, authored flag bytes) or None if nothing was authored in the chunk
+        slot = self.slots.get((chunk_x, chunk_y))
+        if slot is None:
+            return None
+        start = self.slots_offset + slot * self.slot_size
+        middle = start + self.tiles_per_chunk
+        return self.level_map[start:middle], self.level_map[middle:start + self.slot_size]
+
+    def get_tile(self, tile_x, tile_y):
+        # the authored tile, or None where the generator decides
+        slot = self.slots.get((tile_x // self.chunk_size, tile_y // self.chunk_size))
+        if slot is None:
+            return None
+        index = (tile_y % self.chunk_size) * self.chunk_size + tile_x % self.chunk_size
+        start = self.slots_offset + slot * self.slot_size
+        if not self.level_map[start + self.tiles_per_chunk + index]:
+            return None
+        tile = self.level_map[start + index]
+        return tile - 256 if tile > 127 else tile
+
+    def get_column_top(self, tile_x):
+        # highest row that could hold an authored tile in this column, None if the column has none
+        return self.column_tops.get(tile_x // self.chunk_size)
+
+    def close(self):
+        self.level_map.close()
+        self.level_file.close()
+
+
+def write_level(path, chunk_size, chunks):
+    # chunks is {chunk key: (tile bytes, authored flag bytes)}, written sorted so files are the same every time
+    chunk_keys = sorted(chunks)
+    # written to a temporary file first so a crash can't leave half a level behind
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "wb") as level_file:
+        level_file.write(HEADER.pack(MAGIC, VERSION, chunk_size, len(chunk_keys)))
+        for chunk_key in chunk_keys:
+            level_file.write(INDEX_ENTRY.pack(*chunk_key))
+        for chunk_key in chunk_keys:
+            tile_bytes, authored_bytes = chunks[chunk_key]
+            level_file.write(tile_bytes)
+            level_file.write(authored_bytes)
+    os.replace(temporary_path, path)
+
+
+def read_text_rows(text_path):
+    # one row of tile ids per line, rows can be different lengths
+    rows = []
+    with open(text_path) as text_file:
+        for line in text_file:
+            rows.append([int(tile) for tile in TEXT_TILE.findall(line)])
+    return rows
+
+
+def convert_text_level(text_path, level_path, origin_x=0, origin_y=0, chunk_size=32):
+    # the first tile of the first line goes at tile (origin_x, origin_y), every tile in the text counts as authored
+    tiles_per_chunk = chunk_size * chunk_size
+    chunks = {}
+    for row_number, row in enumerate(read_text_rows(text_path)):
+        tile_y = origin_y + row_number
+        for column_number, tile_type in enumerate(row):
+            tile_x = origin_x + column_number
+            chunk_key = (tile_x // chunk_size, tile_y // chunk_size)
+            if chunk_key not in chunks:
+                chunks[chunk_key] = (bytearray(b"\xff" * tiles_per_chunk), bytearray(tiles_per_chunk))
+            index = (tile_y % chunk_size) * chunk_size + tile_x % chunk_size
+            chunks[chunk_key][0][index] = tile_type & 0xff
+            chunks[chunk_key][1][index] = 1
+    write_level(level_path, chunk_size, chunks)
+    return len(chunks)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Convert a text level layout like level_map.txt into a level file")
+    parser.add_argument("text_level")
+    parser.add_argument("level", help="level file to write, load it in the game with main.py --level")
+    parser.add_argument("--x", type=int, default=0, help="world tile column of the layout's left edge")
+    parser.add_argument("--y", type=int, default=0, help="world tile row of the layout's top line")
+    args = parser.parse_args(arguments)
+
+    chunk_count = convert_text_level(args.text_level, args.level, args.x, args.y)
+    print(f"wrote {chunk_count} chunks to {args.level}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
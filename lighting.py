@@ -0,0 +1,163 @@
+import sys
+import numpy as np
+
+#light levels go from 0 (pitch black) to MAX_LIGHT (open sky)
+MAX_LIGHT = 15
+AIR_FALLOFF = 1  # light lost per tile of air
+SOLID_FALLOFF = 3  # light lost per solid tile, so it only reaches a few tiles into the ground
+LIGHT_RANGE = MAX_LIGHT // AIR_FALLOFF  # furthest a change in light can spread
+
+
+class LightMap():
+    def __init__(self, world):
+        # skylight shines straight down each column to the first solid tile, then spreads sideways and into the ground
+        # tiles that give off light (TileType.light) spread it the same way, whichever is brighter lights a tile
+        # one light array per loaded chunk, recomputed only in the area around a change
+        self.world = world
+        self.chunk_light = {}  # chunk key -> (chunk_size, chunk_size) uint8 array indexed [y, x]
+        self.sky_heights = {}  # tile x -> row of the highest solid tile in that column
+
+    def get_memory_size(self):
+        return sum(light.nbytes for light in self.chunk_light.values()) + sys.getsizeof(self.sky_heights)
+
+    def get_light(self, tile_x, tile_y):
+        # None when the tile's chunk isn't loaded, those are drawn at full brightness
+        size = self.world.chunk_size
+        light = self.chunk_light.get((tile_x // size, tile_y // size))
+        if light is None:
+            return None
+        return int(light[tile_y % size, tile_x % size])
+
+    def get_sky_height(self, tile_x):
+        if tile_x in self.sky_heights:
+            return self.sky_heights[tile_x]
+
+        # the generated surface tile is always solid, only edits and authored levels can move the sky height up or down
+        world = self.world
+        sky_height = world.generate_height_at(tile_x)
+        for tile_y, tile_type in world.column_edits.get(tile_x, {}).items():
+            if tile_type != -1 and tile_y < sky_height:
+                sky_height = tile_y
+        level_top = world.level.get_column_top(tile_x) if world.level else None
+        if level_top is not None:
+            sky_height = min(sky_height, level_top)
+        while world.get_tile_at(tile_x, sky_height) == -1:
+            sky_height += 1
+        self.sky_heights[tile_x] = sky_height
+        return sky_height
+
+    def forget_chunk(self, chunk_key):
+        self.chunk_light.pop(chunk_key, None)
+        # saved edits in the chunk may not be in memory any more
+        start_x = chunk_key[0] * self.world.chunk_size
+        for tile_x in range(start_x, start_x + self.world.chunk_size):
+            self.sky_heights.pop(tile_x, None)
+
+    def light_chunk(self, chunk_key):
+        # called when a chunk loads, its light and the light it spills into loaded neighbours are worked out
+        size = self.world.chunk_size
+        start_x = chunk_key[0] * size
+        start_y = chunk_key[1] * size
+        for tile_x in range(start_x, start_x + size):
+            self.sky_heights.pop(tile_x, None)
+        return self.relight_area(start_x - LIGHT_RANGE, start_y - LIGHT_RANGE, size + LIGHT_RANGE * 2, size + LIGHT_RANGE * 2)
+
+    def update_tile(self, tile_x, tile_y, tile_type):
+        # called after a tile changes, only the area the change can reach is relit
+        return self.update_tiles([(tile_x, tile_y, tile_type)])
+
+    def update_tiles(self, tiles):
+        # several changed (tile x, tile y, tile type) relit as one area covering everything they can reach
+        if not tiles:
+            return []
+        rows = []
+        for tile_x, tile_y, _ in tiles:
+            rows.append(tile_y)
+            old_sky_height = self.sky_heights.pop(tile_x, None)
+            if old_sky_height is not None:
+                rows.append(old_sky_height)
+        columns = [tile_x for tile_x, _, _ in tiles]
+        rows += [self.get_sky_height(tile_x) for tile_x in set(columns)]
+        left = min(columns) - LIGHT_RANGE
+        top = min(rows) - LIGHT_RANGE
+        return self.relight_area(left, top, max(columns) + LIGHT_RANGE - left + 1, max(rows) + LIGHT_RANGE - top + 1)
+
+    def read_area(self, start_x, start_y, width, height):
+        # tiles and current light of an area and a one tile border, plus which of those tiles are in loaded chunks
+        world = self.world
+        size = world.chunk_size
+        tiles = np.full((height + 2, width + 2), -1, np.int8)
+        light = np.zeros((height + 2, width + 2), np.int16)
+        loaded = np.zeros((height + 2, width + 2), np.bool_)
+        left, top = start_x - 1, start_y - 1
+        for chunk_y in range(top // size, (top + height + 1) // size + 1):
+            for chunk_x in range(left // size, (left + width + 1) // size + 1):
+                chunk = world.loaded_chunks.peek((chunk_x, chunk_y))
+                if chunk is None:
+                    continue
+                # overlap of the chunk and the area, in area coordinates
+                x0 = max(chunk_x * size - left, 0)
+                y0 = max(chunk_y * size - top, 0)
+                x1 = min((chunk_x + 1) * size - left, width + 2)
+                y1 = min((chunk_y + 1) * size - top, height + 2)
+                chunk_x0 = left + x0 - chunk_x * size
+                chunk_y0 = top + y0 - chunk_y * size
+                chunk_tiles = np.frombuffer(chunk.tiles, np.int8).reshape(size, size)
+                tiles[y0:y1, x0:x1] = chunk_tiles[chunk_y0:chunk_y0 + y1 - y0, chunk_x0:chunk_x0 + x1 - x0]
+                loaded[y0:y1, x0:x1] = True
+                chunk_light = self.chunk_light.get((chunk_x, chunk_y))
+                if chunk_light is not None:
+                    light[y0:y1, x0:x1] = chunk_light[chunk_y0:chunk_y0 + y1 - y0, chunk_x0:chunk_x0 + x1 - x0]
+        return tiles, light, loaded
+
+    def relight_area(self, start_x, start_y, width, height):
+        # recomputes light inside the area from the sky and the light already around its edge
+        # returns the tiles whose light changed as (tile x, tile y, light)
+        tiles, old_light, loaded = self.read_area(start_x, start_y, width, height)
+        inside = np.zeros(loaded.shape, np.bool_)
+        inside[1:-1, 1:-1] = True
+        inside &= loaded
+        if not inside.any():
+            return []
+
+        # skylight, every tile down to and including the first solid one in its column, or the tile's own light if brighter
+        rows = np.arange(start_y - 1, start_y + height + 1)[:, None]
+        sky_heights = np.array([self.get_sky_height(tile_x) for tile_x in range(start_x - 1, start_x + width + 1)])
+        falloff = self.world.tiles.light_falloff_array[tiles]
+        light = np.where(inside, np.maximum(np.where(rows <= sky_heights, MAX_LIGHT, 0), self.world.tiles.light_array[tiles]), old_light)
+
+        # spread one tile further each pass until nothing changes, light can't travel more than LIGHT_RANGE tiles
+        for _ in range(LIGHT_RANGE + 1):
+            brightest = np.zeros(light.shape, np.int16)
+            np.maximum(brightest[1:], light[:-1], out=brightest[1:])
+            np.maximum(brightest[:-1], light[1:], out=brightest[:-1])
+            np.maximum(brightest[:, 1:], light[:, :-1], out=brightest[:, 1:])
+            np.maximum(brightest[:, :-1], light[:, 1:], out=brightest[:, :-1])
+            spread = np.where(inside, np.maximum(light, brightest - falloff), light)
+            if np.array_equal(spread, light):
+                break
+            light = spread
+
+        # chunks lit for the first time count as fully bright before, the same as how they were drawn
+        size = self.world.chunk_size
+        old_light = old_light.copy()
+        changed = []
+        for chunk_y in range(start_y // size, (start_y + height - 1) // size + 1):
+            for chunk_x in range(start_x // size, (start_x + width - 1) // size + 1):
+                x0 = max(chunk_x * size - start_x, 0) + 1
+                y0 = max(chunk_y * size - start_y, 0) + 1
+                x1 = min((chunk_x + 1) * size - start_x, width) + 1
+                y1 = min((chunk_y + 1) * size - start_y, height) + 1
+                if not loaded[y0, x0]:
+                    continue
+                chunk_key = (chunk_x, chunk_y)
+                if chunk_key not in self.chunk_light:
+                    self.chunk_light[chunk_key] = np.zeros((size, size), np.uint8)
+                    old_light[y0:y1, x0:x1] = MAX_LIGHT
+                chunk_x0 = start_x + x0 - 1 - chunk_x * size
+                chunk_y0 = start_y + y0 - 1 - chunk_y * size
+                self.chunk_light[chunk_key][chunk_y0:chunk_y0 + y1 - y0, chunk_x0:chunk_x0 + x1 - x0] = light[y0:y1, x0:x1]
+
+        for y, x in zip(*np.nonzero((light != old_light) & inside)):
+            changed.append((start_x + int(x) - 1, start_y + int(y) - 1, int(light[y, x])))
+        return changed
@@ -0,0 +1,201 @@
+import os
+import sys
+import json
+import time
+import random
+import signal
+import socket
+import argparse
+import selectors
+import subprocess
+import constants
+from protocol import MessageReader, encode_message, encode_input, decode_tick, HELLO, WELCOME, CHUNK, TICK, HELLO_BODY, WELCOME_BODY
+from replay import MOVEMENT, JUMP, BREAK, PLACE
+
+
+class FakeClient():
+    def __init__(self, host, port, seed, script_seed):
+        # a scripted player that never draws anything, it reads what the server sends and reacts to its own position
+        self.socket = socket.create_connection((host, port))
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.socket.sendall(encode_message(HELLO, HELLO_BODY.pack(seed)))
+        self.socket.setblocking(False)
+        self.reader = MessageReader()
+        self.random = random.Random(script_seed)
+        self.player_id = None
+        self.position = None
+        self.movement = 0
+        self.connected = True
+
+        # stats
+        self.ticks = 0
+        self.first_tick_time = None
+        self.last_tick_time = None
+        self.bytes_received = 0
+        self.chunk_messages = 0
+        self.chunk_bytes = 0
+        self.edits = 0
+
+    def send_input(self, kind, x=0, y=0):
+        try:
+            self.socket.send(encode_input(kind, x, y))
+        except OSError:
+            # a full socket only loses this one input, the script carries on
+            pass
+
+    def read(self):
+        while True:
+            try:
+                data = self.socket.recv(1 << 20)
+            except BlockingIOError:
+                break
+            except OSError:
+                data = b""
+            if not data:
+                self.connected = False
+                break
+            self.bytes_received += len(data)
+            self.reader.feed(data)
+        for kind, body in self.reader.read_messages():
+            if kind == WELCOME:
+                self.player_id = WELCOME_BODY.unpack(body)[0]
+            elif kind == CHUNK:
+                self.chunk_messages += 1
+                self.chunk_bytes += len(body)
+            elif kind == TICK:
+                _, edits, players, _ = decode_tick(body)
+                self.edits += len(edits)
+                for player_id, x, y, _, _, _ in players:
+                    if player_id == self.player_id:
+                        self.position = (x, y)
+                self.on_tick()
+
+    def on_tick(self):
+        # walks one way for a while, jumps now and then and digs or builds next to itself
+        now = time.perf_counter()
+        if self.first_tick_time is None:
+            self.first_tick_time = now
+        self.last_tick_time = now
+        self.ticks += 1
+
+        if self.ticks % constants.SIMULATION_RATE == 1:
+            movement = self.random.choice((0, 1, 1, 2, 2))  # mostly walking, bit 0 left and bit 1 right
+            if movement != self.movement:
+                self.movement = movement
+                self.send_input(MOVEMENT, movement)
+        if self.random.random() < 1 / 40:
+            self.send_input(JUMP)
+        if self.position and self.random.random() < 1 / 15:
+            tile_x = self.position[0] // constants.TILE_SIZE + self.random.randint(-2, 2)
+            tile_y = self.position[1] // constants.TILE_SIZE + self.random.randint(-1, 2)
+            self.send_input(BREAK if self.random.random() < 0.7 else PLACE, tile_x, tile_y)
+
+    def get_tick_rate(self):
+        # ticks a second this client received, the server's tick rate if it is keeping up
+        if self.ticks < 2:
+            return 0
+        return (self.ticks - 1) / max(self.last_tick_time - self.first_tick_time, 1e-9)
+
+    def close(self):
+        self.socket.close()
+
+
+def start_server():
+    # runs server.py on a free port, returns the process and the port it is listening on
+    server_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")
+    process = subprocess.Popen([sys.executable, server_path, "--port", "0", "--stats", "0", "--summary"],
+                               stdout=subprocess.PIPE, text=True)
+    line = process.stdout.readline()
+    if not line.startswith("listening on"):
+        process.kill()
+        raise RuntimeError(f"server didn't start: {line!r}")
+    return process, int(line.rsplit(":", 1)[1])
+
+
+def stop_server(process):
+    # the server prints its stats as json when interrupted, returns them
+    process.send_signal(signal.SIGINT)
+    output, _ = process.communicate(timeout=30)
+    lines = output.strip().splitlines()
+    return json.loads(lines[-1]) if lines else None
+
+
+def run(clients, seeds, duration, host, port):
+    # connects every fake client, lets them play for duration seconds and returns their combined stats
+    selector = selectors.DefaultSelector()
+    fake_clients = []
+    for index in range(clients):
+        fake_client = FakeClient(host, port, 1000 + index % seeds, index)
+        selector.register(fake_client.socket, selectors.EVENT_READ, fake_client)
+        fake_clients.append(fake_client)
+
+    end_time = time.perf_counter() + duration
+    while time.perf_counter() < end_time:
+        for key, _ in selector.select(0.1):
+            fake_client = key.data
+            fake_client.read()
+            if not fake_client.connected:
+                selector.unregister(fake_client.socket)
+    for fake_client in fake_clients:
+        fake_client.close()
+    selector.close()
+
+    tick_rates = sorted(fake_client.get_tick_rate() for fake_client in fake_clients)
+    return {
+        "clients": clients,
+        "seeds": seeds,
+        "seconds": duration,
+        "disconnected": sum(1 for fake_client in fake_clients if not fake_client.connected),
+        "ticks_received": sum(fake_client.ticks for fake_client in fake_clients),
+        "tick_rate_min": tick_rates[0] if tick_rates else 0,
+        "tick_rate_mean": sum(tick_rates) / max(len(tick_rates), 1),
+        "bytes_received": sum(fake_client.bytes_received for fake_client in fake_clients),
+        "chunk_messages": sum(fake_client.chunk_messages for fake_client in fake_clients),
+        "chunk_bytes": sum(fake_client.chunk_bytes for fake_client in fake_clients),
+        "edits_received": sum(fake_client.edits for fake_client in fake_clients),
+    }
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Connect scripted fake clients to a world server to measure its throughput")
+    parser.add_argument("--clients", type=int, default=50)
+    parser.add_argument("--seeds", type=int, default=1, help="worlds the clients are spread over, clients on the same seed share one")
+    parser.add_argument("--duration", type=float, default=30, help="seconds the clients play for")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=constants.SERVER_PORT)
+    parser.add_argument("--spawn", action="store_true", help="start a server just for this run and measure its cpu time")
+    parser.add_argument("--output", help="also save the results to this json file")
+    args = parser.parse_args(arguments)
+
+    server_process = None
+    server_stats = None
+    port = args.port
+    if args.spawn:
+        server_process, port = start_server()
+    try:
+        results = {"load": run(args.clients, max(args.seeds, 1), args.duration, args.host, port)}
+    finally:
+        if server_process:
+            server_stats = stop_server(server_process)
+    if server_stats:
+        # cpu time of the server process alone, so this is per core however many the machine has
+        results["server"] = server_stats
+        results["sessions_per_core"] = server_stats["player_ticks_per_cpu_second"] / constants.SIMULATION_RATE
+
+    load = results["load"]
+    print(f"{load['clients']} clients on {load['seeds']} seeds for {load['seconds']:.0f}s: "
+          f"{load['tick_rate_mean']:.1f} ticks/s mean, {load['tick_rate_min']:.1f} min, "
+          f"{load['bytes_received'] / load['seconds'] / 1024:.0f}KB/s received, {load['disconnected']} disconnected")
+    if "server" in results:
+        server = results["server"]
+        print(f"server tick {server['tick_ms_mean']:.2f}ms mean {server['tick_ms_p95']:.2f}ms p95, {server['late_ticks']} late ticks, "
+              f"{server['player_ticks_per_cpu_second']:.0f} player ticks per cpu second "
+              f"(~{results['sessions_per_core']:.0f} sessions per core at {constants.SIMULATION_RATE} ticks/s)")
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(results, output_file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
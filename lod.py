@@ -0,0 +1,135 @@
+from collections import OrderedDict
+import numpy as np
+import pygame
+import constants
+from lighting import MAX_LIGHT
+from assets import get_surface_bytes
+
+
+class LodPyramid():
+    def __init__(self, world, tile_pixels=constants.LOD_TILE_PIXELS, levels=constants.LOD_LEVELS, max_chunks=constants.LOD_CACHE_LIMIT):
+        # level 0 is one small image per chunk with a few pixels per tile, every level above halves the detail
+        # by combining 2x2 images of the level below, so any zoom draws about one screen's worth of images
+        self.world = world
+        self.tile_pixels = tile_pixels
+        self.levels = levels
+        self.max_chunks = max_chunks
+        self.image_size = world.chunk_size * tile_pixels
+        self.chunk_images = OrderedDict()  # chunk key -> level 0 image, kept after the chunk itself is evicted
+        self.group_images = {}  # (level, group x, group y) -> combined image for levels above 0
+        self.dirty_groups = set()  # group images that need rebuilding before they are next drawn
+        self.palette = self.make_palette()
+
+    def make_palette(self):
+        # one colour per tile id, the average colour of its sprite or the registry's colour when it has none
+        world = self.world
+        palette = world.tiles.colour_array.copy()
+        palette[:, 3] = np.where(palette[:, 3] > 0, 255, 0)
+        for tile_type, frames in enumerate(world.tile_frames):
+            if frames:
+                # the surface is mostly dirt with grass on top, the grass is what it should look like from far away
+                area = frames[0].get_rect()
+                if tile_type == world.surface_tile:
+                    area.height //= 4
+                palette[tile_type] = pygame.transform.average_color(frames[0], area)[:3] + (255,)
+        return palette
+
+    def get_colours(self, tiles, light):
+        # colours for an array of tiles, darkened the same way as the full size tiles
+        colours = self.palette[tiles]
+        if light is None:
+            return colours
+        darkness = np.round(constants.MAX_DARKNESS * (MAX_LIGHT - light.astype(np.int16)) / MAX_LIGHT)
+        solid = colours[..., 3] > 0
+        colours[..., :3] = np.where(solid[..., None], colours[..., :3] * (1 - darkness[..., None] / 255), 0)
+        colours[..., 3] = np.where(solid, 255, darkness)
+        return colours
+
+    def mark_groups_dirty(self, chunk_x, chunk_y):
+        for level in range(1, self.levels):
+            self.dirty_groups.add((level, chunk_x >> level, chunk_y >> level))
+
+    def render_chunk(self, chunk_key):
+        # called once a loaded chunk has its light
+        chunk = self.world.loaded_chunks.peek(chunk_key)
+        if chunk is None:
+            return
+        size = self.world.chunk_size
+        tiles = np.frombuffer(chunk.tiles, np.int8).reshape(size, size)
+        colours = self.get_colours(tiles, self.world.light.chunk_light.get(chunk_key))
+        pixels = np.repeat(np.repeat(colours, self.tile_pixels, axis=0), self.tile_pixels, axis=1)
+        image = pygame.image.frombytes(pixels.tobytes(), (self.image_size, self.image_size), "RGBA")
+        # in the screen's pixel format so drawing doesn't have to convert it every time
+        self.chunk_images[chunk_key] = image.convert_alpha() if pygame.display.get_surface() else image
+        self.chunk_images.move_to_end(chunk_key)
+        self.mark_groups_dirty(*chunk_key)
+        while len(self.chunk_images) > self.max_chunks:
+            evicted_key, _ = self.chunk_images.popitem(last=False)
+            self.mark_groups_dirty(*evicted_key)
+
+    def update_tiles(self, tiles):
+        # tiles are (tile x, tile y, anything) whose tile or light changed, only their pixels are redrawn
+        size = self.world.chunk_size
+        for tile_x, tile_y, _ in tiles:
+            chunk_key = (tile_x // size, tile_y // size)
+            image = self.chunk_images.get(chunk_key)
+            chunk = self.world.loaded_chunks.peek(chunk_key)
+            if image is None or chunk is None:
+                continue
+            local_x = tile_x % size
+            local_y = tile_y % size
+            light = self.world.light.get_light(tile_x, tile_y)
+            colour = self.get_colours(np.array([chunk.get_tile(local_x, local_y)], np.int8), None if light is None else np.array([light]))[0]
+            image.fill(tuple(int(value) for value in colour),
+                       (local_x * self.tile_pixels, local_y * self.tile_pixels, self.tile_pixels, self.tile_pixels))
+            self.mark_groups_dirty(*chunk_key)
+
+    def get_memory_size(self):
+        images = list(self.chunk_images.values()) + list(self.group_images.values())
+        return sum(get_surface_bytes(image) for image in images)
+
+    def get_image(self, level, group_x, group_y):
+        # None if nothing in the group has been seen yet
+        if level == 0:
+            return self.chunk_images.get((group_x, group_y))
+        key = (level, group_x, group_y)
+        if key in self.dirty_groups or key not in self.group_images:
+            self.dirty_groups.discard(key)
+            self.group_images[key] = self.combine_group(level, group_x, group_y)
+        return self.group_images[key]
+
+    def combine_group(self, level, group_x, group_y):
+        # shrinks the four images of the level below into the quarters of one image
+        half = self.image_size // 2
+        image = None
+        for dy in range(2):
+            for dx in range(2):
+                child = self.get_image(level - 1, group_x * 2 + dx, group_y * 2 + dy)
+                if child is None:
+                    continue
+                if image is None:
+                    image = pygame.Surface((self.image_size, self.image_size), pygame.SRCALPHA)
+                image.blit(pygame.transform.smoothscale(child, (half, half)), (dx * half, dy * half))
+        return image
+
+    def draw(self, surface, level, center_x, center_y):
+        # draws the world zoomed out to the given level, centered on a world pixel position
+        group_pixels = self.world.chunk_size * constants.TILE_SIZE << level  # world pixels covered by one image
+        scale = self.image_size / group_pixels  # screen pixels per world pixel
+        width, height = surface.get_size()
+        left = center_x - width / 2 / scale
+        top = center_y - height / 2 / scale
+        for group_y in range(int(top // group_pixels), int((top + height / scale) // group_pixels) + 1):
+            for group_x in range(int(left // group_pixels), int((left + width / scale) // group_pixels) + 1):
+                image = self.get_image(level, group_x, group_y)
+                if image is not None:
+                    surface.blit(image, (round((group_x * group_pixels - left) * scale), round((group_y * group_pixels - top) * scale)))
+        return scale
+
+    def draw_minimap(self, surface, rect, level, center_x, center_y):
+        # a small zoomed out view in a box, with a dot where the centre (the player) is
+        minimap = surface.subsurface(rect)
+        minimap.fill(constants.BG)
+        self.draw(minimap, level, center_x, center_y)
+        pygame.draw.circle(minimap, (220, 40, 40), (rect.width // 2, rect.height // 2), 3)
+        pygame.draw.rect(surface, (0, 0, 0), rect, 2)
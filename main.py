@@ -1,187 +1,223 @@
+import os
+import sys
+import time
+import argparse
 import pygame
 from pygame.locals import *
 import constants
 from character import Character
 from world import World
-
-pygame.init()
-clock = pygame.time.Clock()
-
-#Create Screen
-pygame.display.set_caption("Computer Science NEA - Platformer")
-screen = pygame.display.set_mode(constants.WINDOW_SIZE)
-
-#Scale image function
-def scale_img(image, scale):
-    w = image.get_width()
-    h = image.get_height()
-    return pygame.transform.scale(image, ((w * scale), (h * scale)))
-
-#load player images
-#player image array structure#
-#[[idle], [hit], [run], [roll]]
-knight_animations = []
-knight_animation_types = ["idle", "hit", "run", "roll"]
-for animation_type in knight_animation_types:
-    frames = []
-    for x in range(1,9):
-        try:
-            image = pygame.image.load(f"C:/Users/quick/OneDrive/Documents/Computer-Science-NEA/Assets/sprites/knight/{animation_type}/knight_{x}.png").convert_alpha()
-            frames.append(scale_img(image, constants.PLAYER_SCALE))
-        except FileNotFoundError:
-            continue
-    knight_animations.append(frames)
-
-#load ground tiles
-#ground tiles array structure
-#[[green_surface], [green_dirt], [stones]]
-ground_sprites = []
-ground_sprite_types = ["surface", "ground", "stone"]
-for ground_type in ground_sprite_types:
-    frames = []
-    for i in range(1,4):
-        try:
-            image = pygame.image.load(f"C:/Users/quick/OneDrive/Documents/Computer-Science-NEA/Assets/sprites/grounds/green_{ground_type}/{ground_type}_{i}.png").convert_alpha()
-            frames.append(scale_img(image, constants.TILE_SCALE))
-        except FileNotFoundError:
-            continue
-    ground_sprites.append(frames)
-
-vegetation_sprites = []
-vegetation_sprite_types = ["tree1", "bush"]
-for vegetation_type in vegetation_sprite_types:
-    frames = []
-    for i in range(1,5):
-        try:
-            image = pygame.image.load(f"C:/Users/quick/OneDrive/Documents/Computer-Science-NEA/Assets/sprites/vegetation/{vegetation_type}/{vegetation_type}_{i}.png").convert_alpha()
-            frames.append(scale_img(image, constants.TILE_SCALE))
-        except FileNotFoundError:
-            continue
-    vegetation_sprites.append(frames)
-
-
-wood_sprites = []
-wood_sprite_types = ["plank"]
-for wood_type in wood_sprite_types:
-    frames = []
-    for i in range(1,5):
-        try:
-            image = pygame.image.load(f"C:/Users/quick/OneDrive/Documents/Computer-Science-NEA/Assets/sprites/vegetation/{wood_type}/{wood_type}_{i}.png").convert_alpha()
-            frames.append(scale_img(image, constants.TILE_SCALE))
-        except FileNotFoundError:
-            continue
-    vegetation_sprites.append(frames)
-
-world = World(ground_sprites, vegetation_sprites, seed=5678)  #use fixed seed for consistent world
-knight = Character(knight_animations)
-
-#start player above ground level
-surface_height = world.generate_height_at(knight.rect.centerx // constants.TILE_SIZE)
-knight.rect.midbottom = (400, surface_height * constants.TILE_SIZE - 10)
-
-#movement variables
-moving_left = False
-moving_right = False
-
-
-#camera variables
-camera_x = knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
-camera_y = knight.rect.centery - constants.WINDOW_SIZE[1] // 2
-
-#main loop
-run = True
-while run:
-    screen.fill(constants.BG)
-
-    #update world chunks around player
-    world.update_chunks_around_player(knight.rect.centerx, knight.rect.centery)
-
-    #calculate target camera position (centered on player)
-    target_camera_x = knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
-    target_camera_y = knight.rect.centery - constants.WINDOW_SIZE[1] // 2
-
-    #smooth camera movement
-    camera_speed = 0.1
-    camera_x += (target_camera_x - camera_x) * camera_speed
-    camera_y += (target_camera_y - camera_y) * camera_speed
-
-    #draw world
-    world.draw(screen, camera_x, camera_y, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
-
-    #get obstacles for collision detection
-    obstacles = world.get_obstacles_in_area(camera_x, camera_y, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
-
-    #handle input
-    knight.vel_x = 0
-    if moving_right:
-        knight.vel_x = constants.PLAYER_SPEED
-    if moving_left:
-        knight.vel_x = -constants.PLAYER_SPEED
-
-    knight.move(obstacles)
-    knight.update()
-
-    # Calculate player screen position
-    player_screen_x = knight.rect.x - camera_x
-    player_screen_y = knight.rect.y - camera_y
-    
-    knight.draw_at_position(screen, (player_screen_x, player_screen_y))
-
-    #event handler
-    for event in pygame.event.get():
-        if event.type == QUIT:
-            run = False
-        
-        if event.type == MOUSEBUTTONDOWN and event.button == 1:  # Left mouse button
-            #get mouse position
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            
-            #convert screen coordinates to world coordinates using camera offset
-            world_x = mouse_x + camera_x
-            world_y = mouse_y + camera_y
-            
-            #convert world coordinates to tile coordinates
-            tile_x = world_x // constants.TILE_SIZE
-            tile_y = world_y // constants.TILE_SIZE
-            
-            #check if player is in range of this tile
-            if knight.is_tile_in_range(tile_x, tile_y, obstacles, 0):
-                print("block broken")
-                world.remove_block_at(tile_x, tile_y)
-        
-        if event.type == MOUSEBUTTONDOWN and event.button == 3:  #right mouse button
-            #get mouse position
-            mouse_x, mouse_y = pygame.mouse.get_pos()
-            
-            #convert screen coordinates to world coordinates using camera offset
-            world_x = mouse_x + camera_x
-            world_y = mouse_y + camera_y
-            
-            #convert world coordinates to tile coordinates
-            tile_x = world_x // constants.TILE_SIZE
-            tile_y = world_y // constants.TILE_SIZE
-
-            #check if player is in range of this tile
-            if knight.is_tile_in_range(tile_x, tile_y, obstacles, 1):
-                obstacles = world.add_block_at(tile_x, tile_y, obstacles)
-
-        #key pressed
-        if event.type == KEYDOWN:
-            if event.key == K_a:
-                moving_left = True
-            if event.key == K_d:
-                moving_right = True
-            if event.key in (K_w, K_SPACE):
-                knight.jump()
-
-        #key released
-        if event.type == KEYUP:
-            if event.key == K_a:
-                moving_left = False
-            if event.key == K_d:
-                moving_right = False
-
-    pygame.display.update()
-    clock.tick(constants.FPS)
-
-pygame.quit()
\ No newline at end of file
+from tiles import TILES
+from chunk_loader import ChunkLoader
+from region_store import RegionStore
+from profiler import FrameProfiler
+from telemetry import MemoryTelemetry
+from assets import AssetCache, get_surface_bytes
+from simulation import Simulation
+from replay import Recorder
+from renderer import WorldRenderer
+from mobs import MobGroup, SLIME_KINDS, spawn_slimes
+from level import LevelFile
+from lod import LodPyramid
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Computer Science NEA - Platformer")
+    parser.add_argument("--record", help="record the session's input to this file, replay it with replay.py")
+    parser.add_argument("--telemetry", action="store_true", help="trace memory from the start, F5 turns it on and off while playing")
+    parser.add_argument("--level", help="level file whose hand built chunks replace the generated ones, made with level.py")
+    args = parser.parse_args(arguments)
+
+    pygame.init()
+    clock = pygame.time.Clock()
+
+    #Create Screen
+    pygame.display.set_caption("Computer Science NEA - Platformer")
+    screen = pygame.display.set_mode(constants.WINDOW_SIZE)
+
+    #load every sprite from the baked atlas, rebuilt only when the source images change
+    assets = AssetCache().load()
+
+    #player image array structure
+    #[[idle], [hit], [run], [roll]]
+    knight_animations = [assets.get_frames(f"knight/{animation_type}") for animation_type in ["idle", "hit", "run", "roll"]]
+
+    #tile textures, every sprite group a tile in the registry is drawn with
+    tile_textures = TILES.load_textures(assets)
+
+    #slime array structure, one entry per kind
+    #[[idle], [move]]
+    slime_animations = [[assets.get_frames(f"{kind}/idle"), assets.get_frames(f"{kind}/move")] for kind in SLIME_KINDS]
+
+    world = World(tile_textures, seed=5678)  #use fixed seed for consistent world
+    if args.level:
+        world.set_level(LevelFile(args.level))
+    world.chunk_loader = ChunkLoader(world.seed, constants.CHUNK_WORKERS, args.level)
+    world.lod = LodPyramid(world)
+    save_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), constants.SAVE_FOLDER, f"world_{world.seed}")
+    if not args.record:
+        #recorded sessions start from the seed alone so they replay the same on any machine
+        world.chunk_store = RegionStore(save_directory, world.chunk_size)
+    knight = Character(knight_animations)
+
+    #start player above ground level
+    surface_height = world.generate_height_at(knight.rect.centerx // constants.TILE_SIZE)
+    knight.rect.midbottom = (400, surface_height * constants.TILE_SIZE - 10)
+
+    #the simulation owns movement, camera and block edits and runs at a fixed tick rate
+    mobs = MobGroup(slime_animations, world.seed)
+    spawn_slimes(mobs, world, knight.rect.centerx, constants.SLIME_COUNT, world.seed)
+    simulation = Simulation(world, knight, mobs)
+    recorder = Recorder(simulation) if args.record else None
+    step_seconds = 1 / constants.SIMULATION_RATE
+    accumulator = 0
+    last_time = time.perf_counter()
+    fast_forward = False
+
+    #camera used for the last rendered frame, mouse clicks are converted with it
+    camera_x, camera_y = simulation.camera_x, simulation.camera_y
+
+    #keeps the drawn world between frames and only redraws what scrolled into view or was edited
+    renderer = WorldRenderer(world, constants.WINDOW_SIZE[0], constants.WINDOW_SIZE[1])
+
+    #map view, 0 is the normal camera and each level above zooms out further using the chunk image pyramid
+    map_level = 0
+    show_minimap = True
+    minimap_rect = pygame.Rect(constants.WINDOW_SIZE[0] - constants.MINIMAP_SIZE[0] - 10, 10, *constants.MINIMAP_SIZE)
+
+    #frame profiler, F3 shows the overlay and F4 saves a trace
+    profiler = FrameProfiler(constants.PROFILER_HISTORY)
+    trace_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), constants.TRACE_FOLDER)
+
+    #memory telemetry, off unless --telemetry or F5, writes a snapshot of memory use every few seconds while it is on
+    telemetry = MemoryTelemetry(world, os.path.join(trace_folder, f"memory_{int(time.time())}.jsonl"), constants.MEMORY_SNAPSHOT_INTERVAL)
+    telemetry.track("sprite atlas", assets.get_memory_size)
+    telemetry.track("mobs", mobs.get_memory_size)
+    telemetry.track("renderer layer", lambda: get_surface_bytes(renderer.layer))
+    if args.telemetry:
+        telemetry.enable()
+
+    #main loop
+    run = True
+    while run:
+        profiler.begin_frame()
+        telemetry.begin_frame()
+
+        #event handler
+        for event in pygame.event.get():
+            if event.type == QUIT:
+                run = False
+
+            if event.type == MOUSEBUTTONDOWN and event.button in (1, 3) and not map_level:  # left mouse button breaks, right places
+                #get mouse position
+                mouse_x, mouse_y = pygame.mouse.get_pos()
+
+                #convert screen coordinates to world coordinates using camera offset
+                world_x = mouse_x + camera_x
+                world_y = mouse_y + camera_y
+
+                #convert world coordinates to tile coordinates
+                tile_x = int(world_x // constants.TILE_SIZE)
+                tile_y = int(world_y // constants.TILE_SIZE)
+
+                #range is checked by the simulation on the next tick
+                simulation.queue_action("break" if event.button == 1 else "place", tile_x, tile_y)
+
+            #key pressed
+            if event.type == KEYDOWN:
+                if event.key == K_a:
+                    simulation.moving_left = True
+                if event.key == K_d:
+                    simulation.moving_right = True
+                if event.key in (K_w, K_SPACE):
+                    simulation.queue_action("jump")
+                if event.key == K_TAB:
+                    fast_forward = True
+                if event.key == K_m:
+                    show_minimap = not show_minimap
+                if event.key == K_MINUS:
+                    map_level = min(map_level + 1, constants.LOD_LEVELS)
+                if event.key == K_EQUALS:
+                    map_level = max(map_level - 1, 0)
+                if event.key == K_F3:
+                    profiler.toggle()
+                if event.key == K_F4 and profiler.enabled:
+                    os.makedirs(trace_folder, exist_ok=True)
+                    print("trace saved to", profiler.export_trace(os.path.join(trace_folder, f"trace_{int(time.time())}.json")))
+                if event.key == K_F5:
+                    telemetry.toggle()
+                    print("memory telemetry", "on" if telemetry.enabled else "off, snapshots saved to " + telemetry.snapshot_path)
+
+            #key released
+            if event.type == KEYUP:
+                if event.key == K_a:
+                    simulation.moving_left = False
+                if event.key == K_d:
+                    simulation.moving_right = False
+                if event.key == K_TAB:
+                    fast_forward = False
+        profiler.mark("events")
+
+        #run as many fixed ticks as real time has passed, a slow frame runs extra ticks instead of slowing the game down
+        now = time.perf_counter()
+        accumulator += min(now - last_time, constants.MAX_FRAME_TIME) * (constants.FAST_FORWARD_SPEED if fast_forward else 1)
+        last_time = now
+        while accumulator >= step_seconds:
+            simulation.step()
+            accumulator -= step_seconds
+        profiler.mark("simulation")
+
+        #draw positions blended between the last two ticks so movement stays smooth at any frame rate
+        camera_x, camera_y, knight_x, knight_y = simulation.get_render_state(accumulator / step_seconds)
+
+        if map_level:
+            #zoomed out map of every chunk seen so far, centred on the player
+            screen.fill(constants.BG)
+            world.lod.draw(screen, map_level - 1, knight.rect.centerx, knight.rect.centery)
+            pygame.draw.circle(screen, (220, 40, 40), (constants.WINDOW_SIZE[0] // 2, constants.WINDOW_SIZE[1] // 2), 4)
+            profiler.mark("draw map")
+        else:
+            #draw world, the renderer rounds the camera to whole pixels so the scrolled image lines up
+            camera_x, camera_y = renderer.update(camera_x, camera_y)
+            renderer.draw(screen)
+            profiler.mark("draw world")
+
+            mobs.draw(screen, camera_x, camera_y, accumulator / step_seconds)
+            profiler.mark("draw mobs")
+
+            # Calculate player screen position
+            player_screen_x = knight_x - camera_x
+            player_screen_y = knight_y - camera_y
+
+            knight.draw_at_position(screen, (player_screen_x, player_screen_y))
+            profiler.mark("draw player")
+
+            if show_minimap:
+                world.lod.draw_minimap(screen, minimap_rect, constants.MINIMAP_LEVEL, knight.rect.centerx, knight.rect.centery)
+                profiler.mark("draw minimap")
+
+        profiler.draw_overlay(screen)
+        pygame.display.update()
+        profiler.mark("present")
+        clock.tick(constants.FPS)
+        profiler.mark("wait")
+        profiler.end_frame(world.chunk_load_count)
+        telemetry.end_frame()
+
+    if telemetry.enabled:
+        telemetry.toggle()
+        print("memory snapshots saved to", telemetry.snapshot_path)
+    if recorder:
+        recorder.save(args.record, simulation)
+        print("recording saved to", args.record)
+    world.chunk_loader.shutdown()
+    if world.chunk_store:
+        world.save()
+        world.chunk_store.close()
+    if world.level:
+        world.level.close()
+    pygame.quit()
+
+
+#guard so chunk worker processes can import this module without starting the game
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,244 @@
+import random
+import numpy as np
+import constants
+from assets import sprite_variants
+
+#per kind values, indexed by the kind array: 0 green slime, 1 purple slime
+SLIME_KINDS = ["slime_green", "slime_purple"]
+KIND_SPEED = np.array([1, 2], np.int32)  # pixels per tick while moving
+KIND_JUMP = np.array([-11, -14], np.int32)  # vertical velocity of a hop
+
+ANIMATION_COOLDOWN_TICKS = round(150 / constants.SIMULATION_STEP_MS)
+
+#every per mob array, one element per mob
+FIELDS = {
+    "x": np.int32, "y": np.int32,  # top left of the hitbox in world pixels
+    "previous_x": np.int32, "previous_y": np.int32,  # position at the start of the last tick, for render interpolation
+    "vel_x": np.int32, "vel_y": np.int32,
+    "width": np.int32, "height": np.int32,
+    "kind": np.int32,
+    "action": np.int32,  # 0 idle, 1 move
+    "frame_index": np.int32,
+    "animation_ticks": np.int32,
+    "flip": np.bool_,
+    "on_ground": np.bool_,
+    "think_ticks": np.int32,  # ticks until the mob picks a new direction
+}
+
+
+def get_solid_tiles(world, tile_x, tile_y):
+    # batched World.is_solid_at, each loaded chunk is read with one numpy index instead of a call per tile
+    size = world.chunk_size
+    chunk_x = tile_x // size
+    chunk_y = tile_y // size
+    solid = np.empty(len(tile_x), np.bool_)
+    if not len(tile_x):
+        return solid
+
+    chunk_ids, first, inverse = np.unique(chunk_x.astype(np.int64) * 0x100000000 + chunk_y, return_index=True, return_inverse=True)
+    for group, tile_index in enumerate(first):
+        members = np.nonzero(inverse == group)[0] if len(chunk_ids) > 1 else slice(None)
+        chunk = world.loaded_chunks.peek((int(chunk_x[tile_index]), int(chunk_y[tile_index])))
+        if chunk is None:
+            # still being generated, the world works the tiles out the slow way
+            solid[members] = [world.is_solid_at(int(x), int(y)) for x, y in zip(tile_x[members], tile_y[members])]
+            continue
+        tiles = np.frombuffer(chunk.tiles, np.int8).reshape(size, size)
+        solid[members] = world.tiles.solid_array[tiles[tile_y[members] % size, tile_x[members] % size]]
+    return solid
+
+
+class MobGroup():
+    def __init__(self, animations, seed=0, capacity=64):
+        # mobs are stored as one array per value instead of one object each, so a tick moves all of them with a few numpy calls
+        self.animations = animations  # kind -> [[idle frames], [move frames]], can be empty for a headless simulation
+        self.random = np.random.default_rng(seed)
+        self.count = 0
+        for name, data_type in FIELDS.items():
+            setattr(self, name, np.zeros(capacity, data_type))
+
+        # every frame of every kind, action and direction in one list so drawing can look images up by number
+        self.images = []
+        self.image_offsets = []
+        self.frame_counts = np.ones((len(SLIME_KINDS), 2), np.int32)
+        self.first_image = np.zeros((len(SLIME_KINDS), 2), np.int32)
+        for kind, actions in enumerate(animations):
+            for action, frames in enumerate(actions):
+                self.frame_counts[kind, action] = len(frames)
+                self.first_image[kind, action] = len(self.images)
+                for frame in frames:
+                    self.images += [frame, sprite_variants.get(frame, flip=True)]
+                    self.image_offsets += [frame.get_size()] * 2
+
+    def __len__(self):
+        return self.count
+
+    def get_memory_size(self):
+        return sum(getattr(self, name).nbytes for name in FIELDS)
+
+    def grow(self, capacity):
+        for name in FIELDS:
+            old = getattr(self, name)
+            new = np.zeros(capacity, old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+
+    def spawn(self, kind, x, y, size=constants.SLIME_SIZE):
+        if size[0] > constants.TILE_SIZE or size[1] > constants.TILE_SIZE:
+            raise ValueError("mob hitboxes can't be bigger than a tile")
+        if self.count == len(self.x):
+            self.grow(len(self.x) * 2)
+        index = self.count
+        for name in FIELDS:
+            getattr(self, name)[index] = 0
+        self.x[index] = self.previous_x[index] = x
+        self.y[index] = self.previous_y[index] = y
+        self.width[index], self.height[index] = size
+        self.kind[index] = kind
+        self.count += 1
+        return index
+
+    def remove(self, indices):
+        # keeps the arrays packed by moving every later mob down, so mob indices change after a removal
+        keep = np.ones(self.count, np.bool_)
+        keep[indices] = False
+        kept = int(keep.sum())
+        for name in FIELDS:
+            values = getattr(self, name)
+            values[:kept] = values[:self.count][keep]
+        self.count = kept
+
+    def think(self, active):
+        # mobs whose timer ran out pick a new direction (or stand still) for the next few seconds
+        self.think_ticks[active] -= 1
+        deciding = active[self.think_ticks[active] <= 0]
+        if len(deciding):
+            direction = self.random.integers(-1, 2, len(deciding))
+            self.vel_x[deciding] = direction * KIND_SPEED[self.kind[deciding]]
+            self.think_ticks[deciding] = self.random.integers(60, 240, len(deciding))
+
+    def sweep_x(self, world, active):
+        # hitboxes are at most a tile wide and move less than a tile per tick, so the leading edge can only
+        # enter one new column and only needs the two rows the hitbox covers checking
+        tile = constants.TILE_SIZE
+        x = self.x[active]
+        y = self.y[active]
+        vel_x = self.vel_x[active]
+        width = self.width[active]
+        new_x = x + vel_x
+
+        moving_right = vel_x > 0
+        old_edge = np.where(moving_right, x + width - 1, x) // tile
+        new_edge = np.where(moving_right, new_x + width - 1, new_x) // tile
+        crossing = np.nonzero(new_edge != old_edge)[0]
+        columns = new_edge[crossing]
+        top_rows = y[crossing] // tile
+        bottom_rows = (y[crossing] + self.height[active][crossing] - 1) // tile
+        hit = get_solid_tiles(world, np.concatenate((columns, columns)), np.concatenate((top_rows, bottom_rows)))
+        blocked = crossing[hit[:len(crossing)] | hit[len(crossing):]]
+
+        # stop against the side of the tile like World.sweep_x does
+        new_x[blocked] = np.where(moving_right[blocked], new_edge[blocked] * tile - width[blocked], (new_edge[blocked] + 1) * tile)
+        self.x[active] = new_x
+        return blocked
+
+    def sweep_y(self, world, active):
+        tile = constants.TILE_SIZE
+        x = self.x[active]
+        y = self.y[active]
+        vel_y = self.vel_y[active]
+        height = self.height[active]
+        new_y = y + vel_y
+
+        falling = vel_y > 0
+        old_edge = np.where(falling, y + height - 1, y) // tile
+        new_edge = np.where(falling, new_y + height - 1, new_y) // tile
+        crossing = np.nonzero(new_edge != old_edge)[0]
+        rows = new_edge[crossing]
+        left_columns = x[crossing] // tile
+        right_columns = (x[crossing] + self.width[active][crossing] - 1) // tile
+        hit = get_solid_tiles(world, np.concatenate((left_columns, right_columns)), np.concatenate((rows, rows)))
+        blocked = crossing[hit[:len(crossing)] | hit[len(crossing):]]
+
+        new_y[blocked] = np.where(falling[blocked], new_edge[blocked] * tile - height[blocked], (new_edge[blocked] + 1) * tile)
+        self.y[active] = new_y
+        return blocked
+
+    def step(self, world, focus_x, focus_y):
+        # one simulation tick for every mob near the focus point (the player)
+        count = self.count
+        self.previous_x[:count] = self.x[:count]
+        self.previous_y[:count] = self.y[:count]
+        distance = constants.SLIME_ACTIVE_DISTANCE
+        active = np.nonzero((np.abs(self.x[:count] - focus_x) < distance) & (np.abs(self.y[:count] - focus_y) < distance))[0]
+        if not len(active):
+            return
+
+        self.think(active)
+
+        # gravity, capped at the same fall speed as the player
+        self.vel_y[active] = np.minimum(self.vel_y[active] + 1, 10)
+
+        vel_x = self.vel_x[active]
+        self.action[active] = vel_x != 0
+        self.flip[active] = np.where(vel_x < 0, True, np.where(vel_x > 0, False, self.flip[active]))
+
+        blocked_x = active[self.sweep_x(world, active)]
+        blocked_y = active[self.sweep_y(world, active)]
+        self.on_ground[active] = False
+        self.on_ground[blocked_y[self.vel_y[blocked_y] > 0]] = True
+        self.vel_y[blocked_y] = 0
+
+        # hop over whatever is in the way, or turn around if already in the air
+        walled = blocked_x[self.on_ground[blocked_x]]
+        self.vel_y[walled] = KIND_JUMP[self.kind[walled]]
+        self.on_ground[walled] = False
+        stuck = blocked_x[~np.isin(blocked_x, walled)]
+        self.vel_x[stuck] = -self.vel_x[stuck]
+
+        # animation, frames advance on a tick timer and wrap per kind and action
+        self.animation_ticks[active] += 1
+        advancing = active[self.animation_ticks[active] > ANIMATION_COOLDOWN_TICKS]
+        self.frame_index[advancing] += 1
+        self.animation_ticks[advancing] = 0
+        self.frame_index[active] %= self.frame_counts[self.kind[active], self.action[active]]
+
+    def draw(self, surface, camera_x, camera_y, alpha=1):
+        # only mobs whose sprite could be on screen are drawn, everything is blitted in one call
+        if not self.count or not self.images:
+            return
+        count = self.count
+        draw_x = self.previous_x[:count] + (self.x[:count] - self.previous_x[:count]) * alpha - camera_x
+        draw_y = self.previous_y[:count] + (self.y[:count] - self.previous_y[:count]) * alpha - camera_y
+        margin = constants.TILE_SIZE * 2  # sprites are bigger than their hitboxes
+        screen_width, screen_height = surface.get_size()
+        visible = np.nonzero((draw_x > -margin) & (draw_x < screen_width + margin) & (draw_y > -margin) & (draw_y < screen_height + margin))[0]
+        if not len(visible):
+            return
+
+        kind = self.kind[visible]
+        action = self.action[visible]
+        image_numbers = self.first_image[kind, action] + self.frame_index[visible] * 2 + self.flip[visible]
+        images = self.images
+        offsets = self.image_offsets
+        # sprites sit on the bottom middle of the hitbox, like the player's
+        blits = []
+        for number, x, y, width, height in zip(image_numbers.tolist(), draw_x[visible].tolist(), draw_y[visible].tolist(),
+                                                self.width[visible].tolist(), self.height[visible].tolist()):
+            image_width, image_height = offsets[number]
+            blits.append((images[number], (x + (width - image_width) // 2, y + height - image_height)))
+        surface.blits(blits, doreturn=False)
+
+    def get_state(self):
+        # bytes of every value that changes during a tick, for replay hashes
+        return b"".join(getattr(self, name)[:self.count].tobytes() for name in FIELDS) + repr(self.random.bit_generator.state).encode()
+
+
+def spawn_slimes(mobs, world, center_x, count, seed, spread=60):
+    # drops slimes from just above the surface within spread tiles of center_x, the same seed gives the same slimes
+    rng = random.Random(seed)
+    for _ in range(count):
+        tile_x = center_x // constants.TILE_SIZE + rng.randint(-spread, spread)
+        surface_y = world.generate_height_at(tile_x) * constants.TILE_SIZE
+        x = tile_x * constants.TILE_SIZE + (constants.TILE_SIZE - constants.SLIME_SIZE[0]) // 2
+        mobs.spawn(rng.randrange(len(SLIME_KINDS)), x, surface_y - 3 * constants.TILE_SIZE)
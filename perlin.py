@@ -0,0 +1,77 @@
+import numpy as np
+
+#the permutation table of the noise library, which repeats it twice so lookups never wrap
+PERM = np.array([
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7, 225, 140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10,
+    23, 190, 6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117, 35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87,
+    174, 20, 125, 136, 171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146, 158, 231, 83, 111, 229, 122, 60, 211,
+    133, 230, 220, 105, 92, 41, 55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216, 80, 73, 209, 76, 132, 187, 208,
+    89, 18, 169, 200, 196, 135, 130, 116, 188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226, 250, 124, 123, 5,
+    202, 38, 147, 118, 126, 255, 82, 85, 212, 207, 206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213, 119,
+    248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43, 172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224,
+    232, 178, 185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144, 12, 191, 179, 162, 241, 81, 51, 145, 235,
+    249, 14, 239, 107, 49, 192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50, 45, 127, 4, 150, 254, 138, 236,
+    205, 93, 222, 114, 67, 29, 24, 72, 243, 141, 128, 195, 78, 66, 215, 61, 156, 180,
+] * 2, dtype=np.int32)
+
+#x and y parts of the gradient picked by the low 4 bits of a hash
+GRAD_X = np.array([1, -1, 1, -1, 1, -1, 1, -1, 0, 0, 0, 0, 1, -1, 0, 0], dtype=np.float32)
+GRAD_Y = np.array([1, 1, -1, -1, 0, 0, 0, 0, 1, -1, 1, -1, 0, 0, -1, 1], dtype=np.float32)
+#gradient of a corner straight from its PERM[i] + j index, the two lookups the C code does for it done ahead of time
+CORNER_GRAD_X = GRAD_X[PERM[PERM] & 15]
+CORNER_GRAD_Y = GRAD_Y[PERM[PERM] & 15]
+
+
+def noise2(x, y, repeatx, repeaty):
+    # one octave of noise at every point of the float32 arrays x and y, step for step the same float32 sums as the
+    # library's C code so it gives exactly the same values
+    i = np.floor(np.fmod(x, repeatx)).astype(np.int32)
+    j = np.floor(np.fmod(y, repeaty)).astype(np.int32)
+    ii = np.fmod((i + 1).astype(np.float32), repeatx).astype(np.int32) & 255
+    jj = np.fmod((j + 1).astype(np.float32), repeaty).astype(np.int32) & 255
+    i &= 255
+    j &= 255
+
+    x = x - np.floor(x)
+    y = y - np.floor(y)
+    fx = x * x * x * (x * (x * np.float32(6) - np.float32(15)) + np.float32(10))
+    fy = y * y * y * (y * (y * np.float32(6) - np.float32(15)) + np.float32(10))
+
+    a = PERM[i]
+    b = PERM[ii]
+    x1 = x - np.float32(1)
+    y1 = y - np.float32(1)
+    return lerp(fy, lerp(fx, grad2(a + j, x, y), grad2(b + j, x1, y)), lerp(fx, grad2(a + jj, x, y1), grad2(b + jj, x1, y1)))
+
+
+def grad2(corner, x, y):
+    return x * CORNER_GRAD_X[corner] + y * CORNER_GRAD_Y[corner]
+
+
+def lerp(t, a, b):
+    return a + t * (b - a)
+
+
+def pnoise2_array(x, y, octaves=1, persistence=0.5, lacunarity=2.0, repeatx=1024, repeaty=1024):
+    # noise.pnoise2 (with base 0) for whole arrays of points at once, returns a float64 array of the same values
+    x = np.asarray(x, dtype=np.float64).astype(np.float32)
+    y = np.asarray(y, dtype=np.float64).astype(np.float32)
+    if x.size == 0 or y.size == 0:
+        return np.zeros(np.broadcast(x, y).shape)
+    persistence = np.float32(persistence)
+    lacunarity = np.float32(lacunarity)
+    repeatx = np.float32(repeatx)
+    repeaty = np.float32(repeaty)
+    if octaves == 1:
+        return noise2(x, y, repeatx, repeaty).astype(np.float64)
+
+    frequency = np.float32(1)
+    amplitude = np.float32(1)
+    total_amplitude = np.float32(0)
+    total = np.zeros(np.broadcast(x, y).shape, dtype=np.float32)
+    for _ in range(octaves):
+        total += noise2(x * frequency, y * frequency, repeatx * frequency, repeaty * frequency) * amplitude
+        total_amplitude += amplitude
+        frequency *= lacunarity
+        amplitude *= persistence
+    return (total / total_amplitude).astype(np.float64)
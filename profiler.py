@@ -0,0 +1,131 @@
+import os
+import json
+import time
+from collections import deque
+import pygame
+
+FONT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Assets", "fonts", "PixelOperator8.ttf")
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class FrameProfiler():
+    def __init__(self, history=300, enabled=False):
+        # the main loop calls mark(name) after each phase, the time since the previous mark goes to that phase
+        self.enabled = enabled
+        self.frames = deque(maxlen=history)  # ring buffer of (frame start, [(phase, start, duration)], chunks loaded)
+        self.frame_start = 0
+        self.last_mark = 0
+        self.phases = []
+        self.in_frame = False  # only frames begun while enabled are recorded
+        self.last_chunk_count = None
+
+        # overlay text is only re-rendered every few frames
+        self.font = None
+        self.overlay_lines = []
+        self.overlay_images = []
+        self.overlay_interval = 15
+        self.frames_since_overlay = 0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frames.clear()
+        self.last_chunk_count = None
+        # toggled part way through a frame, its marks so far were skipped (or go back to a frame before that) so it is dropped
+        self.in_frame = False
+
+    def begin_frame(self):
+        self.in_frame = self.enabled
+        if not self.enabled:
+            return
+        self.frame_start = self.last_mark = time.perf_counter()
+        self.phases = []
+
+    def mark(self, name):
+        if not self.in_frame:
+            return
+        now = time.perf_counter()
+        self.phases.append((name, self.last_mark, now - self.last_mark))
+        self.last_mark = now
+
+    def end_frame(self, chunk_count=0):
+        # chunk_count is the world's running total of loaded chunks, the profiler stores the change per frame
+        if not self.in_frame:
+            return
+        self.in_frame = False
+        chunks_loaded = 0 if self.last_chunk_count is None else chunk_count - self.last_chunk_count
+        self.last_chunk_count = chunk_count
+        self.frames.append((self.frame_start, self.phases, chunks_loaded))
+
+    def get_summary(self):
+        frame_times = sorted(sum(duration for _, _, duration in phases) for _, phases, _ in self.frames)
+        phase_times = {}
+        for _, phases, _ in self.frames:
+            for name, _, duration in phases:
+                phase_times.setdefault(name, []).append(duration)
+
+        summary = {
+            "frames": len(frame_times),
+            "frame_p50_ms": percentile(frame_times, 0.5) * 1000,
+            "frame_p95_ms": percentile(frame_times, 0.95) * 1000,
+            "frame_p99_ms": percentile(frame_times, 0.99) * 1000,
+            "frame_max_ms": percentile(frame_times, 1) * 1000,
+            "chunks_loaded": sum(chunks for _, _, chunks in self.frames),
+            "phases": {},
+        }
+        for name, durations in phase_times.items():
+            durations.sort()
+            summary["phases"][name] = {
+                "mean_ms": sum(durations) / len(durations) * 1000,
+                "p95_ms": percentile(durations, 0.95) * 1000,
+            }
+        return summary
+
+    def update_overlay_lines(self):
+        summary = self.get_summary()
+        last_frame = sum(duration for _, _, duration in self.frames[-1][1]) * 1000 if self.frames else 0
+        self.overlay_lines = [
+            f"frame {last_frame:.1f}ms",
+            f"p50 {summary['frame_p50_ms']:.1f}  p95 {summary['frame_p95_ms']:.1f}  p99 {summary['frame_p99_ms']:.1f}",
+            f"chunks loaded {summary['chunks_loaded']} / {summary['frames']} frames",
+        ]
+        for name, times in summary["phases"].items():
+            self.overlay_lines.append(f"{name} {times['mean_ms']:.2f} / {times['p95_ms']:.2f}ms")
+
+    def draw_overlay(self, surface):
+        if not self.enabled:
+            return
+        if self.font is None:
+            self.font = pygame.font.Font(FONT_PATH, 16)
+
+        self.frames_since_overlay += 1
+        if self.frames_since_overlay >= self.overlay_interval or not self.overlay_lines:
+            self.frames_since_overlay = 0
+            self.update_overlay_lines()
+            self.overlay_images = [self.font.render(line, False, (255, 255, 255), (0, 0, 0)) for line in self.overlay_lines]
+
+        y = 4
+        for image in self.overlay_images:
+            surface.blit(image, (4, y))
+            y += image.get_height() + 2
+
+    def export_trace(self, path):
+        # chrome trace event format, opens in chrome://tracing or ui.perfetto.dev
+        events = []
+        if self.frames:
+            origin = self.frames[0][0]
+            for frame_start, phases, chunks_loaded in self.frames:
+                frame_length = sum(duration for _, _, duration in phases)
+                events.append({"name": "frame", "ph": "X", "pid": 1, "tid": 1,
+                               "ts": (frame_start - origin) * 1e6, "dur": frame_length * 1e6,
+                               "args": {"chunks_loaded": chunks_loaded}})
+                for name, start, duration in phases:
+                    events.append({"name": name, "ph": "X", "pid": 1, "tid": 1,
+                                   "ts": (start - origin) * 1e6, "dur": duration * 1e6})
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, trace_file)
+        return path
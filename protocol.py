@@ -0,0 +1,110 @@
+import zlib
+import struct
+from replay import INPUT
+
+#every message is a type, the length of its body, then the body
+MESSAGE = struct.Struct("<BI")
+
+#message types
+HELLO = 1  # client -> server, the world seed to join
+WELCOME = 2  # server -> client, player id, world seed, server tick and chunk size
+INPUT_RECORDS = 3  # client -> server, input records in the same layout as a recording, the tick field is ignored
+CHUNK = 4  # server -> client, chunk key then its tiles and edit states zlib compressed, sent when the chunk comes into view
+FORGET = 5  # server -> client, chunk key of a chunk that went out of view, its edits stop being sent
+TICK = 6  # server -> client, everything that changed in one tick
+
+#message bodies
+HELLO_BODY = struct.Struct("<q")
+WELCOME_BODY = struct.Struct("<IqIH")
+CHUNK_KEY = struct.Struct("<ii")
+
+#a tick is its number and how many of each record follow, then the records
+#edits are tiles written in chunks the client has, players are the ones that moved or changed animation and removed are ids that left
+TICK_BODY = struct.Struct("<IIII")
+EDIT = struct.Struct("<iibB")  # tile x, tile y, tile type, edit state (see World.get_edit_state)
+PLAYER = struct.Struct("<IiiBBB")  # id, x, y, flip, action, frame index
+REMOVED = struct.Struct("<I")
+
+#zlib level for chunks, chunks are compressed once and the bytes shared by every client that sees them
+CHUNK_COMPRESSION = 6
+
+
+def encode_message(kind, body=b""):
+    return MESSAGE.pack(kind, len(body)) + body
+
+
+def encode_input(kind, x=0, y=0):
+    # one input record, see replay.py for the kinds
+    return encode_message(INPUT_RECORDS, INPUT.pack(0, kind, x, y))
+
+
+def decode_hello(body):
+    # the seed a client asked for, the decode functions raise ValueError for bodies that are the wrong size
+    if len(body) != HELLO_BODY.size:
+        raise ValueError(f"hello of {len(body)} bytes, expected {HELLO_BODY.size}")
+    return HELLO_BODY.unpack(body)[0]
+
+
+def decode_inputs(body):
+    # (kind, x, y) of every record in an input message
+    if len(body) % INPUT.size:
+        raise ValueError(f"input message of {len(body)} bytes isn't a whole number of {INPUT.size} byte records")
+    return [INPUT.unpack_from(body, offset)[1:] for offset in range(0, len(body), INPUT.size)]
+
+
+def encode_chunk(chunk_key, tile_bytes, edit_states):
+    # tiles and World.encode_edit_states, the states let a client light and draw the chunk without generating terrain
+    return encode_message(CHUNK, CHUNK_KEY.pack(*chunk_key) + zlib.compress(tile_bytes + edit_states, CHUNK_COMPRESSION))
+
+
+def decode_chunk(body):
+    # returns the chunk key, tile bytes and edit states
+    data = zlib.decompress(body[CHUNK_KEY.size:])
+    return CHUNK_KEY.unpack_from(body, 0), data[:len(data) // 2], data[len(data) // 2:]
+
+
+def encode_tick(tick, edits, players, removed):
+    parts = [TICK_BODY.pack(tick, len(edits), len(players), len(removed))]
+    parts += [EDIT.pack(*edit) for edit in edits]
+    parts += [PLAYER.pack(*player) for player in players]
+    parts += [REMOVED.pack(player_id) for player_id in removed]
+    return encode_message(TICK, b"".join(parts))
+
+
+def decode_tick(body):
+    # returns tick number, edits, players and removed ids in the same form encode_tick takes them
+    tick, edit_count, player_count, removed_count = TICK_BODY.unpack_from(body, 0)
+    offset = TICK_BODY.size
+    edits = [EDIT.unpack_from(body, offset + index * EDIT.size) for index in range(edit_count)]
+    offset += edit_count * EDIT.size
+    players = [PLAYER.unpack_from(body, offset + index * PLAYER.size) for index in range(player_count)]
+    offset += player_count * PLAYER.size
+    removed = [REMOVED.unpack_from(body, offset + index * REMOVED.size)[0] for index in range(removed_count)]
+    return tick, edits, players, removed
+
+
+class MessageReader():
+    def __init__(self, max_length=None):
+        # a socket can hand over half a message or several at once, bytes wait here until a whole message has arrived
+        # max_length is the longest body accepted, anything longer raises ValueError as soon as its header arrives
+        self.buffer = bytearray()
+        self.max_length = max_length
+
+    def feed(self, data):
+        self.buffer += data
+
+    def read_messages(self):
+        # every complete (type, body) received so far
+        messages = []
+        offset = 0
+        while len(self.buffer) - offset >= MESSAGE.size:
+            kind, length = MESSAGE.unpack_from(self.buffer, offset)
+            if self.max_length is not None and length > self.max_length:
+                raise ValueError(f"message of {length} bytes is longer than the {self.max_length} allowed")
+            start = offset + MESSAGE.size
+            if len(self.buffer) - start < length:
+                break
+            messages.append((kind, bytes(self.buffer[start:start + length])))
+            offset = start + length
+        del self.buffer[:offset]
+        return messages
@@ -0,0 +1,102 @@
+import os
+import mmap
+import struct
+
+#region file layout
+#header: magic, version, region size (chunks per side), chunk size (tiles per side)
+#then one byte per chunk slot saying whether it has been saved
+#then fixed size chunk slots: one signed byte per tile followed by one edit flag byte per tile
+HEADER = struct.Struct("<6sBBH")
+MAGIC = b"NEAREG"
+VERSION = 1
+
+
+class RegionStore():
+    def __init__(self, directory, chunk_size, region_size=16):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.region_size = region_size
+        self.tiles_per_chunk = chunk_size * chunk_size
+        self.slot_size = self.tiles_per_chunk * 2
+        self.table_offset = HEADER.size
+        self.slots_offset = self.table_offset + region_size * region_size
+        self.file_size = self.slots_offset + region_size * region_size * self.slot_size
+        self.regions = {}  # region key -> (file, mmap), None if the region file doesn't exist yet
+        os.makedirs(directory, exist_ok=True)
+
+    def get_region_path(self, region_x, region_y):
+        return os.path.join(self.directory, f"r.{region_x}.{region_y}.region")
+
+    def get_region_key(self, chunk_x, chunk_y):
+        return (chunk_x // self.region_size, chunk_y // self.region_size)
+
+    def get_slot(self, chunk_x, chunk_y):
+        return (chunk_y % self.region_size) * self.region_size + chunk_x % self.region_size
+
+    def create_region(self, region_x, region_y):
+        # files are made at full size up front so every chunk has a fixed place in them
+        with open(self.get_region_path(region_x, region_y), "wb") as region_file:
+            region_file.write(HEADER.pack(MAGIC, VERSION, self.region_size, self.chunk_size))
+            region_file.truncate(self.file_size)
+
+    def open_region(self, region_key, create=False):
+        if self.regions.get(region_key) is None:
+            path = self.get_region_path(*region_key)
+            if not os.path.exists(path):
+                if not create:
+                    self.regions[region_key] = None
+                    return None
+                self.create_region(*region_key)
+
+            region_file = open(path, "r+b")
+            region_map = mmap.mmap(region_file.fileno(), 0)
+            magic, version, region_size, chunk_size = HEADER.unpack_from(region_map, 0)
+            if magic != MAGIC or version != VERSION or region_size != self.region_size or chunk_size != self.chunk_size:
+                region_map.close()
+                region_file.close()
+                raise ValueError(f"{path} is not a compatible region file")
+            self.regions[region_key] = (region_file, region_map)
+        return self.regions[region_key][1]
+
+    def has_chunk(self, chunk_x, chunk_y):
+        region_map = self.open_region(self.get_region_key(chunk_x, chunk_y))
+        return region_map is not None and region_map[self.table_offset + self.get_slot(chunk_x, chunk_y)] == 1
+
+    def load_chunk(self, chunk_x, chunk_y):
+        # returns (tile bytes, edit flag bytes) for a saved chunk, or None if it was never saved
+        if not self.has_chunk(chunk_x, chunk_y):
+            return None
+        region_map = self.regions[self.get_region_key(chunk_x, chunk_y)][1]
+        start = self.slots_offset + self.get_slot(chunk_x, chunk_y) * self.slot_size
+        middle = start + self.tiles_per_chunk
+        return region_map[start:middle], region_map[middle:start + self.slot_size]
+
+    def get_tile(self, chunk_x, chunk_y, index):
+        # reads a single tile straight from the mapped file without loading the chunk
+        if not self.has_chunk(chunk_x, chunk_y):
+            return None
+        region_map = self.regions[self.get_region_key(chunk_x, chunk_y)][1]
+        tile = region_map[self.slots_offset + self.get_slot(chunk_x, chunk_y) * self.slot_size + index]
+        return tile - 256 if tile > 127 else tile
+
+    def save_chunks(self, chunks):
+        # chunks is a list of (chunk key, tile bytes, edit flag bytes), written together then flushed once per region
+        touched = set()
+        for (chunk_x, chunk_y), tile_bytes, edit_bytes in chunks:
+            region_key = self.get_region_key(chunk_x, chunk_y)
+            region_map = self.open_region(region_key, create=True)
+            slot = self.get_slot(chunk_x, chunk_y)
+            start = self.slots_offset + slot * self.slot_size
+            region_map[start:start + self.tiles_per_chunk] = tile_bytes
+            region_map[start + self.tiles_per_chunk:start + self.slot_size] = edit_bytes
+            region_map[self.table_offset + slot] = 1
+            touched.add(region_key)
+        for region_key in touched:
+            self.regions[region_key][1].flush()
+
+    def close(self):
+        for region in self.regions.values():
+            if region is not None:
+                region[1].close()
+                region[0].close()
+        self.regions.clear()
@@ -0,0 +1,71 @@
+import pygame
+import constants
+
+
+class WorldRenderer():
+    def __init__(self, world, screen_width, screen_height):
+        # keeps last frame's world image and scrolls it, so only the strips the camera uncovered are drawn again
+        self.world = world
+        self.width = screen_width
+        self.height = screen_height
+        self.layer = pygame.Surface((screen_width, screen_height)).convert()
+        self.camera = None  # whole pixel camera the layer was drawn at, None until the first frame
+        self.redrawn_pixels = 0  # area drawn last frame, lets the profiler see how much scrolling saved
+
+        # the world starts collecting edited areas once it knows someone is listening
+        world.changed_areas = []
+
+    def invalidate(self):
+        # forces a full redraw next frame, e.g. after a teleport or resize
+        self.camera = None
+
+    def redraw_area(self, area):
+        # area is in screen coordinates and has to be inside the layer
+        area = area.clip(self.layer.get_rect())
+        if not area.width or not area.height:
+            return
+        strip = self.layer.subsurface(area)
+        strip.fill(constants.BG)
+        self.world.draw(strip, self.camera[0] + area.x, self.camera[1] + area.y, area.width, area.height)
+        self.redrawn_pixels += area.width * area.height
+
+    def get_exposed_areas(self, dx, dy):
+        # strips the scroll uncovered, the vertical strip takes the full height so the corner is only drawn once
+        areas = []
+        if dx > 0:
+            areas.append(pygame.Rect(self.width - dx, 0, dx, self.height))
+        elif dx < 0:
+            areas.append(pygame.Rect(0, 0, -dx, self.height))
+        if dy > 0:
+            areas.append(pygame.Rect(0, self.height - dy, self.width, dy))
+        elif dy < 0:
+            areas.append(pygame.Rect(0, 0, self.width, -dy))
+        return areas
+
+    def update(self, camera_x, camera_y):
+        # returns the whole pixel camera used so sprites drawn on top line up with the world
+        camera = (int(round(camera_x)), int(round(camera_y)))
+        self.redrawn_pixels = 0
+        changed_areas = self.world.changed_areas
+        self.world.changed_areas = []
+
+        if self.camera is None or abs(camera[0] - self.camera[0]) >= self.width or abs(camera[1] - self.camera[1]) >= self.height:
+            self.camera = camera
+            self.redraw_area(self.layer.get_rect())
+            return camera
+
+        dx = camera[0] - self.camera[0]
+        dy = camera[1] - self.camera[1]
+        if dx or dy:
+            self.layer.scroll(-dx, -dy)
+            self.camera = camera
+            for area in self.get_exposed_areas(dx, dy):
+                self.redraw_area(area)
+
+        # edited tiles already on screen, redrawn after scrolling so they use the new camera
+        for area in changed_areas:
+            self.redraw_area(area.move(-camera[0], -camera[1]))
+        return camera
+
+    def draw(self, surface):
+        surface.blit(self.layer, (0, 0))
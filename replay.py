@@ -0,0 +1,165 @@
+import os
+import sys
+import time
+import struct
+import hashlib
+import argparse
+
+#recording file layout
+#header: magic, version, world seed, player start position, slime count, tick count, input count
+#level: length of the level file path then the path, empty when no level was loaded
+#inputs: tick, kind, x, y for every change in input
+#footer: sha256 of the world and player state at the end of the recording
+HEADER = struct.Struct("<6sBqiiIII")
+INPUT = struct.Struct("<IBii")
+LEVEL_PATH_LENGTH = struct.Struct("<H")
+MAGIC = b"NEAREC"
+VERSION = 3
+
+#input kinds
+MOVEMENT = 0  # x holds the movement flags, bit 0 left and bit 1 right
+JUMP = 1
+BREAK = 2  # x, y hold the tile
+PLACE = 3
+ACTION_KINDS = {"jump": JUMP, "break": BREAK, "place": PLACE}
+KIND_ACTIONS = {kind: name for name, kind in ACTION_KINDS.items()}
+
+
+def get_state_hash(simulation):
+    # fingerprint of everything the simulation changes, two runs that end in the same state give the same hash
+    knight = simulation.knight
+    state = [
+        simulation.tick_count,
+        tuple(knight.rect), knight.vel_x, knight.vel_y, knight.jumping, knight.flip,
+        knight.action, knight.frame_index, knight.animation_time,
+        simulation.camera_x, simulation.camera_y,
+        sorted((chunk_key, sorted(edits.items())) for chunk_key, edits in simulation.world.chunk_edits.items()),
+        simulation.mobs.get_state() if simulation.mobs else None,
+    ]
+    return hashlib.sha256(repr(state).encode()).digest()
+
+
+class Recorder():
+    def __init__(self, simulation):
+        # must be created before the first tick so the recording starts from the seed and spawn position
+        self.seed = simulation.world.seed
+        self.start_position = simulation.knight.rect.topleft
+        self.mob_count = len(simulation.mobs) if simulation.mobs else 0
+        self.level_path = simulation.world.level.path if simulation.world.level else ""
+        self.start_tick = simulation.tick_count
+        self.inputs = []
+        self.movement = 0
+        simulation.recorder = self
+
+    def record_tick(self, simulation):
+        # called by the simulation at the start of each tick, before the input is used
+        tick = simulation.tick_count - self.start_tick
+        movement = simulation.moving_left | (simulation.moving_right << 1)
+        if movement != self.movement:
+            self.inputs.append((tick, MOVEMENT, movement, 0))
+            self.movement = movement
+        for action in simulation.actions:
+            x, y = action[1:] if len(action) == 3 else (0, 0)
+            self.inputs.append((tick, ACTION_KINDS[action[0]], x, y))
+
+    def save(self, path, simulation):
+        ticks = simulation.tick_count - self.start_tick
+        with open(path, "wb") as recording_file:
+            recording_file.write(HEADER.pack(MAGIC, VERSION, self.seed, self.start_position[0], self.start_position[1],
+                                             self.mob_count, ticks, len(self.inputs)))
+            level_path = self.level_path.encode()
+            recording_file.write(LEVEL_PATH_LENGTH.pack(len(level_path)) + level_path)
+            for recorded_input in self.inputs:
+                recording_file.write(INPUT.pack(*recorded_input))
+            recording_file.write(get_state_hash(simulation))
+        simulation.recorder = None
+
+
+class Recording():
+    def __init__(self, path):
+        with open(path, "rb") as recording_file:
+            data = recording_file.read()
+        magic, version, self.seed, start_x, start_y, self.mob_count, self.ticks, input_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compatible recording")
+        self.start_position = (start_x, start_y)
+        offset = HEADER.size
+        level_path_length = LEVEL_PATH_LENGTH.unpack_from(data, offset)[0]
+        offset += LEVEL_PATH_LENGTH.size
+        self.level_path = data[offset:offset + level_path_length].decode() or None
+        offset += level_path_length
+
+        # inputs grouped by tick so replay only does one dict lookup per tick
+        self.inputs = {}
+        for _ in range(input_count):
+            tick, kind, x, y = INPUT.unpack_from(data, offset)
+            self.inputs.setdefault(tick, []).append((kind, x, y))
+            offset += INPUT.size
+        self.state_hash = data[offset:offset + 32]
+
+    def replay(self, simulation):
+        # runs every recorded tick back to back, returns whether the end state matches the recording
+        for tick in range(self.ticks):
+            for kind, x, y in self.inputs.get(tick, ()):
+                if kind == MOVEMENT:
+                    simulation.moving_left = bool(x & 1)
+                    simulation.moving_right = bool(x & 2)
+                elif kind == JUMP:
+                    simulation.queue_action("jump")
+                else:
+                    simulation.queue_action(KIND_ACTIONS[kind], x, y)
+            simulation.step()
+        return get_state_hash(simulation) == self.state_hash
+
+
+def create_headless_simulation(seed, start_position, mob_count=0, level_path=None):
+    # the same world, level, player and slimes as main.py but without a window, saved chunks or background workers
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+    import pygame
+    from world import World
+    from character import Character
+    from simulation import Simulation
+    from assets import AssetCache
+    from mobs import MobGroup, SLIME_KINDS, spawn_slimes
+    from level import LevelFile
+
+    pygame.init()
+    assets = AssetCache().load()
+    knight_animations = [assets.get_frames(f"knight/{animation_type}") for animation_type in ["idle", "hit", "run", "roll"]]
+    world = World({}, seed=seed)
+    if level_path:
+        world.set_level(LevelFile(level_path))
+    knight = Character(knight_animations)
+    knight.rect.topleft = start_position
+    mobs = MobGroup([[assets.get_frames(f"{kind}/idle"), assets.get_frames(f"{kind}/move")] for kind in SLIME_KINDS], seed)
+    spawn_slimes(mobs, world, knight.rect.centerx, mob_count, seed)
+    return Simulation(world, knight, mobs)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded session headlessly as fast as possible")
+    parser.add_argument("recording")
+    parser.add_argument("--profile", help="save cProfile stats for the replay to this file")
+    args = parser.parse_args(arguments)
+
+    recording = Recording(args.recording)
+    simulation = create_headless_simulation(recording.seed, recording.start_position, recording.mob_count, recording.level_path)
+
+    start = time.perf_counter()
+    if args.profile:
+        import cProfile
+        profile = cProfile.Profile()
+        matched = profile.runcall(recording.replay, simulation)
+        profile.dump_stats(args.profile)
+    else:
+        matched = recording.replay(simulation)
+    elapsed = time.perf_counter() - start
+
+    print(f"replayed {recording.ticks} ticks in {elapsed:.2f}s ({recording.ticks / max(elapsed, 1e-9):.0f} ticks/s)")
+    print("end state matches recording" if matched else "end state DIFFERS from recording")
+    return 0 if matched else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,381 @@
+import os
+import sys
+import json
+import time
+import struct
+import socket
+import argparse
+import selectors
+from collections import deque
+
+#no window, pygame is only used for the knights' rects and animation frames
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import constants
+from world import World
+from character import Character
+from simulation import Simulation
+from assets import AssetCache
+from protocol import (MessageReader, encode_message, encode_chunk, encode_tick, decode_hello, decode_inputs, HELLO, WELCOME,
+                      INPUT_RECORDS, FORGET, WELCOME_BODY, CHUNK_KEY)
+from replay import MOVEMENT, JUMP, KIND_ACTIONS
+from profiler import percentile
+
+
+class Player():
+    def __init__(self, player_id, connection, world, animations):
+        # a connected client's knight, moved by the same Simulation code as the local game
+        self.player_id = player_id
+        self.connection = connection
+        knight = Character(animations)
+        surface_height = world.generate_height_at(knight.rect.centerx // constants.TILE_SIZE)
+        knight.rect.midbottom = (400, surface_height * constants.TILE_SIZE - 10)
+        self.simulation = Simulation(world, knight)
+        self.sent_chunks = set()  # chunk keys the client has been sent and not told to forget
+        self.sent_players = {}  # player id -> state last sent to this client, only changes are sent again
+
+    def get_state(self):
+        knight = self.simulation.knight
+        return (self.player_id, knight.rect.x, knight.rect.y, knight.flip, knight.action, knight.frame_index)
+
+    def get_chunk_key(self):
+        knight = self.simulation.knight
+        return self.simulation.world.get_chunk_key(knight.rect.centerx, knight.rect.centery)
+
+
+class ServerWorld():
+    def __init__(self, seed):
+        # one world per seed, every session on the seed shares its generated chunks, edits and cell simulation
+        self.world = World({}, seed=seed)
+        self.world.edit_log = []
+        self.players = {}  # player id -> Player
+        self.removed = []  # ids of players that left since the last tick
+        self.chunk_messages = {}  # chunk key -> compressed chunk message, made once for every client that needs it
+        self.chunk_messages_sent = 0
+        self.tick_count = 0
+
+    def set_chunk_budget(self):
+        # room for the chunks around every player plus the ring they are forgotten at, so players don't evict each other
+        # the budget only grows, it never goes under the world's default
+        chunks_per_player = (self.world.view_distance * 2 + 3) ** 2
+        self.world.set_chunk_budget(max(self.world.chunk_cache_limit, len(self.players) * chunks_per_player))
+
+    def add_player(self, player):
+        self.players[player.player_id] = player
+        self.set_chunk_budget()
+
+    def remove_player(self, player_id):
+        del self.players[player_id]
+        self.removed.append(player_id)
+
+    def step(self):
+        # one tick in the same order as Simulation.step, every player's actions before the cells and movement
+        world = self.world
+        players = list(self.players.values())
+        simulated_chunks = []
+        for player in players:
+            knight = player.simulation.knight
+            simulated_chunks += world.update_chunks_around_player(knight.rect.centerx, knight.rect.centery)
+        world.cells.set_area(simulated_chunks)
+        for player in players:
+            player.simulation.apply_actions()
+        world.cells.step()
+        for player in players:
+            player.simulation.move_knight()
+            player.simulation.tick_count += 1
+        self.tick_count += 1
+
+        # a tile written several times in a tick is only sent once, with the edit state the client can't work out itself
+        latest = {}
+        for tile_x, tile_y, tile_type in world.edit_log:
+            latest[(tile_x, tile_y)] = tile_type
+        world.edit_log = []
+        edits = []
+        for (tile_x, tile_y), tile_type in latest.items():
+            self.chunk_messages.pop((tile_x // world.chunk_size, tile_y // world.chunk_size), None)
+            edits.append((tile_x, tile_y, tile_type, world.get_edit_state(tile_x, tile_y)))
+        return edits
+
+    def get_chunk_message(self, chunk_key):
+        message = self.chunk_messages.get(chunk_key)
+        if message is None:
+            message = encode_chunk(chunk_key, self.world.loaded_chunks.peek(chunk_key).to_bytes(), self.world.encode_edit_states(chunk_key))
+            self.chunk_messages[chunk_key] = message
+        return message
+
+    def send_updates(self, edits):
+        # chunks coming into view whole, then only the edits and player changes of this tick
+        world = self.world
+        size = world.chunk_size
+        states = [player.get_state() for player in self.players.values()]
+        for player in self.players.values():
+            connection = player.connection
+            chunk_x, chunk_y = player.get_chunk_key()
+
+            # edits in chunks the client is about to be sent are already in the chunk
+            player_edits = [edit for edit in edits if (edit[0] // size, edit[1] // size) in player.sent_chunks]
+
+            for chunk_key in world.get_chunks_in_view(chunk_x, chunk_y):
+                if chunk_key not in player.sent_chunks and chunk_key in world.loaded_chunks:
+                    connection.send(self.get_chunk_message(chunk_key))
+                    player.sent_chunks.add(chunk_key)
+                    self.chunk_messages_sent += 1
+            keep_distance = world.view_distance + 1
+            for chunk_key in [key for key in player.sent_chunks if max(abs(key[0] - chunk_x), abs(key[1] - chunk_y)) > keep_distance]:
+                connection.send(encode_message(FORGET, CHUNK_KEY.pack(*chunk_key)))
+                player.sent_chunks.discard(chunk_key)
+
+            changed = [state for state in states if player.sent_players.get(state[0]) != state]
+            for state in changed:
+                player.sent_players[state[0]] = state
+            removed = [player_id for player_id in self.removed if player.sent_players.pop(player_id, None)]
+            connection.send(encode_tick(self.tick_count, player_edits, changed, removed))
+
+        # compressed chunks are only kept while the chunk is loaded
+        if len(self.chunk_messages) > len(world.loaded_chunks):
+            for chunk_key in [key for key in self.chunk_messages if key not in world.loaded_chunks]:
+                del self.chunk_messages[chunk_key]
+
+
+class Connection():
+    def __init__(self, client_socket, address):
+        self.socket = client_socket
+        self.address = address
+        self.reader = MessageReader(constants.SERVER_MAX_MESSAGE)
+        self.outgoing = bytearray()  # bytes the socket hasn't taken yet
+        self.writing = False  # whether the selector is waiting for the socket to have room
+        self.player = None
+        self.server_world = None
+        self.bytes_sent = 0
+
+    def send(self, data):
+        self.outgoing += data
+
+    def flush(self):
+        # sends as much as the socket takes without waiting, returns False if the client has gone
+        if not self.outgoing:
+            return True
+        try:
+            sent = self.socket.send(self.outgoing)
+        except BlockingIOError:
+            return True
+        except OSError:
+            return False
+        del self.outgoing[:sent]
+        self.bytes_sent += sent
+        return True
+
+
+class WorldServer():
+    def __init__(self, host, port, animations, max_queued=constants.SERVER_MAX_QUEUED):
+        # runs every world at the fixed simulation rate, clients only send input and draw what they are sent
+        self.animations = animations  # knight frames, only used for animation lengths
+        self.max_queued = max_queued
+        self.listener = socket.create_server((host, port))
+        self.listener.setblocking(False)
+        self.address = self.listener.getsockname()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ, None)
+        self.worlds = {}  # seed -> ServerWorld, kept after its players leave so their edits last while the server runs
+        self.connections = set()
+        self.next_player_id = 1
+
+        # stats
+        self.tick_count = 0
+        self.player_ticks = 0  # ticks summed over every connected player, what the load generator measures
+        self.late_ticks = 0  # ticks that started more than a tick late
+        self.tick_times = deque(maxlen=constants.SIMULATION_RATE * 10)  # seconds spent in each of the latest ticks
+        self.bytes_sent = 0
+        self.peak_players = 0
+        self.start_time = time.perf_counter()
+        self.start_cpu = time.process_time()
+
+    def accept(self):
+        try:
+            client_socket, address = self.listener.accept()
+        except BlockingIOError:
+            return
+        client_socket.setblocking(False)
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        connection = Connection(client_socket, address)
+        self.connections.add(connection)
+        self.selector.register(client_socket, selectors.EVENT_READ, connection)
+
+    def disconnect(self, connection):
+        if connection not in self.connections:
+            return
+        self.connections.discard(connection)
+        self.bytes_sent += connection.bytes_sent
+        self.selector.unregister(connection.socket)
+        connection.socket.close()
+        if connection.player:
+            connection.server_world.remove_player(connection.player.player_id)
+
+    def read(self, connection):
+        try:
+            data = connection.socket.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.disconnect(connection)
+            return
+        connection.reader.feed(data)
+        try:
+            for kind, body in connection.reader.read_messages():
+                self.handle_message(connection, kind, body)
+        except (ValueError, struct.error):
+            # a broken client only loses its own connection, every other session carries on
+            self.disconnect(connection)
+
+    def handle_message(self, connection, kind, body):
+        # raises ValueError for anything a well behaved client wouldn't send
+        if kind == HELLO and connection.player is None:
+            self.join(connection, decode_hello(body))
+        elif kind == INPUT_RECORDS and connection.player:
+            self.apply_inputs(connection.player.simulation, decode_inputs(body))
+        else:
+            raise ValueError(f"unexpected message type {kind}")
+
+    def join(self, connection, seed):
+        server_world = self.worlds.get(seed)
+        if server_world is None:
+            server_world = self.worlds[seed] = ServerWorld(seed)
+        player = Player(self.next_player_id, connection, server_world.world, self.animations)
+        self.next_player_id += 1
+        connection.player = player
+        connection.server_world = server_world
+        server_world.add_player(player)
+        connection.send(encode_message(WELCOME, WELCOME_BODY.pack(player.player_id, server_world.world.seed, server_world.tick_count, server_world.world.chunk_size)))
+        self.peak_players = max(self.peak_players, sum(len(world.players) for world in self.worlds.values()))
+
+    def apply_inputs(self, simulation, inputs):
+        # input is queued for the next tick, the same as a replay
+        for kind, x, y in inputs:
+            if kind == MOVEMENT:
+                simulation.moving_left = bool(x & 1)
+                simulation.moving_right = bool(x & 2)
+            elif kind == JUMP:
+                simulation.queue_action("jump")
+            elif kind in KIND_ACTIONS:
+                simulation.queue_action(KIND_ACTIONS[kind], x, y)
+
+    def flush(self, connection):
+        if not connection.flush() or len(connection.outgoing) > self.max_queued:
+            self.disconnect(connection)
+            return
+        # only ask to hear about room in the socket while there is something left to send
+        if bool(connection.outgoing) != connection.writing:
+            connection.writing = bool(connection.outgoing)
+            events = selectors.EVENT_READ | (selectors.EVENT_WRITE if connection.writing else 0)
+            self.selector.modify(connection.socket, events, connection)
+
+    def tick(self):
+        start = time.perf_counter()
+        for server_world in self.worlds.values():
+            # worlds nobody is in are paused, their water and sand carry on when someone joins again
+            if server_world.players:
+                self.player_ticks += len(server_world.players)
+                server_world.send_updates(server_world.step())
+            server_world.removed = []
+        for connection in list(self.connections):
+            self.flush(connection)
+        self.tick_count += 1
+        self.tick_times.append(time.perf_counter() - start)
+
+    def run(self, duration=None, stats_interval=None):
+        # ticks at SIMULATION_RATE and handles sockets while waiting for the next tick
+        step_seconds = 1 / constants.SIMULATION_RATE
+        next_tick = last_stats = time.perf_counter()
+        end_time = None if duration is None else next_tick + duration
+        while end_time is None or time.perf_counter() < end_time:
+            for key, events in self.selector.select(max(next_tick - time.perf_counter(), 0)):
+                if key.data is None:
+                    self.accept()
+                    continue
+                if events & selectors.EVENT_READ:
+                    self.read(key.data)
+                if events & selectors.EVENT_WRITE and key.data in self.connections:
+                    self.flush(key.data)
+
+            now = time.perf_counter()
+            if now < next_tick:
+                continue
+            if now - next_tick > step_seconds:
+                self.late_ticks += 1
+            if now - next_tick > constants.MAX_FRAME_TIME:
+                # too far behind to catch up, the worlds slow down instead of running ticks back to back forever
+                next_tick = now
+            self.tick()
+            next_tick += step_seconds
+
+            if stats_interval and now - last_stats >= stats_interval:
+                last_stats = now
+                print(self.format_stats(), flush=True)
+
+    def get_stats(self):
+        tick_times = sorted(self.tick_times)
+        seconds = time.perf_counter() - self.start_time
+        cpu_seconds = time.process_time() - self.start_cpu
+        return {
+            "seconds": seconds,
+            "cpu_seconds": cpu_seconds,
+            "ticks": self.tick_count,
+            "late_ticks": self.late_ticks,
+            "player_ticks": self.player_ticks,
+            "player_ticks_per_cpu_second": self.player_ticks / max(cpu_seconds, 1e-9),
+            "players": sum(len(world.players) for world in self.worlds.values()),
+            "peak_players": self.peak_players,
+            "worlds": len(self.worlds),
+            "loaded_chunks": sum(len(world.world.loaded_chunks) for world in self.worlds.values()),
+            "chunk_messages_sent": sum(world.chunk_messages_sent for world in self.worlds.values()),
+            "bytes_sent": self.bytes_sent + sum(connection.bytes_sent for connection in self.connections),
+            "tick_ms_mean": sum(tick_times) / max(len(tick_times), 1) * 1000,
+            "tick_ms_p95": percentile(tick_times, 0.95) * 1000,
+            "tick_ms_max": (tick_times[-1] if tick_times else 0) * 1000,
+        }
+
+    def format_stats(self):
+        stats = self.get_stats()
+        return (f"{stats['players']} players in {stats['worlds']} worlds, tick {stats['tick_ms_mean']:.2f}ms mean "
+                f"{stats['tick_ms_p95']:.2f}ms p95, {stats['late_ticks']} late, {stats['bytes_sent'] / max(stats['seconds'], 1e-9) / 1024:.0f}KB/s sent, "
+                f"cpu {stats['cpu_seconds'] / max(stats['seconds'], 1e-9) * 100:.0f}%")
+
+    def close(self):
+        for connection in list(self.connections):
+            self.disconnect(connection)
+        self.selector.close()
+        self.listener.close()
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Headless world server, clients connect with client.py or loadgen.py")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=constants.SERVER_PORT, help="0 picks a free port")
+    parser.add_argument("--duration", type=float, help="stop after this many seconds instead of running until interrupted")
+    parser.add_argument("--stats", type=float, default=5, help="seconds between stats lines, 0 for none")
+    parser.add_argument("--summary", action="store_true", help="print the final stats as one line of json when stopping")
+    args = parser.parse_args(arguments)
+
+    pygame.init()
+    assets = AssetCache().load()
+    knight_animations = [assets.get_frames(f"knight/{animation_type}") for animation_type in ["idle", "hit", "run", "roll"]]
+
+    server = WorldServer(args.host, args.port, knight_animations)
+    print(f"listening on {server.address[0]}:{server.address[1]}", flush=True)
+    try:
+        server.run(args.duration, args.stats)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if args.summary:
+            print(json.dumps(server.get_stats()), flush=True)
+        server.close()
+        pygame.quit()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
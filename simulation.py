@@ -0,0 +1,99 @@
+import constants
+
+
+class Simulation():
+    def __init__(self, world, knight, mobs=None):
+        # everything that changes the game state happens in step, one fixed length tick at a time
+        self.world = world
+        self.knight = knight
+        self.mobs = mobs  # optional mobs.MobGroup, simulated around the player
+        self.tick_count = 0
+
+        #input state, set by the main loop and read at the start of each tick
+        self.moving_left = False
+        self.moving_right = False
+        self.actions = []  # jumps and block edits waiting for the next tick
+        self.recorder = None  # optional replay.Recorder that logs the input of every tick
+
+        #camera variables
+        self.camera_x = knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
+        self.camera_y = knight.rect.centery - constants.WINDOW_SIZE[1] // 2
+
+        # state from the tick before, used to blend positions when rendering between ticks
+        self.previous_camera = (self.camera_x, self.camera_y)
+        self.previous_position = knight.rect.topleft
+
+    def queue_action(self, *action):
+        # ("jump",), ("break", tile_x, tile_y) or ("place", tile_x, tile_y)
+        self.actions.append(action)
+
+    def apply_action(self, action):
+        if action[0] == "jump":
+            self.knight.jump()
+        elif action[0] == "break":
+            #check if player is in range of this tile
+            if self.knight.is_tile_in_range(action[1], action[2], self.world, 0):
+                self.world.remove_block_at(action[1], action[2])
+        elif action[0] == "place":
+            if self.knight.is_tile_in_range(action[1], action[2], self.world, 1):
+                self.world.add_block_at(action[1], action[2])
+
+    def apply_actions(self):
+        for action in self.actions:
+            self.apply_action(action)
+        self.actions = []
+
+    def move_knight(self):
+        #handle input
+        knight = self.knight
+        knight.vel_x = 0
+        if self.moving_right:
+            knight.vel_x = constants.PLAYER_SPEED
+        if self.moving_left:
+            knight.vel_x = -constants.PLAYER_SPEED
+
+        knight.move(self.world)
+        knight.update()
+
+    def step(self):
+        world = self.world
+        knight = self.knight
+        self.previous_camera = (self.camera_x, self.camera_y)
+        self.previous_position = knight.rect.topleft
+        if self.recorder:
+            self.recorder.record_tick(self)
+
+        #update world chunks around player, sand and water move in the ones in view
+        world.cells.set_area(world.update_chunks_around_player(knight.rect.centerx, knight.rect.centery))
+
+        #calculate target camera position (centered on player)
+        target_camera_x = knight.rect.centerx - constants.WINDOW_SIZE[0] // 2
+        target_camera_y = knight.rect.centery - constants.WINDOW_SIZE[1] // 2
+
+        #smooth camera movement
+        camera_speed = 0.1
+        self.camera_x += (target_camera_x - self.camera_x) * camera_speed
+        self.camera_y += (target_camera_y - self.camera_y) * camera_speed
+
+        self.apply_actions()
+
+        #falling blocks and flowing water
+        world.cells.step()
+
+        self.move_knight()
+        if self.mobs:
+            self.mobs.step(world, knight.rect.centerx, knight.rect.centery)
+        self.tick_count += 1
+
+    def run(self, ticks):
+        # fast forward, runs ticks back to back without rendering
+        for _ in range(ticks):
+            self.step()
+
+    def get_render_state(self, alpha):
+        # camera and player positions blended between the last two ticks, alpha is how far into the next tick we are
+        camera_x = self.previous_camera[0] + (self.camera_x - self.previous_camera[0]) * alpha
+        camera_y = self.previous_camera[1] + (self.camera_y - self.previous_camera[1]) * alpha
+        knight_x = self.previous_position[0] + (self.knight.rect.x - self.previous_position[0]) * alpha
+        knight_y = self.previous_position[1] + (self.knight.rect.y - self.previous_position[1]) * alpha
+        return camera_x, camera_y, knight_x, knight_y
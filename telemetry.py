@@ -0,0 +1,184 @@
+import os
+import gc
+import sys
+import json
+import time
+import tracemalloc
+from collections import deque
+from assets import sprite_variants
+from profiler import percentile
+
+
+class MemoryTelemetry():
+    def __init__(self, world, snapshot_path, interval=10, history=300, trace_depth=1, top_files=10):
+        # opt in, tracemalloc slows every allocation down so nothing is traced until enable is called
+        # only reads the game's state, turning it on or off never changes what happens in the game
+        self.world = world
+        self.snapshot_path = snapshot_path  # snapshots are appended one json object per line
+        self.interval = interval  # seconds between snapshots
+        self.trace_depth = trace_depth  # stack frames tracemalloc keeps per allocation
+        self.top_files = top_files  # source files listed in each snapshot, by bytes still allocated
+        self.sizes = {"sprite variants": sprite_variants.get_memory_size}  # subsystem name -> function returning bytes
+        self.enabled = False
+        self.started_tracing = False  # whether tracemalloc was started here, so disable leaves someone else's tracing running
+
+        # one entry per frame: (bytes still allocated at the end, peak bytes above the start, net objects, gc runs, gc seconds)
+        self.frames = deque(maxlen=history)
+        self.frame_count = 0
+        self.frame_start_bytes = 0
+        self.frame_start_objects = 0
+        self.frame_objects = 0
+        self.frame_collections = 0
+        self.frame_pause = 0
+
+        # garbage collector pauses, per generation
+        self.collections = [0, 0, 0]
+        self.pause_times = [0.0, 0.0, 0.0]
+        self.longest_pauses = [0.0, 0.0, 0.0]
+        self.collected = 0
+        self.collection_start = None
+        self.enabled_time = 0
+        self.last_snapshot_time = 0
+
+    def track(self, name, get_size):
+        # adds a subsystem to the snapshots, get_size is called with no arguments and returns bytes
+        self.sizes[name] = get_size
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.started_tracing = not tracemalloc.is_tracing()
+        if self.started_tracing:
+            tracemalloc.start(self.trace_depth)
+        gc.callbacks.append(self.on_collection)
+        self.enabled = True
+        self.enabled_time = self.last_snapshot_time = time.perf_counter()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        gc.callbacks.remove(self.on_collection)
+        if self.started_tracing:
+            tracemalloc.stop()
+        self.enabled = False
+        self.collection_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.write_snapshot()
+            self.disable()
+        else:
+            self.enable()
+
+    def on_collection(self, phase, info):
+        # gc callback, called at the start and stop of every collection
+        if phase == "start":
+            self.collection_start = time.perf_counter()
+            # the young generation's count is reset by the collection, so what it had counted is added now
+            self.frame_objects += gc.get_count()[0]
+            return
+        if self.collection_start is None:
+            return
+        pause = time.perf_counter() - self.collection_start
+        generation = info["generation"]
+        self.collections[generation] += 1
+        self.pause_times[generation] += pause
+        self.longest_pauses[generation] = max(self.longest_pauses[generation], pause)
+        self.collected += info["collected"]
+        self.frame_collections += 1
+        self.frame_pause += pause
+        self.collection_start = None
+
+    def begin_frame(self):
+        if not self.enabled:
+            return
+        tracemalloc.reset_peak()
+        self.frame_start_bytes = tracemalloc.get_traced_memory()[0]
+        self.frame_start_objects = gc.get_count()[0]
+        self.frame_objects = 0
+        self.frame_collections = 0
+        self.frame_pause = 0
+
+    def end_frame(self):
+        # python has no count of every allocation, so a frame's garbage is measured as the peak of memory above where
+        # the frame started, most of which is freed again by the end. net objects is how many more gc tracked objects
+        # (lists, dicts, class instances) there are than at the start, a frame that keeps adding them is leaking
+        if not self.enabled:
+            return
+        current, peak = tracemalloc.get_traced_memory()
+        objects = self.frame_objects + gc.get_count()[0] - self.frame_start_objects
+        self.frames.append((current - self.frame_start_bytes, peak - self.frame_start_bytes, objects, self.frame_collections, self.frame_pause))
+        self.frame_count += 1
+        if time.perf_counter() - self.last_snapshot_time >= self.interval:
+            self.write_snapshot()
+
+    def get_sizes(self):
+        sizes = self.world.get_memory_usage()
+        for name, get_size in self.sizes.items():
+            sizes[name] = get_size()
+        return sizes
+
+    def get_frame_summary(self):
+        retained = sorted(frame[0] for frame in self.frames)
+        temporary = sorted(frame[1] for frame in self.frames)
+        net_objects = sorted(frame[2] for frame in self.frames)
+        frame_count = max(len(self.frames), 1)
+        return {
+            "frames": len(self.frames),
+            "retained_bytes_mean": sum(retained) / frame_count,
+            "temporary_bytes_mean": sum(temporary) / frame_count,
+            "temporary_bytes_p95": percentile(temporary, 0.95),
+            "net_objects_mean": sum(net_objects) / frame_count,
+            "net_objects_p95": percentile(net_objects, 0.95),
+            "frames_with_collections": sum(1 for frame in self.frames if frame[3]),
+            "collection_ms_p95": percentile(sorted(frame[4] for frame in self.frames), 0.95) * 1000,
+        }
+
+    def get_top_files(self):
+        # where the memory that is still allocated was allocated from, taking the snapshot takes a while so it is only done here
+        snapshot = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ])
+        package_folder = os.path.dirname(os.path.abspath(__file__))
+        top_files = {}
+        for statistic in snapshot.statistics("filename")[:self.top_files]:
+            file_name = statistic.traceback[0].filename
+            if file_name.startswith(package_folder):
+                file_name = os.path.relpath(file_name, package_folder)
+            top_files[file_name] = {"bytes": statistic.size, "blocks": statistic.count}
+        return top_files
+
+    def take_snapshot(self):
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "time": time.time(),
+            "seconds": time.perf_counter() - self.enabled_time,
+            "frame": self.frame_count,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "allocated_blocks": sys.getallocatedblocks(),
+            "subsystems": self.get_sizes(),
+            "per_frame": self.get_frame_summary(),
+            "gc": {
+                "collections": list(self.collections),
+                "pause_ms": [pause * 1000 for pause in self.pause_times],
+                "longest_pause_ms": [pause * 1000 for pause in self.longest_pauses],
+                "collected": self.collected,
+                "thresholds": list(gc.get_threshold()),
+            },
+            "top_files": self.get_top_files(),
+        }
+
+    def write_snapshot(self):
+        if not self.enabled:
+            return None
+        snapshot = self.take_snapshot()
+        folder = os.path.dirname(self.snapshot_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.snapshot_path, "a") as snapshot_file:
+            snapshot_file.write(json.dumps(snapshot) + "\n")
+        # the snapshot itself takes a while, the next interval starts after it
+        self.last_snapshot_time = time.perf_counter()
+        return snapshot
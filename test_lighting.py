@@ -0,0 +1,63 @@
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from world import World
+from lighting import MAX_LIGHT, SOLID_FALLOFF
+from tiles import TILES, TileRegistry, TileType, LAYER_PLAIN
+
+
+def make_world(seed=1):
+    # a world with the chunks around the origin loaded and a lamp tile that no real tile is yet
+    world = World({}, seed=seed)
+    world.tiles = TileRegistry(list(TILES.types.values()) + [TileType("lamp", 100, LAYER_PLAIN, light=12)])
+    for chunk_x in range(-2, 3):
+        for chunk_y in range(-2, 5):
+            world.load_chunk(chunk_x, chunk_y)
+    return world
+
+
+class LightTest(unittest.TestCase):
+    def test_block_light_spreads_from_tiles_that_give_off_light(self):
+        world = make_world()
+        tile_x = 10
+        tile_y = world.generate_height_at(tile_x) + 40
+        # a pocket of stone deep enough that no skylight reaches it
+        world.set_tiles([(x, y, world.stone_tile) for x in range(tile_x - 6, tile_x + 7) for y in range(tile_y - 6, tile_y + 7)])
+        self.assertEqual(world.light.get_light(tile_x, tile_y), 0)
+
+        world.set_tiles([(tile_x, tile_y, 100)])
+        self.assertEqual(world.light.get_light(tile_x, tile_y), 12)
+        self.assertEqual(world.light.get_light(tile_x + 1, tile_y), 12 - SOLID_FALLOFF)
+        self.assertEqual(world.light.get_light(tile_x, tile_y - 2), 12 - SOLID_FALLOFF * 2)
+        self.assertEqual(world.light.get_light(tile_x + 4, tile_y), 0)
+
+        world.set_tiles([(tile_x, tile_y, world.stone_tile)])
+        self.assertEqual(world.light.get_light(tile_x, tile_y), 0)
+        self.assertEqual(world.light.get_light(tile_x + 1, tile_y), 0)
+
+    def test_sky_height_follows_edits_in_the_column(self):
+        world = make_world()
+        tile_x = -5
+        surface = world.generate_height_at(tile_x)
+        self.assertEqual(world.light.get_sky_height(tile_x), surface)
+
+        world.set_tiles([(tile_x, surface - 8, world.stone_tile)])
+        self.assertEqual(world.light.get_sky_height(tile_x), surface - 8)
+        self.assertEqual(world.light.get_light(tile_x, surface - 7), MAX_LIGHT - 1)
+
+        # digging out the column lets the sky down to the first tile left standing
+        world.set_tiles([(tile_x, y, -1) for y in range(surface - 8, surface + 3)])
+        self.assertEqual(world.light.get_sky_height(tile_x), surface + 3 + next(
+            offset for offset in range(100) if world.get_tile_at(tile_x, surface + 3 + offset) != -1))
+        self.assertEqual(world.column_edits[tile_x], {y: -1 for y in range(surface, surface + 3)})
+
+        # putting back what was generated leaves no edits behind
+        world.set_tiles([(tile_x, y, world.generate_tile_at(tile_x, y)) for y in range(surface - 8, surface + 3)])
+        self.assertNotIn(tile_x, world.column_edits)
+        self.assertEqual(world.light.get_sky_height(tile_x), surface)
+
+
+if __name__ == "__main__":
+    unittest.main()
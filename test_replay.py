@@ -0,0 +1,57 @@
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import constants
+from replay import create_headless_simulation, get_state_hash, Recorder, Recording
+from chunk_loader import ChunkLoader
+
+
+def play(seed, ticks, workers=None, recording_path=None):
+    # walks right and back digging in front of the player, returns the state hash at the end
+    # workers is how many background chunk generation processes to use, None generates every chunk on the main loop
+    simulation = create_headless_simulation(seed, (0, 0))
+    surface_height = simulation.world.generate_height_at(400 // constants.TILE_SIZE)
+    simulation.knight.rect.midbottom = (400, surface_height * constants.TILE_SIZE - 10)
+    if workers:
+        simulation.world.chunk_loader = ChunkLoader(seed, workers)
+    recorder = Recorder(simulation) if recording_path else None
+    try:
+        knight = simulation.knight
+        for tick in range(ticks):
+            simulation.moving_right = (tick // 400) % 3 != 2
+            simulation.moving_left = not simulation.moving_right
+            if tick % 20 == 0:
+                simulation.queue_action("jump")
+            if tick % 9 == 0:
+                simulation.queue_action("break", knight.rect.centerx // constants.TILE_SIZE + 1, knight.rect.centery // constants.TILE_SIZE + 1)
+            simulation.step()
+    finally:
+        if workers:
+            simulation.world.chunk_loader.shutdown()
+    if recorder:
+        recorder.save(recording_path, simulation)
+    return get_state_hash(simulation)
+
+
+class DeterminismTest(unittest.TestCase):
+    def test_chunk_loader_does_not_change_the_game(self):
+        # chunks arrive from the workers whenever they are done, sand and water have to move the same anyway
+        for seed in (1, 7):
+            with self.subTest(seed=seed):
+                self.assertEqual(play(seed, 2000), play(seed, 2000, workers=2))
+
+    def test_recording_made_with_chunk_loader_replays(self):
+        # main.py records with the loader on, replay.py plays it back without one
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "session.rec")
+            play(1, 1500, workers=2, recording_path=path)
+            recording = Recording(path)
+            simulation = create_headless_simulation(recording.seed, recording.start_position, recording.mob_count, recording.level_path)
+            self.assertTrue(recording.replay(simulation))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import time
+import socket
+import threading
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame
+import constants
+from assets import AssetCache
+from server import WorldServer
+from client import WorldClient, RemoteWorld
+from protocol import MESSAGE, HELLO, INPUT_RECORDS, encode_message
+
+
+class ServerTest(unittest.TestCase):
+    def setUp(self):
+        pygame.init()
+        assets = AssetCache().load()
+        knight_animations = [assets.get_frames(f"knight/{animation_type}") for animation_type in ["idle", "hit", "run", "roll"]]
+        self.server = WorldServer("127.0.0.1", 0, knight_animations)
+        self.thread = threading.Thread(target=self.server.run, args=(3,))
+        self.thread.start()
+
+    def tearDown(self):
+        self.thread.join()
+        self.server.close()
+
+    def connect(self):
+        return socket.create_connection(self.server.address)
+
+    def test_bad_clients_only_lose_their_own_connection(self):
+        client = WorldClient(*self.server.address, 5678, {})
+        bad_messages = [
+            encode_message(HELLO, b"\x01\x02"),  # hello body the wrong size
+            MESSAGE.pack(HELLO, 4 * 1024 ** 3 - 1),  # declares a huge body it never sends
+            encode_message(HELLO, bytes(8)) + encode_message(INPUT_RECORDS, bytes(5)),  # part of an input record
+            encode_message(99),  # no such message
+        ]
+        bad_sockets = []
+        for message in bad_messages:
+            bad_socket = self.connect()
+            bad_socket.sendall(message)
+            bad_sockets.append(bad_socket)
+
+        for bad_socket in bad_sockets:
+            # the server hangs up, recv returns nothing once anything it sent before that has been read
+            bad_socket.settimeout(2)
+            while bad_socket.recv(65536):
+                pass
+            bad_socket.close()
+
+        start_tick = client.tick
+        deadline = time.perf_counter() + 1
+        while time.perf_counter() < deadline:
+            client.poll()
+            time.sleep(0.01)
+        self.assertTrue(client.connected)
+        self.assertGreater(client.tick, start_tick)
+        client.close()
+
+    def test_client_copies_the_server_world_without_generating_terrain(self):
+        def generate(*args):
+            raise AssertionError("the client generated terrain")
+        for name in ("generate_chunk", "generate_tile_at", "should_spawn_vegetation"):
+            setattr(RemoteWorld, name, generate)
+        try:
+            client = WorldClient(*self.server.address, 5678, {})
+            # walks right digging in front of itself until the server stops
+            while self.thread.is_alive():
+                client.poll()
+                client.send_movement(False, True)
+                position = client.get_position()
+                if position and client.tick % 10 == 0:
+                    client.send_action("break", position[0] // constants.TILE_SIZE + 1, position[1] // constants.TILE_SIZE + 1)
+                time.sleep(0.005)
+        finally:
+            for name in ("generate_chunk", "generate_tile_at", "should_spawn_vegetation"):
+                delattr(RemoteWorld, name)
+        time.sleep(0.1)
+        client.poll()  # whatever the server sent in its last tick
+
+        client_world = client.world
+        server_world = self.server.worlds[5678].world
+        self.assertTrue(client_world.chunk_edits)
+        for chunk_key in client_world.loaded_chunks:
+            with self.subTest(chunk_key=chunk_key):
+                self.assertEqual(client_world.loaded_chunks.peek(chunk_key).tiles, server_world.loaded_chunks.peek(chunk_key).tiles)
+                self.assertEqual(client_world.chunk_edits.get(chunk_key), server_world.chunk_edits.get(chunk_key))
+                self.assertTrue((client_world.light.chunk_light[chunk_key] == server_world.light.chunk_light[chunk_key]).all())
+                for index in client_world.chunk_edits.get(chunk_key, {}):
+                    tile_x = chunk_key[0] * client_world.chunk_size + index % client_world.chunk_size
+                    tile_y = chunk_key[1] * client_world.chunk_size + index // client_world.chunk_size
+                    self.assertEqual(client_world.is_block_broken(tile_x, tile_y), server_world.is_block_broken(tile_x, tile_y))
+        client.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
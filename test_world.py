@@ -0,0 +1,50 @@
+import os
+import unittest
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import numpy as np
+from noise import pnoise2
+from perlin import pnoise2_array
+from world import World
+
+
+class TerrainTest(unittest.TestCase):
+    def assert_chunks_match(self, world):
+        chunk_keys = [(0, 0), (0, 1), (1, 2), (-1, 0), (-1, 1), (-3, 2), (2, -1), (-2, -1), (5, 4), (-40, 3)]
+        for chunk_x, chunk_y in chunk_keys:
+            with self.subTest(seed=world.seed, chunk=(chunk_x, chunk_y)):
+                chunk = world.generate_chunk(chunk_x, chunk_y)
+                wrong_tiles = [(x, y) for y in range(world.chunk_size) for x in range(world.chunk_size)
+                               if chunk.get_tile(x, y) != world.generate_tile_at(chunk_x * world.chunk_size + x, chunk_y * world.chunk_size + y)]
+                self.assertEqual(wrong_tiles, [])
+
+    def test_generate_chunk_matches_generate_tile_at(self):
+        # generate_chunk samples the noise a chunk at a time with perlin.pnoise2_array, generate_tile_at one tile at a time
+        # with pnoise2, they have to agree on every tile or edits would be stored against the wrong terrain
+        for seed in (1, 7, 5678, 123456):
+            self.assert_chunks_match(World({}, seed=seed))
+
+    def test_generate_chunk_matches_generate_tile_at_in_caves(self):
+        # flooded caves are rare with the real thresholds, so every kind of tile is made common here
+        for seed in (1, 5678):
+            world = World({}, seed=seed)
+            world.cave_threshold = 0.05
+            world.water_threshold = -0.2
+            world.sand_threshold = 0
+            self.assert_chunks_match(world)
+
+    def test_pnoise2_array_matches_pnoise2(self):
+        random = np.random.default_rng(3)
+        x = random.uniform(-400, 400, 5000)
+        y = random.uniform(-400, 400, 5000)
+        for octaves, persistence, lacunarity in ((1, 0.5, 2.0), (2, 0.5, 2.5), (3, 0.1, 2.5), (4, 0.1, 2.5)):
+            with self.subTest(octaves=octaves):
+                expected = np.array([pnoise2(x[index], y[index], octaves, persistence, lacunarity, repeatx=999999, repeaty=999999)
+                                     for index in range(len(x))])
+                result = pnoise2_array(x, y, octaves, persistence, lacunarity, repeatx=999999, repeaty=999999)
+                self.assertEqual(int((result != expected).sum()), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import numpy as np
+import constants
+from lighting import AIR_FALLOFF, SOLID_FALLOFF, MAX_LIGHT
+
+#render layers, how draw_tile draws a tile
+LAYER_NONE = 0  # nothing, air
+LAYER_BLOCK = 1  # its texture fills the tile
+LAYER_PLAIN = 2  # a square of its colour, for tiles with no sprite
+LAYER_PLANT = 3  # the tile it grows out of, with one of its textures standing on top
+LAYER_TREE = 4  # the tile it grows out of, with every frame of its texture stacked upwards
+
+#how the cell simulation moves a tile
+STILL = 0
+FALLS = 1  # through air and water
+SLIDES = 2  # falls, and also slides off the side of a pile
+FLOWS = 3  # falls, and runs along the floor towards a drop
+
+#tile ids are signed bytes, so every lookup table has one entry per byte value and -1 (air) indexes the last one
+TABLE_SIZE = 256
+
+
+class TileType():
+    def __init__(self, name, tile_id, layer, solid=True, texture=None, variants=None, colour=(0, 0, 0, 0),
+                 light_falloff=SOLID_FALLOFF, light=0, movement=STILL, grows_on=None):
+        self.name = name
+        self.tile_id = tile_id
+        self.layer = layer
+        self.solid = solid  # blocks the player and mobs
+        self.texture = texture  # sprite group name, see assets.SPRITE_GROUPS
+        self.variants = variants  # most frames of the texture picked between by tile position, None for all of them
+        self.colour = colour  # drawn for plain tiles, and on the map when the texture isn't loaded
+        self.light_falloff = light_falloff  # light lost passing through the tile
+        self.light = light  # light the tile gives off, spreading from it the same way as skylight
+        self.movement = movement
+        self.grows_on = grows_on  # name of the tile drawn under plants and trees
+
+
+class TileRegistry():
+    def __init__(self, tile_types):
+        # every property is compiled into a table indexed by tile id, numpy arrays for whole chunks at a time
+        # and plain lists (much faster to index with a single python int) for one tile at a time
+        self.types = {}  # tile id -> TileType
+        self.ids = {}  # name -> tile id
+        self.solid_array = np.zeros(TABLE_SIZE, np.bool_)
+        self.light_falloff_array = np.full(TABLE_SIZE, SOLID_FALLOFF, np.int16)
+        self.light_array = np.zeros(TABLE_SIZE, np.int16)
+        self.movement_array = np.zeros(TABLE_SIZE, np.int8)
+        self.colour_array = np.zeros((TABLE_SIZE, 4), np.uint8)
+        self.layer = [LAYER_NONE] * TABLE_SIZE
+        self.grows_on = [-1] * TABLE_SIZE
+        for tile_type in tile_types:
+            self.register(tile_type)
+
+    def register(self, tile_type):
+        if not -128 <= tile_type.tile_id < 128:
+            raise ValueError(f"tile id {tile_type.tile_id} of {tile_type.name} doesn't fit in a chunk's signed bytes")
+        if tile_type.tile_id in self.types or tile_type.name in self.ids:
+            raise ValueError(f"tile {tile_type.name} ({tile_type.tile_id}) is already registered")
+        if tile_type.light_falloff < AIR_FALLOFF:
+            raise ValueError(f"light can't travel further through {tile_type.name} than through air")
+        if not 0 <= tile_type.light <= MAX_LIGHT:
+            raise ValueError(f"{tile_type.name} gives off {tile_type.light} light, tiles give off 0 to {MAX_LIGHT}")
+        if tile_type.grows_on is not None and tile_type.grows_on not in self.ids:
+            raise ValueError(f"{tile_type.name} grows on {tile_type.grows_on}, which has to be registered first")
+
+        tile_id = tile_type.tile_id
+        self.types[tile_id] = tile_type
+        self.ids[tile_type.name] = tile_id
+        self.solid_array[tile_id] = tile_type.solid
+        self.light_falloff_array[tile_id] = tile_type.light_falloff
+        self.light_array[tile_id] = tile_type.light
+        self.movement_array[tile_id] = tile_type.movement
+        self.colour_array[tile_id] = tile_type.colour
+        self.layer[tile_id] = tile_type.layer
+        if tile_type.grows_on is not None:
+            self.grows_on[tile_id] = self.ids[tile_type.grows_on]
+        self.solid = self.solid_array.tolist()
+        self.movement = self.movement_array.tolist()
+
+    def get_id(self, name):
+        return self.ids[name]
+
+    def get_texture_groups(self):
+        return sorted({tile_type.texture for tile_type in self.types.values() if tile_type.texture})
+
+    def load_textures(self, assets):
+        # frames of every texture a tile uses, the textures argument of World
+        return {group: assets.get_frames(group) for group in self.get_texture_groups()}
+
+    def get_frames(self, textures):
+        # list indexed by tile id of the frames each tile can be drawn with, empty where the texture isn't loaded
+        frames = [[] for _ in range(TABLE_SIZE)]
+        for tile_id, tile_type in self.types.items():
+            if tile_type.texture:
+                frames[tile_id] = list(textures.get(tile_type.texture, []))[:tile_type.variants]
+        return frames
+
+
+#every tile in the game, a new block only needs an entry here (and its sprites in assets.SPRITE_GROUPS)
+#tree and bush tiles are the surface tile the plant grows out of, so they are as solid as the surface
+TILES = TileRegistry([
+    TileType("air", -1, LAYER_NONE, solid=False, light_falloff=AIR_FALLOFF),
+    TileType("surface", 0, LAYER_BLOCK, texture="grounds/surface", colour=(86, 170, 60, 255)),
+    TileType("ground", 1, LAYER_BLOCK, texture="grounds/ground", colour=(132, 90, 56, 255)),
+    TileType("stone", 2, LAYER_BLOCK, texture="grounds/stone", colour=(110, 110, 120, 255)),
+    TileType("tree", 3, LAYER_TREE, texture="vegetation/tree1", colour=(40, 120, 50, 255), grows_on="surface"),
+    TileType("bush", 4, LAYER_PLANT, texture="vegetation/bush", colour=(60, 140, 70, 255), grows_on="surface"),
+    TileType("wood", 5, LAYER_BLOCK, texture="plank", variants=1, colour=(170, 120, 70, 255), movement=FALLS),
+    TileType("sand", 6, LAYER_PLAIN, colour=constants.SAND_COLOUR + (255,), movement=SLIDES),
+    TileType("water", 7, LAYER_PLAIN, solid=False, colour=constants.WATER_COLOUR, light_falloff=AIR_FALLOFF + 1, movement=FLOWS),
+])
@@ -1,49 +1,126 @@
+import sys
 import pygame
 import constants
 from noise import pnoise2
 import random
+import numpy as np
+from perlin import pnoise2_array
+from chunks import Chunk, ChunkCache, Column, ColumnCache
+from lighting import LightMap, MAX_LIGHT
+from assets import sprite_variants, get_surface_bytes
+from cells import CellSimulation
+from tiles import TILES, LAYER_NONE, LAYER_BLOCK, LAYER_PLAIN, LAYER_PLANT, LAYER_TREE
+
+#edit states of a tile, see get_edit_state
+EDIT_NONE = 0  # the generated tile
+EDIT_CHANGED = 1  # different from the generated tile
+EDIT_BROKEN = 2  # a broken block, changed to air and drawn faintly
 
 class World():
-    def __init__(self, ground_sprites, vegetation_sprites, seed=None):
-        self.ground_sprites = ground_sprites
-        self.vegetation_sprites = vegetation_sprites
+    def __init__(self, textures, seed=None):
+        # textures is {sprite group name: frames} for the groups the tile registry uses, empty for a world that isn't drawn
+        self.tiles = TILES
+        self.tile_frames = TILES.get_frames(textures)  # tile id -> frames it can be drawn with
         self.seed = seed if seed else random.randint(0, 1000000)
         
         # chunk system for the infinite world
         self.chunk_size = 32  # 32x32 tiles per chunk
-        self.loaded_chunks = {}  # dictionary to store loaded chunks
-        self.chunk_cache_limit = 9  # can keep maximum 9 chunks loaded at once, 3x3 around player
+        self.view_distance = 1  # chunks kept loaded on each side of the player, 1 is the 3x3 around them
+        self.chunk_cache_limit = 64  # most chunks kept in memory, least recently used ones are evicted past this
+        self.loaded_chunks = ChunkCache(self.chunk_cache_limit, on_evict=self.on_chunk_evicted)
+        self.chunks_to_save = []  # evicted dirty chunks waiting to be written to the chunk store
+        self.chunk_load_count = 0  # running total of chunks loaded, read by the frame profiler
+        self.chunk_loader = None  # optional ChunkLoader that generates chunks in background processes
+        self.last_player_position = None  # used to work out which way the player is travelling
+        self.chunk_store = None  # optional RegionStore that keeps chunks on disk between visits and sessions
+        self.dirty_chunks = set()  # loaded chunks that differ from what is saved on disk
+        self.level = None  # optional LevelFile, its authored tiles replace generated ones
+        self.lod = None  # optional LodPyramid of zoomed out chunk images for the map and minimap
+        self.columns = ColumnCache(self.make_column, 4096)  # surface height and vegetation of recently used columns
         
         # perlin noise parameters
         self.noise_scale = 0.02  # how zoomed in the noise is on the image
         self.height_multiplier = 50  # how tall the terrain features can be
         self.base_height = 15  # base ground level (in tiles from the top)
+        # pnoise2 has one permutation table and any base other than 0 reads past the end of it, so instead of being
+        # the base the seed moves where every noise is sampled from
+        seed_random = random.Random(self.seed)
+        self.noise_offset_x = seed_random.uniform(0, 256)
+        self.noise_offset_y = seed_random.uniform(0, 256)
         
         # terrain generation parameters
-        self.surface_tile = 0
-        self.ground_tile = 1
-        self.stone_tile = 2
+        self.surface_tile = TILES.get_id("surface")
+        self.ground_tile = TILES.get_id("ground")
+        self.stone_tile = TILES.get_id("stone")
         self.cave_threshold = 0.5  # noise value above which caves appear
         
         # vegetation parameters
-        self.tree_tile = 3
-        self.bush_tile = 4
+        self.tree_tile = TILES.get_id("tree")
+        self.bush_tile = TILES.get_id("bush")
         self.vegetation_threshold = 0.05  # noise value above which vegetation spawns
         self.tree_vs_bush_threshold = 0.1  # if vegetation noise > this, spawn tree, else bush
         self.vegetation_density = 0.075  # how dense vegetation clusters are
 
-        self.broken_blocks = set()
-        self.added_blocks = set()
-
-        self.wood_tile = 5
+        # player edits stored per chunk as {local tile index: tile type}, applied whenever the chunk loads
+        # and the same edits by column as {tile y: tile type}, only ever changed through set_edit
+        self.chunk_edits = {}
+        self.column_edits = {}
+
+        self.wood_tile = TILES.get_id("wood")
+
+        # sand and water fall and flow, moved by the cell simulation
+        self.sand_tile = TILES.get_id("sand")
+        self.water_tile = TILES.get_id("water")
+        self.sand_threshold = 0.3  # noise value above which the dirt layer is sand
+        self.water_threshold = 0.0  # noise value above which cave floors are flooded
+
+        # a square of each tile's colour, drawn for plain tiles and for tiles whose texture isn't loaded
+        self.plain_tiles = [None] * len(self.tile_frames)
+        for tile_id, tile_type in TILES.types.items():
+            if tile_type.colour[3]:
+                plain_tile = pygame.Surface((constants.TILE_SIZE, constants.TILE_SIZE), pygame.SRCALPHA)
+                plain_tile.fill(tile_type.colour)
+                self.plain_tiles[tile_id] = plain_tile
+
+        # pre-rendered chunk images so draw only blits a few surfaces per frame
+        self.chunk_surfaces = {}  # chunk key -> Surface with every tile and vegetation baked in
+        self.vegetation_padding = self.get_vegetation_height()  # space above a chunk for trees on its top row
+        self.changed_areas = None  # world pixel rects changed by edits, only collected once a renderer sets this to a list
+        self.edit_log = None  # (tile x, tile y, tile type) of every tile written, only collected once a server sets this to a list
+
+        # tile light, baked into the chunk surfaces as a darkness square over each tile that isn't fully lit
+        self.light = LightMap(self)
+        self.darkness_tiles = []
+        for light in range(MAX_LIGHT):
+            darkness_tile = pygame.Surface((constants.TILE_SIZE, constants.TILE_SIZE), pygame.SRCALPHA)
+            darkness_tile.fill((0, 0, 0, round(constants.MAX_DARKNESS * (MAX_LIGHT - light) / MAX_LIGHT)))
+            self.darkness_tiles.append(darkness_tile)
+
+        # only tiles that might move are updated each tick
+        self.cells = CellSimulation(self)
 
 
     def multi_octave_noise(self, x, y, octaves=4, persistence=0.1, lacunarity=2.5):
         # generates noise using noise library
         # returns a value between -1 and 1
-        return pnoise2(x, y, octaves, persistence, lacunarity, repeatx=999999, repeaty=999999, base=self.seed)
+        return pnoise2(x + self.noise_offset_x, y + self.noise_offset_y, octaves, persistence, lacunarity, repeatx=999999, repeaty=999999)
+
+    def multi_octave_noise_array(self, x, y, octaves=4, persistence=0.1, lacunarity=2.5):
+        # multi_octave_noise for numpy arrays of points, the values are exactly the same
+        return pnoise2_array(x + self.noise_offset_x, y + self.noise_offset_y, octaves, persistence, lacunarity, repeatx=999999, repeaty=999999)
 
     def generate_height_at(self, x):
+        return self.columns.get(x).height
+
+    def make_column(self, x):
+        # the noise for a column is only sampled here, everything else reads it from the column cache
+        height = self.noise_height_at(x)
+        surface_tile = self.surface_tile
+        if self.should_spawn_vegetation(x, height):
+            surface_tile = self.get_vegetation_type(x, height)
+        return Column(height, surface_tile, self.seed + x * 1000)
+
+    def noise_height_at(self, x):
         # generates height at a given x coordinate
         noise_value = self.multi_octave_noise(x * self.noise_scale, 0)
         height = self.base_height + (noise_value * self.height_multiplier)
@@ -63,99 +140,450 @@ class World():
         else:
             return self.bush_tile
 
+    def generate_heightmap(self, start_x, width):
+        # terrain height for every column in [start_x, start_x + width)
+        return [column.height for column in self.columns.get_range(start_x, width)]
+
     def generate_tile_at(self, x, y):
-        terrain_height = self.generate_height_at(x)
-        
+        if self.level:
+            tile_type = self.level.get_tile(x, y)
+            if tile_type is not None:
+                return tile_type
+        return self.generate_tile_in_column(x, y, self.generate_height_at(x))
+
+    def generate_tile_in_column(self, x, y, terrain_height):
+        # same as generate_tile_at but with the column height already known
         if y < terrain_height:
             return -1  # air
         elif y == terrain_height:
-            # surface level → vegetation check
-            if self.should_spawn_vegetation(x, y):
-                if self.get_vegetation_type(x, y) == self.tree_tile:
-                    return self.tree_tile  # tree base
-                else:
-                    return self.bush_tile  # bush
-            else:
-                return self.surface_tile  # regular surface
+            # surface level, a tree base, bush or regular surface worked out once per column
+            return self.columns.get(x).surface_tile
         elif y < terrain_height + 5:
             # underground dirt layer with caves
-            cave_noise = self.multi_octave_noise(x * 0.05, y * 0.05, octaves=3)
-            if cave_noise > self.cave_threshold:
-                return -1  # cave
+            if self.is_cave(x, y, terrain_height):
+                return self.get_cave_tile(x, y, terrain_height)
+            if self.multi_octave_noise(x * 0.04 + 500, y * 0.04, octaves=2) > self.sand_threshold:
+                return self.sand_tile
             return self.ground_tile
         else:
             # deep underground stone with caves
-            cave_noise = self.multi_octave_noise(x * 0.03, y * 0.05, octaves=2)
-            if cave_noise > self.cave_threshold + 0.1:
-                return -1  # deep cave
+            if self.is_cave(x, y, terrain_height):
+                return self.get_cave_tile(x, y, terrain_height)
             return self.stone_tile
 
+    def is_cave(self, x, y, terrain_height):
+        if y <= terrain_height:
+            return False
+        elif y < terrain_height + 5:
+            return self.multi_octave_noise(x * 0.05, y * 0.05, octaves=3) > self.cave_threshold
+        # deep caves
+        return self.multi_octave_noise(x * 0.03, y * 0.05, octaves=2) > self.cave_threshold + 0.1
+
+    def get_cave_tile(self, x, y, terrain_height):
+        # the bottom tile of a cave is water in wet areas, it settles into pools once the chunk loads
+        if self.multi_octave_noise(x * 0.02 - 500, y * 0.02, octaves=2) > self.water_threshold and not self.is_cave(x, y + 1, terrain_height):
+            return self.water_tile
+        return -1
+
     def get_chunk_key(self, world_x, world_y):
         chunk_x = world_x // (self.chunk_size * constants.TILE_SIZE)
         chunk_y = world_y // (self.chunk_size * constants.TILE_SIZE)
         return (chunk_x, chunk_y)
 
     def generate_chunk(self, chunk_x, chunk_y):
-        chunk_data = []
-        for y in range(self.chunk_size):
-            row = []
-            for x in range(self.chunk_size):
-                world_tile_x = chunk_x * self.chunk_size + x
-                world_tile_y = chunk_y * self.chunk_size + y
-                tile_type = self.generate_tile_at(world_tile_x, world_tile_y)
-                row.append(tile_type)
-            chunk_data.append(row)
-        return chunk_data
+        # the same tiles as generate_tile_at, but each column height is only worked out once and the noise for every
+        # tile below the surface is sampled a whole chunk at a time (see test_world.py)
+        start_x = chunk_x * self.chunk_size
+        start_y = chunk_y * self.chunk_size
+        columns = self.columns.get_range(start_x, self.chunk_size)
+        heights = np.array([column.height for column in columns])
+        if heights.min() >= start_y + self.chunk_size:
+            # all sky
+            chunk = Chunk(self.chunk_size)
+            if self.level:
+                self.apply_level(chunk_x, chunk_y, chunk)
+            return chunk
+
+        # indexed [y, x], with one extra row below the chunk because a cave floor depends on the tile under it
+        x, y = np.meshgrid(np.arange(start_x, start_x + self.chunk_size), np.arange(start_y, start_y + self.chunk_size + 1))
+        depth = y - heights
+        tiles = np.full(depth.shape, -1, dtype=np.int8)
+        surface = depth == 0
+        tiles[surface] = np.array([column.surface_tile for column in columns], dtype=np.int8)[np.nonzero(surface)[1]]
+
+        # caves, the dirt layer is the 4 tiles under the surface and everything below it is stone
+        dirt = (depth > 0) & (depth < 5)
+        stone = depth >= 5
+        cave = np.zeros(depth.shape, dtype=bool)
+        cave[dirt] = self.multi_octave_noise_array(x[dirt] * 0.05, y[dirt] * 0.05, octaves=3) > self.cave_threshold
+        cave[stone] = self.multi_octave_noise_array(x[stone] * 0.03, y[stone] * 0.05, octaves=2) > self.cave_threshold + 0.1
+        dirt &= ~cave
+        tiles[dirt] = self.ground_tile
+        tiles[stone & ~cave] = self.stone_tile
+        sand = dirt.copy()
+        sand[dirt] = self.multi_octave_noise_array(x[dirt] * 0.04 + 500, y[dirt] * 0.04, octaves=2) > self.sand_threshold
+        tiles[sand] = self.sand_tile
+
+        # the bottom tile of a cave is water in wet areas
+        floor = cave[:-1] & ~cave[1:]
+        water = floor.copy()
+        water[floor] = self.multi_octave_noise_array(x[:-1][floor] * 0.02 - 500, y[:-1][floor] * 0.02, octaves=2) > self.water_threshold
+        tiles[:-1][water] = self.water_tile
+
+        chunk = Chunk.from_bytes(self.chunk_size, tiles[:-1].tobytes())
+        if self.level:
+            self.apply_level(chunk_x, chunk_y, chunk)
+        return chunk
+
+    def set_level(self, level):
+        if level.chunk_size != self.chunk_size:
+            raise ValueError(f"{level.path} has {level.chunk_size} tile chunks but the world uses {self.chunk_size}")
+        self.level = level
+
+    def apply_level(self, chunk_x, chunk_y, chunk):
+        # authored tiles go over the generated ones, only chunks the level covers are read from it
+        stored = self.level.load_chunk(chunk_x, chunk_y)
+        if stored is None:
+            return
+        tile_bytes, authored_bytes = stored
+        authored_tiles = Chunk.from_bytes(self.chunk_size, tile_bytes).tiles
+        for index, authored in enumerate(authored_bytes):
+            if authored:
+                chunk.tiles[index] = authored_tiles[index]
+
+    def apply_chunk_edits(self, chunk_key, chunk):
+        # writes the player's edits over freshly generated chunk data
+        for index, tile_type in self.chunk_edits.get(chunk_key, {}).items():
+            chunk.tiles[index] = tile_type
+        return chunk
+
+    def encode_chunk(self, chunk_key, chunk):
+        # tile bytes and edit flags in the layout the region store saves
+        edit_bytes = bytearray(self.chunk_size * self.chunk_size)
+        for index in self.chunk_edits.get(chunk_key, {}):
+            edit_bytes[index] = 1
+        return chunk_key, chunk.to_bytes(), bytes(edit_bytes)
+
+    def encode_edit_states(self, chunk_key):
+        # get_edit_state of every tile in a chunk as one byte each, what a server sends with the chunk
+        states = bytearray(self.chunk_size * self.chunk_size)
+        start_x = chunk_key[0] * self.chunk_size
+        start_y = chunk_key[1] * self.chunk_size
+        for index in self.chunk_edits.get(chunk_key, {}):
+            states[index] = self.get_edit_state(start_x + index % self.chunk_size, start_y + index // self.chunk_size)
+        return bytes(states)
+
+    def read_stored_chunk(self, chunk_key):
+        # loads a chunk saved on disk and restores its edits, None if it was never saved
+        if not self.chunk_store:
+            return None
+        stored = self.chunk_store.load_chunk(*chunk_key)
+        if stored is None:
+            return None
+
+        tile_bytes, edit_bytes = stored
+        chunk = Chunk.from_bytes(self.chunk_size, tile_bytes)
+
+        # edits made while the chunk was unloaded go on top of the saved ones
+        edits = self.chunk_edits.get(chunk_key, {})
+        if edits:
+            self.dirty_chunks.add(chunk_key)
+        for index, edited in enumerate(edit_bytes):
+            if edited and index not in edits:
+                self.set_edit(chunk_key, index, chunk.tiles[index])
+        return chunk
+
+    def set_chunk_budget(self, max_chunks=None, max_bytes=None):
+        # either limit can be None, the cache must still fit everything within view_distance
+        self.chunk_cache_limit = max_chunks
+        self.loaded_chunks.max_chunks = max_chunks
+        self.loaded_chunks.max_bytes = max_bytes
+        self.loaded_chunks.evict_over_budget()
+        self.flush_evicted_chunks()
+
+    def get_memory_usage(self):
+        # rough bytes held by each part of the world, read by the memory telemetry
+        return {
+            "chunk tiles": self.loaded_chunks.memory_size,
+            "chunk edits": sys.getsizeof(self.chunk_edits) + sum(sys.getsizeof(edits) for edits in self.chunk_edits.values())
+                           + sys.getsizeof(self.column_edits) + sum(sys.getsizeof(edits) for edits in self.column_edits.values()),
+            "chunk surfaces": sum(get_surface_bytes(chunk_surface) for chunk_surface in self.chunk_surfaces.values()),
+            "light": self.light.get_memory_size(),
+            "columns": self.columns.get_memory_size(),
+            "cell queues": self.cells.get_memory_size(),
+            "map images": self.lod.get_memory_size() if self.lod else 0,
+        }
 
     def load_chunk(self, chunk_x, chunk_y):
         chunk_key = (chunk_x, chunk_y)
         if chunk_key not in self.loaded_chunks:
-            self.loaded_chunks[chunk_key] = self.generate_chunk(chunk_x, chunk_y)
+            # reading a saved chunk is much cheaper than generating it again
+            chunk = self.read_stored_chunk(chunk_key)
+            if chunk is None:
+                chunk = self.generate_chunk(chunk_x, chunk_y)
+                self.dirty_chunks.add(chunk_key)
+            self.loaded_chunks.put(chunk_key, self.apply_chunk_edits(chunk_key, chunk))
+            self.chunk_load_count += 1
+            self.on_chunk_loaded(chunk_key)
+
+    def on_chunk_loaded(self, chunk_key):
+        # lights the new chunk, which can also brighten the edges of the chunks around it
+        self.redraw_tiles(self.light.light_chunk(chunk_key))
+        if self.lod:
+            self.lod.render_chunk(chunk_key)
+
+    def on_chunk_evicted(self, chunk_key, chunk):
+        # called by the chunk cache when it drops the least recently used chunk
+        self.chunk_surfaces.pop(chunk_key, None)
+        self.light.forget_chunk(chunk_key)
+        self.cells.forget_chunk(chunk_key)
+        if self.chunk_store and chunk_key in self.dirty_chunks:
+            self.chunks_to_save.append(self.encode_chunk(chunk_key, chunk))
+        self.dirty_chunks.discard(chunk_key)
+
+    def flush_evicted_chunks(self):
+        # everything evicted since the last flush is written in one go
+        if not self.chunks_to_save:
+            return
+        self.chunk_store.save_chunks(self.chunks_to_save)
+        for chunk_key, tile_bytes, edit_bytes in self.chunks_to_save:
+            # the saved chunk holds its own edits so they don't need to stay in memory
+            if chunk_key not in self.loaded_chunks:
+                self.forget_chunk_edits(chunk_key)
+        self.chunks_to_save = []
 
     def unload_distant_chunks(self, player_chunk_x, player_chunk_y):
-        chunks_to_remove = [
-            (cx, cy) for (cx, cy) in self.loaded_chunks
-            if max(abs(cx - player_chunk_x), abs(cy - player_chunk_y)) > 2
+        # chunk data is evicted by the cache budget, but the large pre-rendered surfaces
+        # are only kept for chunks close enough to be drawn
+        keep_distance = self.view_distance + 1
+        surfaces_to_remove = [
+            (cx, cy) for (cx, cy) in self.chunk_surfaces
+            if max(abs(cx - player_chunk_x), abs(cy - player_chunk_y)) > keep_distance
+        ]
+        for key in surfaces_to_remove:
+            del self.chunk_surfaces[key]
+
+    def save(self):
+        # writes every loaded chunk that changed since it was last saved
+        if not self.chunk_store:
+            return
+        self.flush_evicted_chunks()
+        self.chunk_store.save_chunks([
+            self.encode_chunk(key, self.loaded_chunks.peek(key)) for key in self.dirty_chunks if key in self.loaded_chunks
+        ])
+        self.dirty_chunks.clear()
+
+    def install_generated_chunks(self):
+        # adds chunks finished by the background loader, called at the start of a frame
+        for chunk_key, chunk in self.chunk_loader.collect_finished():
+            if chunk_key not in self.loaded_chunks:
+                self.dirty_chunks.add(chunk_key)
+                self.loaded_chunks.put(chunk_key, self.apply_chunk_edits(chunk_key, chunk))
+                self.chunk_load_count += 1
+                self.on_chunk_loaded(chunk_key)
+
+    def get_travel_direction(self, player_x, player_y):
+        # returns (-1, 0 or 1) for each axis based on movement since the last update
+        direction = (0, 0)
+        if self.last_player_position is not None:
+            dx = player_x - self.last_player_position[0]
+            dy = player_y - self.last_player_position[1]
+            direction = ((dx > 0) - (dx < 0), (dy > 0) - (dy < 0))
+        self.last_player_position = (player_x, player_y)
+        return direction
+
+    def get_chunks_in_view(self, player_chunk_x, player_chunk_y):
+        return [
+            (player_chunk_x + dx, player_chunk_y + dy)
+            for dx in range(-self.view_distance, self.view_distance + 1)
+            for dy in range(-self.view_distance, self.view_distance + 1)
         ]
-        for key in chunks_to_remove:
-            del self.loaded_chunks[key]
+
+    def request_chunks_around(self, player_chunk_x, player_chunk_y, direction):
+        # chunks in view are requested first so they are generated before the prefetch
+        wanted = self.get_chunks_in_view(player_chunk_x, player_chunk_y)
+
+        # prefetch the row/column of chunks just past the view in the direction of travel
+        direction_x, direction_y = direction
+        ahead = self.view_distance + 1
+        for offset in range(-self.view_distance, self.view_distance + 1):
+            if direction_x != 0:
+                wanted.append((player_chunk_x + ahead * direction_x, player_chunk_y + offset))
+            if direction_y != 0:
+                wanted.append((player_chunk_x + offset, player_chunk_y + ahead * direction_y))
+
+        self.chunk_loader.cancel_unwanted(wanted)
+        for chunk_key in wanted:
+            if chunk_key in self.loaded_chunks:
+                continue
+            if self.chunk_store and self.chunk_store.has_chunk(*chunk_key):
+                # saved chunks are a quick read so they don't need a worker
+                self.load_chunk(*chunk_key)
+            else:
+                self.chunk_loader.request(*chunk_key)
 
     def update_chunks_around_player(self, player_x, player_y):
+        # floor division already rounds negative positions down to the right chunk
         player_chunk_x = player_x // (self.chunk_size * constants.TILE_SIZE)
         player_chunk_y = player_y // (self.chunk_size * constants.TILE_SIZE)
-        
-        if player_x < 0 and player_x % (self.chunk_size * constants.TILE_SIZE) != 0:
-            player_chunk_x -= 1
-        if player_y < 0 and player_y % (self.chunk_size * constants.TILE_SIZE) != 0:
-            player_chunk_y -= 1
-            
-        for dx in range(-1, 2):
-            for dy in range(-1, 2):
-                self.load_chunk(player_chunk_x + dx, player_chunk_y + dy)
+
+        chunks_in_view = self.get_chunks_in_view(player_chunk_x, player_chunk_y)
+        if self.chunk_loader:
+            self.install_generated_chunks()
+
+        # the cell simulation runs in the chunks in view, so they are loaded on the tick they come into view even when
+        # the background loader hasn't finished them, otherwise what moves would depend on how fast the workers are
+        # this is the one place chunks are used through the cache, so its hits, misses and eviction order are per chunk
+        # in view rather than per tile read
+        for chunk_key in chunks_in_view:
+            if self.loaded_chunks.get(chunk_key) is None:
+                self.load_chunk(*chunk_key)
+
+        if self.chunk_loader:
+            # the loader generates the chunks just past the view, so they are usually ready before they are needed
+            direction = self.get_travel_direction(player_x, player_y)
+            self.request_chunks_around(player_chunk_x, player_chunk_y, direction)
+
+        # the chunks in view were just used, so the cache evicts chunks behind the player first
+        for chunk_key in chunks_in_view:
+            self.loaded_chunks.touch(chunk_key)
+        self.flush_evicted_chunks()
         self.unload_distant_chunks(player_chunk_x, player_chunk_y)
+        return chunks_in_view
 
     def get_tile_at(self, tile_x, tile_y):
-        chunk_x = tile_x // self.chunk_size
-        chunk_y = tile_y // self.chunk_size
-        
-        if tile_x < 0 and tile_x % self.chunk_size != 0:
-            chunk_x -= 1
-        if tile_y < 0 and tile_y % self.chunk_size != 0:
-            chunk_y -= 1
-            
-        chunk_key = (chunk_x, chunk_y)
-        
-        if chunk_key not in self.loaded_chunks:
-            return self.generate_tile_at(tile_x, tile_y)
-        
-        local_x = tile_x - chunk_x * self.chunk_size
-        local_y = tile_y - chunk_y * self.chunk_size
-        
-        if local_x < 0 or local_y < 0 or local_x >= self.chunk_size or local_y >= self.chunk_size:
-            # outside chunk bounds, generate directly
+        chunk_key = (tile_x // self.chunk_size, tile_y // self.chunk_size)
+        chunk = self.loaded_chunks.peek(chunk_key)
+
+        if chunk is None:
+            # chunk not loaded, check the player's edits then the saved chunk before generating directly
+            index = self.get_local_index(tile_x, tile_y)
+            edits = self.chunk_edits.get(chunk_key)
+            if edits and index in edits:
+                return edits[index]
+            if self.chunk_store:
+                tile_type = self.chunk_store.get_tile(chunk_key[0], chunk_key[1], index)
+                if tile_type is not None:
+                    return tile_type
             return self.generate_tile_at(tile_x, tile_y)
-        
-        return self.loaded_chunks[chunk_key][local_y][local_x]
+
+        # loaded chunks already have edits applied
+        return chunk.get_tile(tile_x % self.chunk_size, tile_y % self.chunk_size)
+
+    def is_solid_tile(self, tile_type):
+        # air (including broken blocks) and water can be moved through
+        return self.tiles.solid[tile_type]
+
+    def is_solid_at(self, tile_x, tile_y):
+        return self.is_solid_tile(self.get_tile_at(tile_x, tile_y))
+
+    def is_column_blocked(self, tile_x, top_row, bottom_row):
+        for tile_y in range(top_row, bottom_row + 1):
+            if self.is_solid_at(tile_x, tile_y):
+                return True
+        return False
+
+    def is_row_blocked(self, tile_y, left_column, right_column):
+        for tile_x in range(left_column, right_column + 1):
+            if self.is_solid_at(tile_x, tile_y):
+                return True
+        return False
+
+    def sweep_x(self, rect, distance):
+        # returns how far rect can move horizontally before it hits a solid tile
+        # every column between the old and new edge is checked so fast movement can't pass through tiles
+        if distance == 0:
+            return 0
+        top_row = rect.top // constants.TILE_SIZE
+        bottom_row = (rect.bottom - 1) // constants.TILE_SIZE
+
+        if distance > 0:
+            first_column = (rect.right - 1) // constants.TILE_SIZE
+            last_column = (rect.right - 1 + distance) // constants.TILE_SIZE
+            for tile_x in range(first_column, last_column + 1):
+                if self.is_column_blocked(tile_x, top_row, bottom_row):
+                    return tile_x * constants.TILE_SIZE - rect.right
+        else:
+            first_column = rect.left // constants.TILE_SIZE
+            last_column = (rect.left + distance) // constants.TILE_SIZE
+            for tile_x in range(first_column, last_column - 1, -1):
+                if self.is_column_blocked(tile_x, top_row, bottom_row):
+                    return (tile_x + 1) * constants.TILE_SIZE - rect.left
+        return distance
+
+    def sweep_y(self, rect, distance):
+        # vertical version of sweep_x
+        if distance == 0:
+            return 0
+        left_column = rect.left // constants.TILE_SIZE
+        right_column = (rect.right - 1) // constants.TILE_SIZE
+
+        if distance > 0:
+            first_row = (rect.bottom - 1) // constants.TILE_SIZE
+            last_row = (rect.bottom - 1 + distance) // constants.TILE_SIZE
+            for tile_y in range(first_row, last_row + 1):
+                if self.is_row_blocked(tile_y, left_column, right_column):
+                    return tile_y * constants.TILE_SIZE - rect.bottom
+        else:
+            first_row = rect.top // constants.TILE_SIZE
+            last_row = (rect.top + distance) // constants.TILE_SIZE
+            for tile_y in range(first_row, last_row - 1, -1):
+                if self.is_row_blocked(tile_y, left_column, right_column):
+                    return (tile_y + 1) * constants.TILE_SIZE - rect.top
+        return distance
+
+    def tiles_on_line(self, start_x, start_y, end_x, end_y):
+        # yields every tile a line between two world positions passes through, in order from the start
+        # uses Amanatides-Woo grid traversal so only the crossed tiles are visited
+        tile_x = int(start_x // constants.TILE_SIZE)
+        tile_y = int(start_y // constants.TILE_SIZE)
+        steps = abs(int(end_x // constants.TILE_SIZE) - tile_x) + abs(int(end_y // constants.TILE_SIZE) - tile_y)
+        dx = end_x - start_x
+        dy = end_y - start_y
+        step_x = (dx > 0) - (dx < 0)
+        step_y = (dy > 0) - (dy < 0)
+
+        # how far along the line (0 at the start, 1 at the end) the next vertical/horizontal tile edge is
+        # and how far it is between edges
+        if dx != 0:
+            next_x = (tile_x + (step_x > 0)) * constants.TILE_SIZE
+            t_max_x = (next_x - start_x) / dx
+            t_delta_x = constants.TILE_SIZE / abs(dx)
+        else:
+            t_max_x = t_delta_x = float("inf")
+        if dy != 0:
+            next_y = (tile_y + (step_y > 0)) * constants.TILE_SIZE
+            t_max_y = (next_y - start_y) / dy
+            t_delta_y = constants.TILE_SIZE / abs(dy)
+        else:
+            t_max_y = t_delta_y = float("inf")
+
+        yield tile_x, tile_y
+        for _ in range(steps):
+            if t_max_x < t_max_y:
+                tile_x += step_x
+                t_max_x += t_delta_x
+            else:
+                tile_y += step_y
+                t_max_y += t_delta_y
+            yield tile_x, tile_y
+
+    def raycast(self, start_x, start_y, end_x, end_y):
+        # first solid tile between two world positions, or None if the line is clear
+        for tile_x, tile_y in self.tiles_on_line(start_x, start_y, end_x, end_y):
+            if self.is_solid_at(tile_x, tile_y):
+                return tile_x, tile_y
+        return None
+
+    def count_solid_tiles_on_line(self, start_x, start_y, end_x, end_y, limit):
+        # stops counting as soon as the count goes past limit
+        count = 0
+        for tile_x, tile_y in self.tiles_on_line(start_x, start_y, end_x, end_y):
+            if self.is_solid_at(tile_x, tile_y):
+                count += 1
+                if count > limit:
+                    break
+        return count
 
     def get_obstacles_in_area(self, camera_x, camera_y, screen_width, screen_height):
         obstacles = []
@@ -167,15 +595,7 @@ class World():
         for tile_x in range(start_x, end_x):
             for tile_y in range(start_y, end_y):
                 tile_type = self.get_tile_at(tile_x, tile_y)
-                chunk_x = tile_x // self.chunk_size
-                chunk_y = tile_y // self.chunk_size
-                local_x = tile_x % self.chunk_size
-                local_y = tile_y % self.chunk_size
-
-                block_key = (chunk_x, chunk_y, local_x, local_y)
-                is_broken = block_key in self.broken_blocks
-
-                if tile_type != -1 and not is_broken:  # not air
+                if self.is_solid_tile(tile_type):
                     world_x = tile_x * constants.TILE_SIZE
                     world_y = tile_y * constants.TILE_SIZE
                     obstacles.append(
@@ -183,114 +603,262 @@ class World():
                     )
         return obstacles
 
-    def remove_block_at(self, tile_x, tile_y):
-        chunk_x = tile_x // self.chunk_size
-        chunk_y = tile_y // self.chunk_size
-        local_x = tile_x % self.chunk_size
-        local_y = tile_y % self.chunk_size
-
-        block_key = (chunk_x, chunk_y, local_x, local_y)
-        self.broken_blocks.add(block_key)
-
-    def add_block_at(self, tile_x, tile_y, obstacles):
-        chunk_x = tile_x // self.chunk_size
-        chunk_y = tile_y // self.chunk_size
-        local_x = tile_x % self.chunk_size
-        local_y = tile_y % self.chunk_size
-
-        block_key = (chunk_x, chunk_y, local_x, local_y)
-        if not(block_key in obstacles):
-            if block_key in self.broken_blocks:
-                self.broken_blocks.remove(block_key)
-            self.added_blocks.add(block_key)
-            world_x = tile_x * constants.TILE_SIZE
-            world_y = tile_y * constants.TILE_SIZE
-            obstacles.append(
-                        pygame.Rect(world_x, world_y, constants.TILE_SIZE, constants.TILE_SIZE)
-                    )
-        return obstacles
-
+    def get_local_index(self, tile_x, tile_y):
+        # position of a tile inside its chunk as a single number
+        return (tile_y % self.chunk_size) * self.chunk_size + tile_x % self.chunk_size
+
+    def set_edit(self, chunk_key, index, tile_type):
+        # records an edit in chunk_edits and column_edits, None removes it when the tile is back to what was generated
+        tile_x = chunk_key[0] * self.chunk_size + index % self.chunk_size
+        tile_y = chunk_key[1] * self.chunk_size + index // self.chunk_size
+        if tile_type is not None:
+            self.chunk_edits.setdefault(chunk_key, {})[index] = tile_type
+            self.column_edits.setdefault(tile_x, {})[tile_y] = tile_type
+            return
+        edits = self.chunk_edits.get(chunk_key)
+        if not edits or index not in edits:
+            return
+        del edits[index]
+        if not edits:
+            del self.chunk_edits[chunk_key]
+        column = self.column_edits[tile_x]
+        del column[tile_y]
+        if not column:
+            del self.column_edits[tile_x]
+
+    def forget_chunk_edits(self, chunk_key):
+        for index in list(self.chunk_edits.get(chunk_key, ())):
+            self.set_edit(chunk_key, index, None)
+
+    def store_edit(self, tile_x, tile_y, tile_type):
+        # only differences from the generated terrain are stored, returns the loaded chunk the tile is in if there is one
+        chunk_key = (tile_x // self.chunk_size, tile_y // self.chunk_size)
+        self.set_edit(chunk_key, self.get_local_index(tile_x, tile_y), None if tile_type == self.generate_tile_at(tile_x, tile_y) else tile_type)
+
+        if self.edit_log is not None:
+            self.edit_log.append((tile_x, tile_y, tile_type))
+
+        chunk = self.loaded_chunks.peek(chunk_key)
+        if chunk is not None:
+            chunk.set_tile(tile_x % self.chunk_size, tile_y % self.chunk_size, tile_type)
+            self.dirty_chunks.add(chunk_key)
+        return chunk
+
+    def set_tile_at(self, tile_x, tile_y, tile_type):
+        if self.chunk_store:
+            # edit through the loaded chunk so the change is saved with it
+            self.load_chunk(tile_x // self.chunk_size, tile_y // self.chunk_size)
+
+        changed_tiles = [(tile_x, tile_y, None)]
+        if self.store_edit(tile_x, tile_y, tile_type) is not None:
+            changed_tiles += self.light.update_tile(tile_x, tile_y, tile_type)
+            # sand and water around the tile may be able to move now
+            self.cells.wake_around(tile_x, tile_y)
+        self.redraw_tiles(changed_tiles)
+
+    def set_tiles(self, tiles):
+        # set_tile_at for many tiles in loaded chunks at once, relit together as one area
+        # tiles are (tile x, tile y, tile type), nothing is woken in the cell simulation
+        for tile_x, tile_y, tile_type in tiles:
+            self.store_edit(tile_x, tile_y, tile_type)
+        self.redraw_tiles(list(tiles) + self.light.update_tiles(tiles))
 
+    def remove_block_at(self, tile_x, tile_y):
+        self.set_tile_at(tile_x, tile_y, -1)
+
+    def add_block_at(self, tile_x, tile_y):
+        # can only place blocks into air, returns whether a block was placed
+        if self.get_tile_at(tile_x, tile_y) != -1:
+            return False
+        self.set_tile_at(tile_x, tile_y, self.wood_tile)
+        return True
+
+    def get_edit_state(self, tile_x, tile_y):
+        # EDIT_NONE, EDIT_CHANGED or EDIT_BROKEN, everything a world that doesn't generate terrain needs to know about
+        # a tile besides its type to light and draw it the same as this one
+        edits = self.chunk_edits.get((tile_x // self.chunk_size, tile_y // self.chunk_size))
+        if not edits or self.get_local_index(tile_x, tile_y) not in edits:
+            return EDIT_NONE
+        return EDIT_BROKEN if self.is_block_broken(tile_x, tile_y) else EDIT_CHANGED
+
+    def is_block_broken(self, tile_x, tile_y):
+        # a broken block is air that the generated terrain had as a solid tile
+        edits = self.chunk_edits.get((tile_x // self.chunk_size, tile_y // self.chunk_size))
+        if not edits or edits.get(self.get_local_index(tile_x, tile_y)) != -1:
+            return False
+        # water that flowed away leaves nothing behind
+        return self.generate_tile_at(tile_x, tile_y) != self.water_tile
+
+    def get_ground_type(self, tile_y, terrain_height):
+        # which ground texture sits under a tile, based on how far below the surface it is
+        if tile_y > terrain_height and tile_y < terrain_height + 5:
+            return self.ground_tile
+        elif tile_y >= terrain_height + 5:
+            return self.stone_tile
+        return self.surface_tile
 
     def get_tile_texture_index(self, tile_x, tile_y, tile_type):
-        if tile_type >= len(self.ground_sprites) or len(self.ground_sprites[tile_type]) == 0:
+        frames = self.tile_frames[tile_type]
+        if len(frames) < 2:
             return 0
-        
-        # Set random seed based on tile position and world seed for consistency
-        random.seed(self.seed + tile_x * 1000 + tile_y)
-        texture_count = len(self.ground_sprites[tile_type])
-        return random.randint(0, texture_count - 1)
-    
-    def get_vegetation_texture_index(self, vegetation_type):
-        if vegetation_type == 1:  # bushes
-            if not self.vegetation_sprites or len(self.vegetation_sprites[1]) == 0:
-                return 0
-            return random.randint(0, len(self.vegetation_sprites[1]) - 1)
-
-        #trees
-        return 0
-    
-    def draw(self, surface, camera_x, camera_y, screen_width, screen_height):
-        start_x = int(camera_x // constants.TILE_SIZE) - 1
-        end_x = int((camera_x + screen_width) // constants.TILE_SIZE) + 2
-        start_y = int(camera_y // constants.TILE_SIZE) - 1
-        end_y = int((camera_y + screen_height) // constants.TILE_SIZE) + 2
+
+        # random generator seeded by tile position and world seed for consistency
+        # uses its own generator so the global random module is left alone
+        tile_random = random.Random(self.columns.get(tile_x).texture_seed + tile_y)
+        return tile_random.randint(0, len(frames) - 1)
+
+    def get_vegetation_height(self):
+        # how far plants and trees can reach above the top of the tile they grow on
+        height = 0
+        for tile_id, frames in enumerate(self.tile_frames):
+            if frames and self.tiles.layer[tile_id] == LAYER_TREE:
+                height = max(height, sum(img.get_height() for img in frames) - 6)
+            elif frames and self.tiles.layer[tile_id] == LAYER_PLANT:
+                height = max(height, max(img.get_height() for img in frames) - 6)
+        return height
+
+    def draw_tile(self, surface, tile_x, tile_y, tile_type, terrain_height, screen_x, screen_y):
+        layer = self.tiles.layer[tile_type]
+        if layer == LAYER_NONE:
+            # broken blocks are air but are still drawn faintly to show what was dug out, going by depth
+            if tile_type == -1 and self.is_block_broken(tile_x, tile_y):
+                ground_type = self.get_ground_type(tile_y, terrain_height)
+                frames = self.tile_frames[ground_type]
+                if frames:
+                    # translucent copy made once instead of changing the alpha of the shared texture
+                    ground_texture = frames[self.get_tile_texture_index(tile_x, tile_y, ground_type)]
+                    surface.blit(sprite_variants.get(ground_texture, alpha=128), (screen_x, screen_y))
+            return
+
+        # plants and trees are drawn over the tile they grow out of
+        block_type = tile_type if layer == LAYER_BLOCK or layer == LAYER_PLAIN else self.tiles.grows_on[tile_type]
+        frames = self.tile_frames[block_type]
+        if frames:
+            surface.blit(frames[self.get_tile_texture_index(tile_x, tile_y, block_type)], (screen_x, screen_y))
+        elif self.plain_tiles[block_type]:
+            surface.blit(self.plain_tiles[block_type], (screen_x, screen_y))
+
+        frames = self.tile_frames[tile_type]
+        if layer == LAYER_TREE and frames:
+            # each segment goes on top of the last, starting from the top of the ground tile
+            current_y = screen_y + 6
+            for img in frames:
+                current_y -= img.get_height()
+                surface.blit(img, (screen_x, current_y))
+        elif layer == LAYER_PLANT and frames:
+            # sitting on top of the ground, picked from the tile position so it keeps the same look every time it is drawn
+            plant_texture = frames[self.get_tile_texture_index(tile_x, tile_y, tile_type)]
+            surface.blit(plant_texture, (screen_x, screen_y - plant_texture.get_height() + 6))
+
+    def render_chunk_surface(self, chunk_x, chunk_y):
+        # draws a whole loaded chunk once, with extra space at the top for vegetation
+        chunk_pixels = self.chunk_size * constants.TILE_SIZE
+        chunk_surface = pygame.Surface((chunk_pixels, chunk_pixels + self.vegetation_padding), pygame.SRCALPHA)
+
+        chunk = self.loaded_chunks.peek((chunk_x, chunk_y))
+        start_x = chunk_x * self.chunk_size
+        start_y = chunk_y * self.chunk_size
+        heights = self.generate_heightmap(start_x, self.chunk_size)
+        light = self.light.chunk_light.get((chunk_x, chunk_y))
+        light = light.tolist() if light is not None else None
+
+        # columns are drawn top to bottom so trees overlap the tiles above them
+        for x in range(self.chunk_size):
+            for y in range(self.chunk_size):
+                screen_y = self.vegetation_padding + y * constants.TILE_SIZE
+                self.draw_tile(chunk_surface, start_x + x, start_y + y, chunk.get_tile(x, y), heights[x], x * constants.TILE_SIZE, screen_y)
+                self.draw_darkness(chunk_surface, light[y][x] if light else None, x * constants.TILE_SIZE, screen_y)
+        return chunk_surface
+
+    def draw_darkness(self, surface, light, screen_x, screen_y):
+        # light is None for tiles outside loaded chunks, those stay fully bright
+        if light is not None and light < MAX_LIGHT:
+            surface.blit(self.darkness_tiles[light], (screen_x, screen_y))
+
+    def get_column_draw_area(self, tile_x, top_y, bottom_y):
+        # world pixel rect tiles top_y to bottom_y of a column can draw into, including vegetation growing out of them
+        return pygame.Rect(tile_x * constants.TILE_SIZE, top_y * constants.TILE_SIZE - self.vegetation_padding,
+                           constants.TILE_SIZE, (bottom_y - top_y + 1) * constants.TILE_SIZE + self.vegetation_padding)
+
+    def redraw_tiles(self, tiles):
+        # tiles are (tile x, tile y, anything), changes are grouped into one span per column of each chunk
+        spans = {}
+        for tile_x, tile_y, _ in tiles:
+            key = (tile_x, tile_y // self.chunk_size)
+            if key in spans:
+                spans[key] = (min(spans[key][0], tile_y), max(spans[key][1], tile_y))
+            else:
+                spans[key] = (tile_y, tile_y)
+        for (tile_x, chunk_y), (top_y, bottom_y) in spans.items():
+            self.redraw_chunk_surface_column((tile_x // self.chunk_size, chunk_y), tile_x, top_y, bottom_y)
+            if self.changed_areas is not None:
+                self.changed_areas.append(self.get_column_draw_area(tile_x, top_y, bottom_y))
+        if self.lod:
+            self.lod.update_tiles(tiles)
+
+    def redraw_chunk_surface_column(self, chunk_key, tile_x, top_y, bottom_y):
+        # updates changed tiles on a cached chunk surface instead of re-rendering the whole chunk
+        chunk_surface = self.chunk_surfaces.get(chunk_key)
+        if chunk_surface is None:
+            return
+        chunk = self.loaded_chunks.peek(chunk_key)
+        if chunk is None:
+            del self.chunk_surfaces[chunk_key]
+            return
+
+        local_x = tile_x % self.chunk_size
+        local_top = top_y % self.chunk_size
+        local_bottom = bottom_y % self.chunk_size
+        # same area as get_column_draw_area but in chunk surface coordinates, which start vegetation_padding above the chunk
+        area = pygame.Rect(local_x * constants.TILE_SIZE, local_top * constants.TILE_SIZE,
+                           constants.TILE_SIZE, (local_bottom - local_top + 1) * constants.TILE_SIZE + self.vegetation_padding)
+        chunk_surface.fill((0, 0, 0, 0), area)
+        chunk_surface.set_clip(area)
+
+        # tiles can only overlap others in the same column, redraw every one in reach from top to bottom
+        reach = -(-self.vegetation_padding // constants.TILE_SIZE)
+        terrain_height = self.generate_height_at(tile_x)
+        start_y = chunk_key[1] * self.chunk_size
+        light = self.light.chunk_light.get(chunk_key)
+        for y in range(max(local_top - reach, 0), min(local_bottom + reach, self.chunk_size - 1) + 1):
+            screen_y = self.vegetation_padding + y * constants.TILE_SIZE
+            self.draw_tile(chunk_surface, tile_x, start_y + y, chunk.get_tile(local_x, y), terrain_height, local_x * constants.TILE_SIZE, screen_y)
+            self.draw_darkness(chunk_surface, None if light is None else int(light[y, local_x]), local_x * constants.TILE_SIZE, screen_y)
+        chunk_surface.set_clip(None)
+
+    def draw_chunk_tiles(self, surface, chunk_x, chunk_y, camera_x, camera_y, screen_width, screen_height):
+        # slow path for chunks still being generated, only draws the visible tiles
+        start_x = max(int(camera_x // constants.TILE_SIZE) - 1, chunk_x * self.chunk_size)
+        end_x = min(int((camera_x + screen_width) // constants.TILE_SIZE) + 2, (chunk_x + 1) * self.chunk_size)
+        start_y = max(int(camera_y // constants.TILE_SIZE) - 1, chunk_y * self.chunk_size)
+        end_y = min(int((camera_y + screen_height + self.vegetation_padding) // constants.TILE_SIZE) + 2, (chunk_y + 1) * self.chunk_size)
 
         for tile_x in range(start_x, end_x):
+            terrain_height = self.generate_height_at(tile_x)
             for tile_y in range(start_y, end_y):
                 tile_type = self.get_tile_at(tile_x, tile_y)
+                world_x = tile_x * constants.TILE_SIZE
+                world_y = tile_y * constants.TILE_SIZE
+                self.draw_tile(surface, tile_x, tile_y, tile_type, terrain_height, world_x - camera_x, world_y - camera_y)
 
-                chunk_x = tile_x // self.chunk_size
-                chunk_y = tile_y // self.chunk_size
-                local_x = tile_x % self.chunk_size
-                local_y = tile_y % self.chunk_size
-
-                block_key = (chunk_x, chunk_y, local_x, local_y)
-                is_broken = block_key in self.broken_blocks
-
-                if tile_type != -1:
-                    world_x = tile_x * constants.TILE_SIZE
-                    world_y = tile_y * constants.TILE_SIZE
-                    screen_x = world_x - camera_x
-                    screen_y = world_y - camera_y
-
-                    # FIRST: Always draw the appropriate ground tile
-                    ground_type_to_draw = self.surface_tile  # Default to surface
-                    
-                    
-                    # Determine what ground tile should be here
-                    terrain_height = self.generate_height_at(tile_x)
-                    if tile_y == terrain_height:
-                        ground_type_to_draw = self.surface_tile
-                    elif tile_y > terrain_height and tile_y < terrain_height + 5:
-                        ground_type_to_draw = self.ground_tile
-                    elif tile_y >= terrain_height + 5:
-                        ground_type_to_draw = self.stone_tile
-                    
-                    # Draw the ground tile
-                    if ground_type_to_draw < len(self.ground_sprites) and len(self.ground_sprites[ground_type_to_draw]) > 0:
-                        texture_index = self.get_tile_texture_index(tile_x, tile_y, ground_type_to_draw)
-                        ground_texture = self.ground_sprites[ground_type_to_draw][texture_index]
-                        original_alpha = ground_texture.get_alpha()
-                        if is_broken:
-                            ground_texture.set_alpha(128)
-                        surface.blit(ground_texture, (screen_x, screen_y))
-                        ground_texture.set_alpha(original_alpha)
-                    
-                    # SECOND: Draw vegetation on top if this is a vegetation tile
-                    if tile_type == self.tree_tile:
-                        if self.vegetation_sprites and len(self.vegetation_sprites[0]) > 0:
-                            tree_images = self.vegetation_sprites[0]
-                            # Draw tree starting from the top of the ground tile
-                            current_y = screen_y + 6 #start at ground level
-                            for img in tree_images:
-                                current_y -= img.get_height()  # Move up for each tree segment
-                                surface.blit(img, (screen_x, current_y))
-                                
-                    elif tile_type == self.bush_tile:
-                        if self.vegetation_sprites and len(self.vegetation_sprites[1]) > 0:
-                            bush_texture_index = self.get_vegetation_texture_index(1)
-                            bush_texture = self.vegetation_sprites[1][bush_texture_index]
-                            current_y = screen_y - bush_texture.get_height() + 6
-                            # Draw bush sitting on top of the ground
-                            surface.blit(bush_texture, (screen_x, current_y))
+    def draw(self, surface, camera_x, camera_y, screen_width, screen_height):
+        chunk_pixels = self.chunk_size * constants.TILE_SIZE
+        start_chunk_x = int(camera_x // chunk_pixels)
+        end_chunk_x = int((camera_x + screen_width) // chunk_pixels)
+        start_chunk_y = int(camera_y // chunk_pixels)
+        # chunks just below the screen can still have vegetation poking up into view
+        end_chunk_y = int((camera_y + screen_height + self.vegetation_padding) // chunk_pixels)
+
+        # rows go top to bottom so vegetation hanging over from the chunk below is drawn last
+        for chunk_y in range(start_chunk_y, end_chunk_y + 1):
+            for chunk_x in range(start_chunk_x, end_chunk_x + 1):
+                chunk_key = (chunk_x, chunk_y)
+                if chunk_key not in self.loaded_chunks:
+                    self.draw_chunk_tiles(surface, chunk_x, chunk_y, camera_x, camera_y, screen_width, screen_height)
+                    continue
+
+                if chunk_key not in self.chunk_surfaces:
+                    self.chunk_surfaces[chunk_key] = self.render_chunk_surface(chunk_x, chunk_y)
+                screen_x = chunk_x * chunk_pixels - camera_x
+                screen_y = chunk_y * chunk_pixels - self.vegetation_padding - camera_y
+                surface.blit(self.chunk_surfaces[chunk_key], (screen_x, screen_y))